@@ -0,0 +1,91 @@
+"""
+Journal d'accès HTTP (middleware ASGI pur)
+
+Une ligne par requête, écrite quand la réponse est entièrement envoyée (corps
+en streaming compris): méthode, chemin, statut, durée, octets envoyés, client
+et origine, en texte `clé=valeur` ou en JSON. Les réponses réussies peuvent
+être échantillonnées (TTS_ACCESS_LOG_SAMPLE); les erreurs et les requêtes
+lentes sont toujours journalisées. Quand le logger `tts.access` est désactivé,
+la requête est passée telle quelle à l'application, sans rien allouer.
+"""
+import json
+import logging
+import os
+import random
+import time
+
+# Niveau du logger d'accès ("OFF" pour ne rien journaliser)
+TTS_ACCESS_LOG_LEVEL = os.environ.get("TTS_ACCESS_LOG_LEVEL", "INFO").upper()
+# "text" (clé=valeur) ou "json"
+TTS_ACCESS_LOG_FORMAT = os.environ.get("TTS_ACCESS_LOG_FORMAT", "text").lower()
+# Fraction des réponses réussies journalisées (1 = toutes)
+TTS_ACCESS_LOG_SAMPLE = float(os.environ.get("TTS_ACCESS_LOG_SAMPLE", "1"))
+# Durée (ms) au-delà de laquelle une requête est toujours journalisée
+TTS_ACCESS_LOG_SLOW_MS = float(os.environ.get("TTS_ACCESS_LOG_SLOW_MS", "1000"))
+
+logger = logging.getLogger("tts.access")
+logger.setLevel(logging.CRITICAL + 1 if TTS_ACCESS_LOG_LEVEL == "OFF" else TTS_ACCESS_LOG_LEVEL)
+
+
+def _header(headers, name: bytes) -> str:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class AccessLogMiddleware:
+    """
+    Middleware ASGI de journal d'accès avec échantillonnage
+    """
+
+    def __init__(
+        self,
+        app,
+        sample: float = TTS_ACCESS_LOG_SAMPLE,
+        slow_ms: float = TTS_ACCESS_LOG_SLOW_MS,
+        log_format: str = TTS_ACCESS_LOG_FORMAT,
+    ):
+        self.app = app
+        self.sample = sample
+        self.slow_ms = slow_ms
+        self.json = log_format == "json"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = [500, 0]  # statut, octets du corps
+
+        async def send_logged(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response[1] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_logged)
+        finally:
+            self._log(scope, response[0], response[1], (time.perf_counter() - start) * 1000)
+
+    def _log(self, scope, status_code: int, sent: int, duration_ms: float) -> None:
+        if status_code < 400 and duration_ms < self.slow_ms and self.sample < 1 and random.random() >= self.sample:
+            return
+        client = scope.get("client")
+        record = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "bytes": sent,
+            "client": client[0] if client else "",
+            "origin": _header(scope["headers"], b"origin"),
+        }
+        level = logging.WARNING if status_code >= 500 else logging.INFO
+        if self.json:
+            logger.log(level, json.dumps(record, ensure_ascii=False))
+        else:
+            logger.log(level, " ".join(f"{key}={value}" for key, value in record.items() if value != ""))
@@ -1,49 +1,169 @@
+import asyncio
+import json
 import logging
+import math
 import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from contextlib import asynccontextmanager
 import subprocess
-import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional, Tuple
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Request, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, constr, EmailStr
+from pydantic import BaseModel, confloat, conlist, constr, EmailStr
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 from starlette.concurrency import run_in_threadpool
-from starlette.middleware.base import BaseHTTPMiddleware
 from subprocess import CalledProcessError, TimeoutExpired
 
 # Imports pour l'authentification
-from database import get_db, init_db
+import metrics
+from access_log import AccessLogMiddleware
+from cors import CORSPolicy
+from database import SessionLocal, get_db, init_db, pool_status
 from models import User
-from auth import verify_password, get_password_hash, create_access_token, decode_access_token, validate_password
+from auth import verify_password_async, get_password_hash_async, create_access_token, decode_access_token, validate_password
+from tts_engine import KokoroEngine, SAMPLE_RATE, to_pcm16, wav_stream_header
+from text_pipeline import split_sentences
+from segment_pipeline import SegmentPipeline, edge_fade, trim_silence, TTS_SEGMENT_SILENCE_MS
+from jobs import JobManager, JobNotFoundError, JOB_MAX_CHARS
+from scheduler import SynthesisScheduler, QueueFullError, SchedulerUnavailableError, WorkerCrashedError
+from thread_plan import ThreadPlan, apply_plan, plan_threads
+from audio_cache import AudioCache, cache_key
+from audio_delivery import AudioFiles
+from retention import RetentionManager
+from user_cache import UserCache
+from credits import Charge, CreditMeter, InsufficientCreditsError
+from history import (
+    HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, InvalidCursorError, list_history, record_synthesis,
+)
+from audio_formats import (
+    FORMATS, FormatError, measured_bitrate, negotiate_format, normalize_options, resolve_format,
+)
+from g2p_cache import merge_stats
+from voices import DEFAULT_VOICE, LANGUAGES, TTS_VOICES, is_available, voice_info
 
 logging.basicConfig(level=logging.INFO)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Répertoire des fichiers audio servis sur /outputs (un autre répertoire pour les benchmarks)
+OUTPUT_DIR = os.environ.get("TTS_OUTPUT_DIR", os.path.join(BASE_DIR, "outputs"))
+
+# Routes de l'API, montées sur l'application par create_app
+router = APIRouter()
+
+# Composants du service, construits par create_app: `import api` ne charge ni
+# ne démarre rien (outils, mesure des imports, benchmarks)
+_app: Optional[FastAPI] = None
+# Répartition des CPU entre workers et threads (voir thread_plan.py)
+thread_plan: Optional[ThreadPlan] = None
+# Moteur de synthèse résident (modèle chargé une seule fois au démarrage)
+engine: Optional[KokoroEngine] = None
+# Pool de workers de synthèse avec file bornée (voir scheduler.py)
+scheduler: Optional[SynthesisScheduler] = None
+# Cache audio adressé par contenu (fichiers <sha256>.wav dans OUTPUT_DIR)
+audio_cache: Optional[AudioCache] = None
+# Découpage en phrases, synthèse parallèle des segments et raccord
+segment_pipeline: Optional[SegmentPipeline] = None
+# Rétention de outputs/ (âge maximal, budget disque, fichiers de l'historique conservés)
+retention: Optional[RetentionManager] = None
+# Cache TTL des utilisateurs authentifiés (évite une requête en base par appel authentifié)
+user_cache: Optional[UserCache] = None
+# Crédits: blocs loués à la base, débits en mémoire, journal écrit périodiquement
+credit_meter: Optional[CreditMeter] = None
+# Jobs de synthèse asynchrones (textes longs), état conservé en base
+job_manager: Optional[JobManager] = None
+# Politique CORS (origines lues une fois au démarrage)
+cors_policy: Optional[CORSPolicy] = None
+# Fichiers générés servis sur /outputs (ETag, Range, cache immuable; voir audio_delivery.py)
+audio_files: Optional[AudioFiles] = None
+
+
+def create_app() -> FastAPI:
+    """
+    Construire l'application (`uvicorn --factory api:create_app`)
+
+    Le plan de threads est appliqué avant la création du moteur (torch est
+    importé au chargement du modèle), puis les composants du service sont
+    construits et les middlewares, routes et `/outputs` montés. Les workers
+    démarrent dans le lifespan de l'application. Un seul appel construit
+    l'application, les suivants la retournent; `api.app` (pour
+    `uvicorn api:app`) appelle create_app.
+    """
+    global _app, thread_plan, engine, scheduler, audio_cache, segment_pipeline, retention
+    global user_cache, credit_meter, job_manager, cors_policy, audio_files
+    if _app is not None:
+        return _app
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    thread_plan = plan_threads()
+    apply_plan(thread_plan)
+    engine = KokoroEngine()
+    scheduler = SynthesisScheduler(engine, plan=thread_plan)
+    audio_cache = AudioCache(OUTPUT_DIR)
+    segment_pipeline = SegmentPipeline(scheduler)
+    retention = RetentionManager(OUTPUT_DIR, audio_cache)
+    user_cache = UserCache()
+    credit_meter = CreditMeter(on_change=user_cache.invalidate)
+    job_manager = JobManager(segment_pipeline, audio_cache, OUTPUT_DIR, credit_meter)
+    cors_policy = CORSPolicy.from_env()
+    audio_files = AudioFiles(OUTPUT_DIR)
+    _register_gauges()
+
+    app = FastAPI(
+        title="Kokoro TTS API",
+        description="API de synthèse vocale utilisant Kokoro",
+        version="1.0.0",
+        lifespan=_lifespan,
+    )
+
+    # Configuration CORS - doit être ajouté en premier (dernier dans la liste).
+    # Répond aussi aux préflights de toutes les routes, avec Access-Control-Max-Age
+    app.add_middleware(CORSMiddleware, **cors_policy.middleware_options())
+
+    # Journal d'accès (ASGI pur, compatible streaming) - ajouté après CORS
+    app.add_middleware(AccessLogMiddleware)
+
+    # Métriques des requêtes - ajouté en dernier pour mesurer toute la chaîne (préflights CORS compris)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    app.add_exception_handler(Exception, global_exception_handler)
+    app.include_router(router)
+    app.mount("/outputs", audio_files, name="outputs")
+    _app = app
+    return app
+
+
+def __getattr__(name: str):
+    # `api.app` (uvicorn api:app, TestClient) construit l'application au premier accès
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    await startup_event()
+    yield
+    await shutdown_event()
 
-app = FastAPI(
-    title="Kokoro TTS API",
-    description="API de synthèse vocale utilisant Kokoro",
-    version="1.0.0"
-)
 
-@app.on_event("startup")
 async def startup_event():
     """Handler de démarrage pour diagnostiquer les problèmes"""
     # Limiter l'utilisation mémoire de PyTorch pour éviter les SIGKILL sur Railway
+    # (threads OMP/MKL: plan appliqué par create_app, voir thread_plan.py)
     os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "max_split_size_mb:128")
-    os.environ.setdefault("OMP_NUM_THREADS", "1")
-    os.environ.setdefault("MKL_NUM_THREADS", "1")
     
     logging.info("=" * 50)
     logging.info("FastAPI application starting...")
@@ -51,7 +171,10 @@ async def startup_event():
     logging.info(f"Output directory: {OUTPUT_DIR}")
     logging.info(f"Output directory exists: {os.path.exists(OUTPUT_DIR)}")
     logging.info(f"PYTORCH_CUDA_ALLOC_CONF: {os.environ.get('PYTORCH_CUDA_ALLOC_CONF', 'not set')}")
-    logging.info(f"OMP_NUM_THREADS: {os.environ.get('OMP_NUM_THREADS', 'not set')}")
+    logging.info(f"Thread plan: {thread_plan.describe()}")
+    if thread_plan.oversubscribed:
+        logging.warning(f"Thread plan oversubscribes {thread_plan.cpus} CPU(s), "
+                        f"check TTS_WORKERS and TTS_THREADS_PER_WORKER")
     
     # Initialiser la base de données
     try:
@@ -59,61 +182,42 @@ async def startup_event():
     except Exception as e:
         logging.warning(f"Database initialization failed (might be expected if DB not available): {e}")
     
+    # Reconstruire l'index du cache audio depuis le disque
+    await run_in_threadpool(audio_cache.load_index)
+    retention.start()
+    credit_meter.start()
+    
+    # Démarrer les workers de synthèse: chaque worker charge et préchauffe le modèle
+    # en arrière-plan, /ready répond 503 jusqu'à la fin du préchauffage
+    logging.info(f"TTS engine mode: {engine.mode}")
+    await scheduler.start()
+    
+    # Reprendre les jobs interrompus par un redémarrage
+    try:
+        await job_manager.resume()
+    except Exception as e:
+        logging.warning(f"Could not resume synthesis jobs (database unavailable?): {e}")
+    
     logging.info("=" * 50)
 
-# Middleware pour logger les requêtes
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        origin = request.headers.get("origin", "no origin")
-        logging.info(f"{request.method} {request.url.path} from {request.client.host if request.client else 'unknown'} (origin: {origin})")
-        response = await call_next(request)
-        cors_headers = {k: v for k, v in response.headers.items() if k.lower().startswith("access-control")}
-        logging.info(f"Response: {response.status_code}, CORS headers: {cors_headers}")
-        return response
 
-# Autoriser le frontend et les domaines de déploiement
-origins = [
-    "https://tts-programme.vercel.app",
-    "https://kokoro-tts-api-production-b52e.up.railway.app",
-    "http://localhost:5173",  # Vite dev server
-    "http://localhost:4173",  # Vite preview server
-    "http://localhost:8000",  # API locale
-    "http://127.0.0.1:5173",
-    "http://127.0.0.1:4173",
-    "http://127.0.0.1:8000",  # API locale
-]
-
-# Configuration CORS - doit être ajouté en premier (dernier dans la liste)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
+async def shutdown_event():
+    """Arrêter proprement les jobs et les workers de synthèse"""
+    await job_manager.stop()
+    await retention.stop()
+    # Rendre à la base les crédits loués et non consommés
+    await credit_meter.stop()
+    await scheduler.stop()
 
-# Middleware de logging - ajouté après CORS
-app.add_middleware(LoggingMiddleware)
 
 # Exception handler global pour s'assurer que les headers CORS sont toujours présents
-@app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    """Handler global pour s'assurer que les headers CORS sont toujours présents même en cas d'erreur"""
-    from fastapi.responses import JSONResponse
+    """
+    Handler global pour s'assurer que les headers CORS sont toujours présents même en cas d'erreur
+    (les erreurs 500 sont produites en dehors de CORSMiddleware)
+    """
     import traceback
-    
-    origin = request.headers.get("origin", "")
-    allowed_origins = [
-        "https://tts-programme.vercel.app",
-        "https://kokoro-tts-api-production-b52e.up.railway.app",
-        "http://localhost:5173",
-        "http://localhost:4173",
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:4173",
-    ]
-    allow_origin = origin if origin in allowed_origins else allowed_origins[0]
-    
+
     error_detail = str(exc)
     error_traceback = traceback.format_exc()
     logging.error(f"Global exception: {error_detail}")
@@ -122,19 +226,19 @@ async def global_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
         status_code=500,
         content={"detail": f"Erreur serveur: {str(exc)[:200]}"},
-        headers={
-            "Access-Control-Allow-Origin": allow_origin,
-            "Access-Control-Allow-Credentials": "true",
-        }
+        headers=cors_policy.headers_for(request.headers.get("origin", "")),
     )
 
-# Servir les fichiers générés
-app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
-
 # ==================== AUTHENTIFICATION ====================
 
 # Security scheme pour JWT
 security = HTTPBearer()
+# Variante sans erreur automatique: /tts reste accessible sans compte
+optional_security = HTTPBearer(auto_error=False)
+
+# Synthèse sans compte (POST /tts, /tts/stream, /tts/batch, /tts/jobs), non décomptée;
+# 0 (défaut) = token obligatoire, pour que toute synthèse soit décomptée des crédits d'un utilisateur
+TTS_ALLOW_ANONYMOUS = os.environ.get("TTS_ALLOW_ANONYMOUS", "0").lower() in ("1", "true", "yes")
 
 
 # Modèles Pydantic pour l'authentification
@@ -155,13 +259,46 @@ class TokenResponse(BaseModel):
     user: dict
 
 
-# Dependency pour obtenir l'utilisateur actuel depuis le token
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+# Accès base synchrones (SQLAlchemy), exécutés hors de la boucle d'événements via run_in_threadpool
+def _get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def _create_user(db: Session, user: User) -> dict:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user.to_dict()
+
+
+def _record_login(db: Session, user: User) -> dict:
+    user.last_login = datetime.utcnow()
+    db.commit()
+    db.refresh(user)
+    return user.to_dict()
+
+
+def _save_user(db: Session, user: User) -> None:
+    db.commit()
+    db.refresh(user)
+
+
+def _load_principal(user_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        user = _get_user_by_id(db, user_id)
+        return user.to_dict() if user else None
+    finally:
+        db.close()
+
+
+def _user_id_from_credentials(credentials: HTTPAuthorizationCredentials) -> int:
     """
-    Récupérer l'utilisateur actuel depuis le token JWT
+    Identifiant utilisateur contenu dans le token JWT (401 si le token est invalide)
     """
     token = credentials.credentials
     payload = decode_access_token(token)
@@ -173,15 +310,29 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
+    # Le claim "sub" est une chaîne (RFC 7519): l'identifiant y est stocké en texte
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token invalide",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+# Dependency pour obtenir l'utilisateur actuel depuis le token
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Récupérer l'utilisateur actuel (objet SQLAlchemy) depuis le token JWT,
+    pour les routes qui le modifient
+    """
+    user_id = _user_id_from_credentials(credentials)
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await run_in_threadpool(_get_user_by_id, db, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -198,8 +349,70 @@ async def get_current_user(
     return user
 
 
+# Dependency pour les routes en lecture seule: utilisateur pris dans le cache TTL
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> dict:
+    """
+    Récupérer l'utilisateur actuel (dictionnaire `to_dict()`) depuis le token JWT,
+    sans requête en base si l'utilisateur est en cache
+    """
+    user_id = _user_id_from_credentials(credentials)
+    
+    principal = await user_cache.get_or_load(user_id, lambda: run_in_threadpool(_load_principal, user_id))
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Utilisateur non trouvé",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if not principal["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Compte utilisateur désactivé"
+        )
+    
+    return principal
+
+
+async def get_optional_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[dict]:
+    """
+    Utilisateur connecté s'il a envoyé un token valide, None sinon: un token
+    expiré resté dans le navigateur ne doit pas empêcher une synthèse anonyme
+    """
+    if credentials is None:
+        return None
+    try:
+        return await get_current_principal(credentials)
+    except HTTPException:
+        return None
+
+
+async def get_synthesis_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[dict]:
+    """
+    Utilisateur des routes de synthèse: token valide obligatoire, sauf requête
+    sans token si TTS_ALLOW_ANONYMOUS. Un token envoyé mais invalide ou expiré
+    est refusé (401), jamais traité comme anonyme: la synthèse ne doit pas
+    échapper au décompte des crédits
+    """
+    if credentials is not None:
+        return await get_current_principal(credentials)
+    if not TTS_ALLOW_ANONYMOUS:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentification requise pour la synthèse",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return None
+
+
 # Route d'inscription
-@app.post("/api/auth/register", response_model=TokenResponse)
+@router.post("/api/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     """
     Inscription d'un nouvel utilisateur
@@ -214,7 +427,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             )
         
         # Vérifier si l'email existe déjà
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await run_in_threadpool(_get_user_by_email, db, user_data.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -222,7 +435,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             )
         
         # Créer le nouvel utilisateur
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         new_user = User(
             email=user_data.email,
             hashed_password=hashed_password,
@@ -234,18 +447,16 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             preferences={}
         )
         
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        user_dict = await run_in_threadpool(_create_user, db, new_user)
         
         # Créer le token JWT
-        access_token = create_access_token(data={"sub": new_user.id})
+        access_token = create_access_token(data={"sub": str(user_dict["id"])})
         
-        logging.info(f"New user registered: {new_user.email}")
+        logging.info(f"New user registered: {user_dict['email']}")
         
         return TokenResponse(
             access_token=access_token,
-            user=new_user.to_dict()
+            user=user_dict
         )
     except HTTPException:
         # Re-raise les HTTPException (erreurs de validation)
@@ -260,13 +471,13 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 
 
 # Route de connexion
-@app.post("/api/auth/login", response_model=TokenResponse)
+@router.post("/api/auth/login", response_model=TokenResponse)
 async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     """
     Connexion d'un utilisateur
     """
     # Trouver l'utilisateur
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await run_in_threadpool(_get_user_by_email, db, user_data.email)
     
     if not user:
         raise HTTPException(
@@ -275,7 +486,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Vérifier le mot de passe
-    if not verify_password(user_data.password, user.hashed_password):
+    if not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect"
@@ -289,31 +500,34 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Mettre à jour la date de dernière connexion
-    user.last_login = datetime.utcnow()
-    db.commit()
+    user_dict = await run_in_threadpool(_record_login, db, user)
+    await user_cache.put(user_dict["id"], user_dict)
     
     # Créer le token JWT
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": str(user_dict["id"])})
     
-    logging.info(f"User logged in: {user.email}")
+    logging.info(f"User logged in: {user_dict['email']}")
     
     return TokenResponse(
         access_token=access_token,
-        user=user.to_dict()
+        user=user_dict
     )
 
 
 # Route pour obtenir les informations de l'utilisateur actuel
-@app.get("/api/auth/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+@router.get("/api/auth/me")
+async def get_current_user_info(current_user: dict = Depends(get_current_principal)):
     """
     Obtenir les informations de l'utilisateur actuellement connecté
     """
-    return current_user.to_dict()
+    if current_user["credits"] is not None:
+        # Les crédits loués par ce processus ne sont plus dans users.credits
+        return {**current_user, "credits": current_user["credits"] + credit_meter.leased(current_user["id"])}
+    return current_user
 
 
 # Route pour mettre à jour les préférences utilisateur
-@app.put("/api/auth/preferences")
+@router.put("/api/auth/preferences")
 async def update_preferences(
     preferences: dict,
     current_user: User = Depends(get_current_user),
@@ -323,14 +537,14 @@ async def update_preferences(
     Mettre à jour les préférences de l'utilisateur
     """
     current_user.preferences = preferences
-    db.commit()
-    db.refresh(current_user)
+    await run_in_threadpool(_save_user, db, current_user)
+    await user_cache.invalidate(current_user.id)
     
     return {"message": "Préférences mises à jour", "preferences": current_user.preferences}
 
 
 # Route pour ajouter une voix favorite
-@app.post("/api/auth/favorite-voice/{voice_name}")
+@router.post("/api/auth/favorite-voice/{voice_name}")
 async def add_favorite_voice(
     voice_name: str,
     current_user: User = Depends(get_current_user),
@@ -339,20 +553,44 @@ async def add_favorite_voice(
     """
     Ajouter une voix aux favoris
     """
-    if current_user.favorite_voices is None:
-        current_user.favorite_voices = []
+    favorite_voices = list(current_user.favorite_voices or [])
     
-    if voice_name not in current_user.favorite_voices:
-        current_user.favorite_voices.append(voice_name)
-        db.commit()
+    if voice_name not in favorite_voices:
+        # Nouvelle liste: une modification en place d'une colonne JSON n'est pas détectée
+        current_user.favorite_voices = favorite_voices + [voice_name]
+        await run_in_threadpool(_save_user, db, current_user)
+        await user_cache.invalidate(current_user.id)
     
     return {"message": "Voix ajoutée aux favoris", "favorite_voices": current_user.favorite_voices}
 
 
+# Historique de synthèse paginé par curseur
+@router.get("/api/history")
+async def get_history(
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    """
+    Historique de l'utilisateur, du plus récent au plus ancien. Passer `next_cursor`
+    en paramètre `cursor` pour obtenir la page suivante.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    try:
+        items, next_cursor = await run_in_threadpool(list_history, db, current_user["id"], limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+    return {"items": items, "next_cursor": next_cursor}
+
+
 # ==================== FIN AUTHENTIFICATION ====================
 
 
-@app.get("/")
+@router.get("/")
 async def root():
     """Route racine - Informations sur l'API"""
     return {
@@ -367,53 +605,144 @@ async def root():
     }
 
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
-    """Route de santé pour les vérifications de disponibilité"""
-    # Vérifier si kokoro est accessible
-    python_cmd = os.environ.get("PYTHON_CMD", "python")
-    try:
-        result = subprocess.run(
-            [python_cmd, "-m", "kokoro", "--help"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        kokoro_available = result.returncode == 0
-    except:
-        kokoro_available = False
-    
-    return {
-        "status": "healthy",
+    """
+    Route de santé: état lu en mémoire (moteur de chaque worker, dernière
+    synthèse réussie, file, pool de la base), sans lancer de processus ni de requête.
+    Le test complet de kokoro est sur /diagnostics/kokoro.
+    """
+    state = scheduler.health()
+    if not state["running"] or (state["workers"] and state["workers_alive"] == 0):
+        health_status = "unhealthy"
+    elif not state["ready"]:
+        health_status = "starting"
+    else:
+        health_status = "healthy"
+    # Mode et backend des workers prêts (un worker peut s'être replié en mode subprocess)
+    modes = sorted({entry["mode"] for entry in state["engines"] if entry["ready"] and entry["mode"]})
+    backends = sorted({entry["backend"] for entry in state["engines"] if entry["ready"] and entry["backend"]})
+    content = {
+        "status": health_status,
         "service": "kokoro-tts-api",
-        "kokoro_available": kokoro_available
+        "kokoro_available": state["engine_loaded"],
+        "engine_mode": ", ".join(modes) or None,
+        "engine_backend": ", ".join(backends) or None,
+        "synthesis": state,
+        "database_pool": pool_status(),
     }
+    if health_status == "unhealthy":
+        return JSONResponse(status_code=503, content=content)
+    return content
 
 
-@app.get("/healthy")
-@app.head("/healthy")
+@router.get("/healthy")
+@router.head("/healthy")
 async def healthy_check():
     """Route de santé alternative pour compatibilité avec Render"""
     return {"status": "healthy", "service": "kokoro-tts-api"}
 
 
-@app.get("/test-kokoro")
-async def test_kokoro():
-    """Endpoint de test pour vérifier que kokoro fonctionne"""
+@router.get("/ready")
+@router.head("/ready")
+async def readiness_check():
+    """
+    Sonde de disponibilité (readiness): 503 tant que les workers n'ont pas fini
+    de charger et préchauffer le modèle, pour que la plateforme n'envoie pas de
+    trafic à une instance froide. /healthy reste la sonde de vie (liveness).
+    """
+    workers = scheduler.workers
+    content = {
+        "status": "ready" if scheduler.ready else "warming_up",
+        "warmup_seconds": round(scheduler.warmup_seconds, 3) if scheduler.warmup_seconds is not None else None,
+        "workers_ready": sum(1 for worker in workers if worker.ready),
+        "workers": len(workers),
+        "warmup_errors": [
+            error for error in (worker.stats().get("warmup_error") for worker in workers) if error
+        ],
+    }
+    if not scheduler.ready:
+        return JSONResponse(status_code=503, content=content, headers={"Retry-After": "5"})
+    return content
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    """Profondeur de file, attente en file et état (mémoire, tâches) de chaque worker"""
+    return scheduler.stats()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Compteurs du cache audio (fichiers) et du cache mémoire des segments"""
+    return {
+        "audio": audio_cache.stats(),
+        "delivery": audio_files.stats(),
+        "segments": segment_pipeline.stats(),
+        "retention": retention.stats(),
+        "users": user_cache.stats(),
+        "credits": credit_meter.stats(),
+        "g2p": merge_stats(_engine_stats("g2p")),
+    }
+
+
+def _db_pool_gauge() -> dict:
+    pool = pool_status()
+    return {
+        (state,): pool[state]
+        for state in ("size", "checkedin", "checkedout", "overflow")
+        if isinstance(pool.get(state), (int, float))
+    }
+
+
+def _register_gauges() -> None:
+    """Jauges lues à chaque collecte, sans appel aux workers ni à la base"""
+    metrics.QUEUE_DEPTH.set_function(lambda: scheduler.health()["queue_depth"])
+    metrics.WORKERS.set_function(lambda: {
+        ("alive",): sum(1 for worker in scheduler.workers if worker.alive()),
+        ("ready",): sum(1 for worker in scheduler.workers if worker.ready),
+    })
+    metrics.WARMUP_SECONDS.set_function(lambda: scheduler.warmup_seconds)
+    metrics.DB_POOL_CONNECTIONS.set_function(_db_pool_gauge)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Métriques au format texte Prometheus: requêtes par route/statut/voix/format,
+    durées par étape de synthèse (attente en file, lancement des workers,
+    chargement du modèle, G2P, inférence, écriture, encodage), caractères/s,
+    facteur temps réel, octets écrits, file, workers et pool de la base
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Intervalle minimal entre deux diagnostics complets (chacun importe torch et synthétise)
+TTS_DIAGNOSTIC_INTERVAL_S = int(os.environ.get("TTS_DIAGNOSTIC_INTERVAL_S", "300"))
+
+_diagnostic_lock = asyncio.Lock()
+_last_diagnostic: Optional[dict] = None
+_last_diagnostic_at = 0.0
+
+
+def _run_kokoro_diagnostic() -> dict:
+    """Synthèse de test avec la CLI kokoro dans un processus séparé (bloquant)"""
     python_cmd = os.environ.get("PYTHON_CMD", "python")
-    test_output = os.path.join(OUTPUT_DIR, "test_kokoro.wav")
-    
+    fd, test_output = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    os.remove(test_output)
+    started = time.perf_counter()
     try:
         # Test simple avec un texte court
         cmd = [
             python_cmd,
             "-m", "kokoro",
-            "--voice", "ff_siwis",
+            "--voice", VOICE,
             "--text", "test",
             "--output-file", test_output,
             "--speed", "1.0"
         ]
-        
+
         logging.info(f"Testing kokoro with command: {' '.join(cmd)}")
         result = subprocess.run(
             cmd,
@@ -421,9 +750,9 @@ async def test_kokoro():
             text=True,
             timeout=300,  # 5 minutes pour permettre le téléchargement des modèles
         )
-        
+
         success = result.returncode == 0 and os.path.exists(test_output)
-        
+
         return {
             "kokoro_available": True,
             "test_successful": success,
@@ -431,12 +760,13 @@ async def test_kokoro():
             "stdout": result.stdout[:500] if result.stdout else None,
             "stderr": result.stderr[:500] if result.stderr else None,
             "output_file_exists": os.path.exists(test_output),
+            "seconds": round(time.perf_counter() - started, 2),
         }
     except subprocess.TimeoutExpired:
         return {
             "kokoro_available": True,
             "test_successful": False,
-            "error": "Timeout after 60 seconds"
+            "error": "Timeout after 300 seconds"
         }
     except Exception as e:
         logging.error(f"Error testing kokoro: {str(e)}", exc_info=True)
@@ -445,54 +775,201 @@ async def test_kokoro():
             "test_successful": False,
             "error": str(e)[:200]
         }
+    finally:
+        if os.path.exists(test_output):
+            os.remove(test_output)
+
+
+@router.get("/diagnostics/kokoro")
+@router.get("/test-kokoro")
+async def test_kokoro():
+    """
+    Diagnostic complet: synthèse de test avec la CLI kokoro (importe torch,
+    peut télécharger le modèle). Un seul à la fois et au plus un toutes les
+    TTS_DIAGNOSTIC_INTERVAL_S secondes; sinon 429 avec le dernier résultat.
+    """
+    global _last_diagnostic, _last_diagnostic_at
+
+    retry_after = math.ceil(_last_diagnostic_at + TTS_DIAGNOSTIC_INTERVAL_S - time.monotonic())
+    if _diagnostic_lock.locked() or (_last_diagnostic is not None and retry_after > 0):
+        return JSONResponse(
+            status_code=429,
+            content={
+                "detail": "Diagnostic déjà en cours ou lancé trop récemment",
+                "last_result": _last_diagnostic,
+            },
+            headers={"Retry-After": str(max(retry_after, 5))},
+        )
+
+    async with _diagnostic_lock:
+        result = await run_in_threadpool(_run_kokoro_diagnostic)
+        _last_diagnostic = {**result, "checked_at": datetime.utcnow().isoformat() + "Z"}
+        _last_diagnostic_at = time.monotonic()
+    return _last_diagnostic
+
+
+# Noms de voix Kokoro: langue + genre, "_", nom (ex: ff_siwis)
+VOICE_NAME_PATTERN = r"^[a-z]{2}_[a-z0-9]+$"
 
 
 class TTSRequest(BaseModel):
     text: constr(strip_whitespace=True, min_length=1, max_length=500)
+    # Format de sortie (wav, flac, opus/ogg, mp3); sans valeur, négocié depuis l'en-tête Accept
+    format: Optional[constr(to_lower=True, pattern=r"^(wav|flac|opus|ogg|mp3)$")] = None
+    sample_rate: Optional[int] = None
+    # Débit visé en kbps (formats compressés uniquement); le débit obtenu est dans `bitrate_actual`
+    bitrate: Optional[int] = None
+    # Sans valeur: préférences de l'utilisateur connecté, sinon VOICE / 1.0
+    voice: Optional[constr(pattern=VOICE_NAME_PATTERN)] = None
+    speed: Optional[confloat(ge=0.5, le=2.0)] = None
+    # Langue du G2P si elle diffère de celle de la voix (ex: "b" pour lire en anglais britannique avec "af_heart")
+    lang: Optional[constr(pattern=r"^[a-z]$")] = None
 
-VOICE = "ff_siwis"
-
-@app.options("/tts")
-async def options_tts(request: Request):
-    """Handler OPTIONS explicite pour CORS"""
-    from fastapi.responses import Response
-    origin = request.headers.get("origin", "")
-    # Vérifier si l'origine est autorisée
-    allowed_origins = [
-        "https://tts-programme.vercel.app",
-        "https://kokoro-tts-api-production-b52e.up.railway.app",
-        "http://localhost:5173",
-        "http://localhost:4173",
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:4173",
-    ]
-    allow_origin = origin if origin in allowed_origins else allowed_origins[0]
-    
-    logging.info(f"OPTIONS /tts from origin: {origin}, allowing: {allow_origin}")
-    
-    return Response(
-        status_code=200,
-        headers={
-            "Access-Control-Allow-Origin": allow_origin,
-            "Access-Control-Allow-Methods": "POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization",
-            "Access-Control-Allow-Credentials": "true",
-            "Access-Control-Max-Age": "3600",
-        }
-    )
+# Voix utilisée sans voix dans la requête ni préférence de l'utilisateur
+VOICE = DEFAULT_VOICE
+# Langues des voix proposées
+VOICE_LANGS = sorted({voice[0] for voice in TTS_VOICES})
 
-@app.post("/tts")
-async def generate_tts(request: TTSRequest, http_request: Request):
-    # Récupérer l'origine pour les headers CORS dans les erreurs
-    origin = http_request.headers.get("origin", "")
-    allowed_origins = [
-        "https://tts-programme.vercel.app",
-        "https://kokoro-tts-api-production-b52e.up.railway.app",
-        "http://localhost:5173",
-        "http://localhost:4173",
-    ]
-    allow_origin = origin if origin in allowed_origins else allowed_origins[0]
-    
+
+def _voice_settings(
+    voice: Optional[str], speed: Optional[float], principal: Optional[dict]
+) -> Tuple[str, float]:
+    """
+    Voix et vitesse d'une requête: valeurs demandées, sinon préférences de
+    l'utilisateur connecté (`default_voice`, `default_speed`), sinon VOICE / 1.0
+    """
+    preferences = (principal or {}).get("preferences") or {}
+    if not voice:
+        preferred = preferences.get("default_voice")
+        voice = preferred if isinstance(preferred, str) and is_available(preferred) else VOICE
+    if speed is None:
+        try:
+            speed = min(2.0, max(0.5, float(preferences.get("default_speed", 1.0))))
+        except (TypeError, ValueError):
+            speed = 1.0
+    return voice, speed
+
+
+def _voice_error(voice: str, lang: Optional[str] = None) -> Optional[str]:
+    """Message d'erreur (400) pour une voix ou une langue non proposée, sinon None"""
+    if not is_available(voice):
+        return f"Voix inconnue ou non disponible: {voice}. Voir GET /voices."
+    if lang and lang not in VOICE_LANGS:
+        return f"Langue non disponible: {lang} (disponibles: {', '.join(VOICE_LANGS)})."
+    return None
+
+
+async def _reserve_credits(principal: Optional[dict], amounts: List[int]) -> List[Optional[Charge]]:
+    """
+    Réserver les crédits de plusieurs synthèses (segments d'un flux, textes
+    d'un lot) d'un utilisateur au solde limité, tout ou rien: si le solde ne
+    couvre pas le total, les réservations faites sont remboursées et
+    InsufficientCreditsError est levée. None pour ce qui n'est pas débité.
+    """
+    if principal is None or principal["credits"] is None:
+        return [None] * len(amounts)
+    charges: List[Optional[Charge]] = []
+    try:
+        for amount in amounts:
+            charges.append(await credit_meter.reserve(principal["id"], amount) if amount else None)
+    except InsufficientCreditsError as e:
+        _refund_credits(charges)
+        reserved = sum(charge.amount for charge in charges if charge is not None)
+        raise InsufficientCreditsError(sum(amounts), e.available + reserved)
+    return charges
+
+
+def _refund_credits(charges: List[Optional[Charge]]) -> None:
+    """Rembourser les réservations qui n'ont pas été réglées (sans effet sur les autres)"""
+    for charge in charges:
+        if charge is not None:
+            credit_meter.refund(charge)
+
+
+def _engine_stats(name: str) -> List[dict]:
+    """
+    Statistiques d'un composant (`voices`, `g2p`) de chaque moteur (un seul moteur partagé en mode thread)
+    """
+    if scheduler.worker_mode == "thread":
+        return [getattr(engine, name).stats()]
+    return [getattr(worker, f"{name}_stats") for worker in scheduler.workers if getattr(worker, f"{name}_stats", None)]
+
+
+@router.get("/voices")
+async def list_voices(principal: Optional[dict] = Depends(get_optional_principal)):
+    """
+    Voix disponibles, avec leur résidence dans les workers et leurs temps de chargement
+    """
+    registries = _engine_stats("voices")
+    favorites = set((principal or {}).get("favorite_voices") or [])
+    default_voice, default_speed = _voice_settings(None, None, principal)
+    voices = []
+    for voice in TTS_VOICES:
+        loads = [registry["voices"][voice] for registry in registries if voice in registry["voices"]]
+        load_count = sum(entry["loads"] for entry in loads)
+        voices.append({
+            **voice_info(voice),
+            "favorite": voice in favorites,
+            # Nombre de moteurs (workers) qui ont le pack de voix en mémoire
+            "resident_workers": sum(1 for registry in registries if voice in registry["resident"]),
+            "uses": sum(entry["uses"] for entry in loads),
+            "loads": load_count,
+            "evictions": sum(entry["evictions"] for entry in loads),
+            "mean_load_ms": round(
+                sum(entry["mean_load_ms"] * entry["loads"] for entry in loads if entry["loads"]) / load_count, 1
+            ) if load_count else None,
+        })
+    return {
+        "default_voice": default_voice,
+        "default_speed": default_speed,
+        "languages": {lang: LANGUAGES.get(lang, lang) for lang in VOICE_LANGS},
+        "voices": voices,
+        "workers": [
+            {key: registry[key] for key in ("resident", "resident_bytes", "lru_bytes", "max_bytes",
+                                            "warm_hits", "cold_loads", "evictions", "warm_ratio")}
+            for registry in registries
+        ],
+    }
+
+
+class G2PPrewarmRequest(BaseModel):
+    phrases: conlist(constr(strip_whitespace=True, min_length=1, max_length=500), min_length=1, max_length=1000)
+    # Langue du G2P; sans valeur, celle de `voice` (ou de VOICE)
+    lang: Optional[constr(pattern=r"^[a-z]$")] = None
+    voice: Optional[constr(pattern=VOICE_NAME_PATTERN)] = None
+
+
+@router.post("/tts/g2p/prewarm")
+async def prewarm_g2p(request: G2PPrewarmRequest, principal: dict = Depends(get_current_principal)):
+    """
+    Précalculer les phonèmes d'une liste de phrases dans le cache G2P de chaque
+    worker (découpées en phrases comme pour POST /tts, sans synthèse audio)
+    """
+    voice = request.voice or VOICE
+    voice_error = _voice_error(voice, request.lang)
+    if voice_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=voice_error)
+    lang = request.lang or voice[0]
+    sentences = [segment for phrase in request.phrases for segment in split_sentences(phrase)]
+    logging.info(f"G2P prewarm requested by user {principal['id']}: {len(sentences)} sentence(s), lang {lang}")
+
+    try:
+        results = await scheduler.broadcast("prewarm_g2p", texts=sentences, lang=lang)
+    except (SchedulerUnavailableError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Service de synthèse indisponible: {e}")
+    return {
+        "lang": lang,
+        "sentences": len(sentences),
+        "engines": results,
+        "g2p": merge_stats(_engine_stats("g2p")),
+    }
+
+@router.post("/tts")
+async def generate_tts(
+    request: TTSRequest,
+    http_request: Request,
+    principal: Optional[dict] = Depends(get_synthesis_principal),
+):
     logging.info("POST /tts received - Starting TTS generation")
     text = request.text.strip()
     logging.info(f"Text received: {text[:50]}... (length: {len(text)})")
@@ -501,97 +978,136 @@ async def generate_tts(request: TTSRequest, http_request: Request):
         return JSONResponse(
             status_code=400,
             content={"detail": "Le texte ne peut pas être vide."},
-            headers={
-                "Access-Control-Allow-Origin": allow_origin,
-                "Access-Control-Allow-Credentials": "true",
-            }
         )
 
-    output_file = f"output_{uuid.uuid4().hex}.wav"
-    output_path = os.path.join(OUTPUT_DIR, output_file)
+    try:
+        audio_format = resolve_format(request.format) or negotiate_format(http_request.headers.get("accept"))
+        sample_rate, bitrate = normalize_options(audio_format, request.sample_rate, request.bitrate)
+    except FormatError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": str(e)},
+        )
+
+    voice, speed = _voice_settings(request.voice, request.speed, principal)
+    voice_error = _voice_error(voice, request.lang)
+    if voice_error:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": voice_error},
+        )
+    # Étiquettes posées après validation: une voix inconnue ne crée pas de série de métriques
+    metrics.label_request(voice=voice, format=audio_format)
 
-    # Utiliser python du système (fonctionne sur Linux/Docker)
-    python_cmd = os.environ.get("PYTHON_CMD", "python")
-    cmd = [
-        python_cmd,
-        "-m", "kokoro",
-        "--voice", VOICE,
-        "--text", text,
-        "--output-file", output_path,
-        "--speed", "1.0"
-    ]
+    # Débit des crédits avant la synthèse (sans accès base tant que le bloc loué suffit)
+    charge = None
+    if principal is not None and principal["credits"] is not None:
+        try:
+            charge = await credit_meter.reserve(principal["id"], credit_meter.cost(text))
+        except InsufficientCreditsError as e:
+            logging.info(f"Insufficient credits for user {principal['id']}: {e}")
+            return JSONResponse(
+                status_code=402,
+                content={"detail": f"Crédits insuffisants: {e}"},
+            )
 
-    logging.info(f"Executing command: {' '.join(cmd)}")
-    logging.info(f"Output file will be: {output_path}")
+    key = cache_key(text, voice, speed, lang=request.lang)
+    logging.info(f"Cache key: {key} (engine mode: {engine.mode}, voice: {voice}, speed: {speed}, "
+                 f"format: {audio_format} {sample_rate} Hz)")
 
+    succeeded = False
     try:
-        def _run():
-            logging.info("Starting kokoro subprocess...")
-            try:
-                result = subprocess.run(
-                    cmd,
-                    check=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=300,  # 5 minutes pour permettre le téléchargement des modèles si nécessaire
-                )
-                logging.info(f"Subprocess completed. Return code: {result.returncode}")
-                if result.stdout:
-                    logging.info(f"Subprocess stdout (first 1000 chars): {result.stdout[:1000]}")
-                if result.stderr:
-                    logging.warning(f"Subprocess stderr (first 1000 chars): {result.stderr[:1000]}")
-                return result
-            except subprocess.TimeoutExpired as e:
-                logging.error(f"kokoro subprocess timed out after 120 seconds")
-                raise
-            except subprocess.CalledProcessError as e:
-                logging.error(f"kokoro subprocess failed with return code {e.returncode}")
-                logging.error(f"stdout: {e.stdout[:1000] if e.stdout else 'None'}")
-                logging.error(f"stderr: {e.stderr[:1000] if e.stderr else 'None'}")
-                raise
-            except Exception as e:
-                logging.error(f"Unexpected error in subprocess: {str(e)}", exc_info=True)
-                raise
-
-        logging.info("Running kokoro in threadpool...")
-        completed_process = await run_in_threadpool(_run)
-        logging.info("Threadpool execution completed successfully")
-        if not os.path.exists(output_path):
+        logging.info("Submitting synthesis to the worker pool...")
+        started = time.perf_counter()
+        output_file, cached = await audio_cache.get_or_create(
+            key, lambda: segment_pipeline.synthesize(text, voice, speed, lang=request.lang)
+        )
+        synthesis_ms = (time.perf_counter() - started) * 1000
+        logging.info(f"Synthesis completed successfully (cache {'hit' if cached else 'miss'})")
+        output_file = await audio_cache.get_variant(key, audio_format, sample_rate, bitrate)
+        if not os.path.exists(os.path.join(OUTPUT_DIR, output_file)):
             return JSONResponse(
                 status_code=500,
                 content={"detail": "Le fichier audio n'a pas été généré."},
-                headers={
-                    "Access-Control-Allow-Origin": allow_origin,
-                    "Access-Control-Allow-Credentials": "true",
-                }
             )
-        logging.info(
-            "TTS generated successfully: %s",
-            completed_process.stdout.strip() or "No output",
-        )
-        # Retourner avec headers CORS
+        logging.info("TTS generated successfully: %s", output_file)
+        # Débit réellement produit: libsndfile ne règle qu'un niveau de compression
+        bitrate_actual = None
+        if bitrate is not None:
+            bitrate_actual = measured_bitrate(os.path.join(OUTPUT_DIR, output_file), audio_cache.path_for(key))
+        # Historique enregistré après l'envoi de la réponse (utilisateur connecté uniquement)
+        background = None
+        if principal is not None:
+            background = BackgroundTask(
+                record_synthesis,
+                user_id=principal["id"],
+                text=text,
+                voice=voice,
+                speed=speed,
+                audio_format=audio_format,
+                audio_file=f"/outputs/{output_file}",
+                source_path=audio_cache.path_for(key),
+                synthesis_ms=synthesis_ms,
+                cached=cached,
+            )
         response = JSONResponse(
-            content={"audio_file": f"/outputs/{output_file}"},
+            content={
+                "audio_file": f"/outputs/{output_file}",
+                "cached": cached,
+                "voice": voice,
+                "speed": speed,
+                "format": audio_format,
+                "media_type": FORMATS[audio_format].media_type,
+                "sample_rate": sample_rate,
+                "bitrate": bitrate,
+                "bitrate_actual": bitrate_actual,
+            },
             headers={
-                "Access-Control-Allow-Origin": allow_origin,
-                "Access-Control-Allow-Credentials": "true",
-            }
+                # Le format peut dépendre de l'en-tête Accept
+                "Vary": "Accept",
+            },
+            background=background,
         )
+        succeeded = True
         return response
+    except QueueFullError as e:
+        logging.warning(f"Synthesis queue full, rejecting request (retry after {e.retry_after}s)")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Trop de demandes de synthèse en cours. Veuillez réessayer dans quelques instants."},
+            headers={
+                "Retry-After": str(e.retry_after),
+            }
+        )
+    except SchedulerUnavailableError as e:
+        logging.warning(f"Synthesis scheduler unavailable: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service de synthèse indisponible: {e}"},
+            headers={
+                "Retry-After": str(e.retry_after),
+            }
+        )
+    except WorkerCrashedError as e:
+        logging.error(f"TTS worker crashed: {e}")
+        if e.returncode == -9:
+            detail_msg = "Le processus a été tué par le système (dépassement de mémoire). Railway free tier a des limites strictes. Essayez avec un texte plus court ou passez à un plan payant."
+        else:
+            detail_msg = f"La génération audio a échoué: {e}"
+        return JSONResponse(
+            status_code=500,
+            content={"detail": detail_msg},
+        )
     except TimeoutExpired:
-        logging.error("TTS generation timed out after 120 seconds.")
+        logging.error("TTS generation timed out after 300 seconds.")
         return JSONResponse(
             status_code=504,
             content={"detail": "La génération audio a pris trop de temps. Veuillez réessayer avec un texte plus court."},
-            headers={
-                "Access-Control-Allow-Origin": allow_origin,
-                "Access-Control-Allow-Credentials": "true",
-            }
         )
     except CalledProcessError as e:
         error_msg = e.stderr or e.stdout or str(e)
         logging.error("TTS generation failed: %s", error_msg)
-        logging.error("Command: %s", " ".join(cmd))
+        logging.error("Command: %s", " ".join(e.cmd) if isinstance(e.cmd, list) else e.cmd)
         
         # Détecter si c'est un SIGKILL (processus tué par le système)
         if "SIGKILL" in str(e) or e.returncode == -9:
@@ -602,18 +1118,380 @@ async def generate_tts(request: TTSRequest, http_request: Request):
         return JSONResponse(
             status_code=500,
             content={"detail": detail_msg},
-            headers={
-                "Access-Control-Allow-Origin": allow_origin,
-                "Access-Control-Allow-Credentials": "true",
-            }
         )
     except Exception as e:
         logging.error("Unexpected error: %s", str(e), exc_info=True)
         return JSONResponse(
             status_code=500,
             content={"detail": f"Erreur inattendue: {str(e)[:200]}"},
-            headers={
-                "Access-Control-Allow-Origin": allow_origin,
-                "Access-Control-Allow-Credentials": "true",
-            }
         )
+    finally:
+        # Synthèse refusée ou échouée: crédits remboursés
+        if charge is not None:
+            if succeeded:
+                credit_meter.commit(charge)
+            else:
+                credit_meter.refund(charge)
+
+
+@router.post("/tts/stream")
+async def generate_tts_stream(
+    request: TTSRequest,
+    principal: Optional[dict] = Depends(get_synthesis_principal),
+):
+    """
+    Synthèse en streaming: le texte est découpé en phrases et l'audio de chaque
+    phrase est envoyé dès qu'il est prêt (WAV PCM 16 bits de longueur inconnue),
+    pour que le client puisse commencer la lecture après la première phrase.
+    """
+    if request.format not in (None, "wav") or request.sample_rate not in (None, SAMPLE_RATE):
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Le streaming ne produit que du WAV PCM à {SAMPLE_RATE} Hz; utilisez POST /tts pour les autres formats."},
+        )
+
+    voice, speed = _voice_settings(request.voice, request.speed, principal)
+    voice_error = _voice_error(voice, request.lang)
+    if voice_error:
+        return JSONResponse(status_code=400, content={"detail": voice_error})
+    metrics.label_request(voice=voice, format="wav")
+
+    segments = split_sentences(request.text)
+    logging.info(f"POST /tts/stream received - {len(segments)} segment(s), voice {voice}")
+    if not segments:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Le texte ne peut pas être vide."},
+        )
+
+    # Crédits réservés avant de répondre (402), segment par segment: un segment
+    # envoyé est débité, les suivants sont remboursés si le flux s'interrompt
+    try:
+        charges = await _reserve_credits(principal, credit_meter.split_cost(segments))
+    except InsufficientCreditsError as e:
+        logging.info(f"Insufficient credits for user {principal['id']}: {e}")
+        return JSONResponse(
+            status_code=402,
+            content={"detail": f"Crédits insuffisants: {e}"},
+        )
+
+    # Le premier segment est mis en file avant de répondre: un refus reste une vraie erreur HTTP
+    try:
+        first = await segment_pipeline.enqueue_segment(segments[0], voice, speed, wait=False, lang=request.lang)
+    except QueueFullError as e:
+        _refund_credits(charges)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Trop de demandes de synthèse en cours. Veuillez réessayer dans quelques instants."},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except SchedulerUnavailableError as e:
+        _refund_credits(charges)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service de synthèse indisponible: {e}"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    async def _stream():
+        pending = [first]
+        gap = b"\x00\x00" * int(SAMPLE_RATE * TTS_SEGMENT_SILENCE_MS / 1000)
+        try:
+            yield wav_stream_header()
+            for index in range(len(segments)):
+                # Mettre le segment suivant en file pendant que celui-ci se termine
+                if index + 1 < len(segments):
+                    pending.append(await segment_pipeline.enqueue_segment(
+                        segments[index + 1], voice, speed, lang=request.lang
+                    ))
+                audio = await pending.pop(0)
+                if len(segments) > 1:
+                    audio = edge_fade(trim_silence(audio))
+                if index:
+                    yield gap
+                yield to_pcm16(audio)
+                if charges[index] is not None:
+                    credit_meter.commit(charges[index])
+            logging.info(f"Streaming completed ({len(segments)} segment(s))")
+        except Exception as e:
+            # Les en-têtes sont déjà partis: on ne peut que terminer le flux
+            logging.error(f"Streaming synthesis failed: {e}", exc_info=True)
+        finally:
+            for future in pending:
+                future.cancel()
+            # Segments non envoyés (erreur, client parti): crédits remboursés
+            _refund_credits(charges)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="audio/wav",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# Nombre maximal de textes par job envoyé à un worker (borne la mémoire et laisse
+# passer les autres requêtes entre deux morceaux d'un gros lot)
+BATCH_JOB_SIZE = 32
+
+
+class TTSBatchItem(BaseModel):
+    text: constr(strip_whitespace=True, min_length=1, max_length=500)
+    voice: Optional[constr(pattern=VOICE_NAME_PATTERN)] = None
+    speed: Optional[confloat(ge=0.5, le=2.0)] = None
+
+
+class TTSBatchRequest(BaseModel):
+    items: conlist(TTSBatchItem, min_length=1, max_length=500)
+    archive: Optional[Literal["zip", "tar"]] = None
+
+
+def _build_archive(kind: str, manifest: dict) -> str:
+    """
+    Construire une archive zip/tar des fichiers du lot (+ manifest.json) dans un fichier temporaire
+    """
+    fd, path = tempfile.mkstemp(suffix=f".{kind}")
+    os.close(fd)
+    manifest_bytes = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    entries = [
+        (os.path.join(OUTPUT_DIR, item["audio_file"][len("/outputs/"):]), f"{item['index']:04d}.wav")
+        for item in manifest["items"] if item.get("audio_file")
+    ]
+    if kind == "zip":
+        # Le WAV se compresse mal: stockage sans compression
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+            for source, name in entries:
+                archive.write(source, name)
+            archive.writestr("manifest.json", manifest_bytes)
+    else:
+        with tarfile.open(path, "w") as archive:
+            for source, name in entries:
+                archive.add(source, arcname=name)
+            info = tarfile.TarInfo("manifest.json")
+            info.size = len(manifest_bytes)
+            info.mtime = int(time.time())
+            with tempfile.SpooledTemporaryFile() as buffer:
+                buffer.write(manifest_bytes)
+                buffer.seek(0)
+                archive.addfile(info, buffer)
+    return path
+
+
+@router.post("/tts/batch")
+async def generate_tts_batch(
+    batch: TTSBatchRequest,
+    principal: Optional[dict] = Depends(get_synthesis_principal),
+):
+    """
+    Synthèse d'un lot de textes: les textes sont regroupés par voix et chaque
+    groupe passe dans un seul job worker (voix chargée une fois). Retourne un
+    manifest (fichier et temps de synthèse par texte) ou une archive zip/tar.
+    Sans voix ni vitesse, un texte prend les préférences de l'utilisateur connecté.
+    """
+    started = time.perf_counter()
+    logging.info(f"POST /tts/batch received - {len(batch.items)} item(s)")
+
+    settings = [_voice_settings(item.voice, item.speed, principal) for item in batch.items]
+    for voice, _ in settings:
+        voice_error = _voice_error(voice)
+        if voice_error:
+            return JSONResponse(status_code=400, content={"detail": voice_error})
+
+    # Chaque texte est débité comme un POST /tts (402 si le solde ne couvre pas le lot),
+    # puis remboursé s'il n'a pas pu être synthétisé
+    try:
+        charges = await _reserve_credits(principal, [credit_meter.cost(item.text) for item in batch.items])
+    except InsufficientCreditsError as e:
+        logging.info(f"Insufficient credits for user {principal['id']}: {e}")
+        return JSONResponse(status_code=402, content={"detail": f"Crédits insuffisants: {e}"})
+    try:
+        return await _synthesize_batch(batch, settings, charges, started)
+    finally:
+        _refund_credits(charges)
+
+
+async def _synthesize_batch(
+    batch: TTSBatchRequest, settings: List[Tuple[str, float]], charges: List[Optional[Charge]], started: float
+):
+    """Synthèse des textes du lot (voix et vitesse résolues), crédits des textes produits réglés"""
+    results: List[dict] = []
+    misses_by_voice = defaultdict(list)
+    # Textes identiques dans le même lot: une seule synthèse
+    indexes_by_key = defaultdict(list)
+    for index, (item, (voice, speed)) in enumerate(zip(batch.items, settings)):
+        key = cache_key(item.text, voice, speed)
+        filename = audio_cache.get(key)
+        results.append({
+            "index": index,
+            "text": item.text,
+            "voice": voice,
+            "speed": speed,
+            "audio_file": f"/outputs/{filename}" if filename else None,
+            "cached": filename is not None,
+            "synthesis_seconds": 0.0 if filename else None,
+        })
+        if filename is None:
+            if key not in indexes_by_key:
+                misses_by_voice[voice].append((index, key, item.text, speed))
+            indexes_by_key[key].append(index)
+
+    # Un job par groupe de voix (découpé en morceaux de BATCH_JOB_SIZE textes)
+    jobs = []
+    try:
+        for voice, entries in misses_by_voice.items():
+            for offset in range(0, len(entries), BATCH_JOB_SIZE):
+                chunk = entries[offset:offset + BATCH_JOB_SIZE]
+                kwargs = {"items": [(text, speed) for _, _, text, speed in chunk], "voice": voice}
+                # Le premier job est admis ou refusé tout de suite; les suivants attendent une place
+                future = scheduler.enqueue("synthesize_batch", **kwargs) if not jobs else \
+                    await scheduler.enqueue_wait("synthesize_batch", **kwargs)
+                jobs.append((voice, chunk, future))
+    except QueueFullError as e:
+        for _, _, future in jobs:
+            future.cancel()
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Trop de demandes de synthèse en cours. Veuillez réessayer dans quelques instants."},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except SchedulerUnavailableError as e:
+        for _, _, future in jobs:
+            future.cancel()
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service de synthèse indisponible: {e}"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    groups = defaultdict(lambda: {"items": 0, "synthesis_seconds": 0.0})
+    failed = 0
+    for voice, chunk, future in jobs:
+        try:
+            outputs = await future
+        except Exception as e:
+            logging.error(f"Batch job failed for voice {voice}: {e}")
+            for _, key, _, _ in chunk:
+                for index in indexes_by_key[key]:
+                    results[index]["error"] = str(e)[:200]
+                    failed += 1
+            continue
+        for (_, key, _, _), (audio, seconds) in zip(chunk, outputs):
+            filename = await audio_cache.store(key, audio)
+            for index in indexes_by_key[key]:
+                results[index]["audio_file"] = f"/outputs/{filename}"
+                results[index]["synthesis_seconds"] = round(seconds, 3)
+            groups[voice]["items"] += 1
+            groups[voice]["synthesis_seconds"] += seconds
+
+    manifest = {
+        "items": results,
+        "count": len(results),
+        "cached": sum(1 for r in results if r["cached"]),
+        "failed": failed,
+        "groups": [
+            {"voice": voice, "items": group["items"], "synthesis_seconds": round(group["synthesis_seconds"], 3)}
+            for voice, group in groups.items()
+        ],
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    logging.info(f"Batch completed: {manifest['count']} item(s), {manifest['cached']} cached, "
+                 f"{failed} failed in {manifest['total_seconds']}s")
+    for result, charge in zip(results, charges):
+        if charge is not None and result["audio_file"]:
+            credit_meter.commit(charge)
+
+    if batch.archive:
+        archive_path = await run_in_threadpool(_build_archive, batch.archive, manifest)
+        return FileResponse(
+            archive_path,
+            media_type="application/zip" if batch.archive == "zip" else "application/x-tar",
+            filename=f"tts-batch.{batch.archive}",
+            background=BackgroundTask(os.remove, archive_path),
+        )
+    return JSONResponse(content=manifest)
+
+
+class TTSJobRequest(BaseModel):
+    text: constr(strip_whitespace=True, min_length=1, max_length=JOB_MAX_CHARS)
+    voice: Optional[constr(pattern=VOICE_NAME_PATTERN)] = None
+    speed: Optional[confloat(ge=0.5, le=2.0)] = None
+
+
+@router.post("/tts/jobs", status_code=202)
+async def create_tts_job(request: TTSJobRequest, principal: Optional[dict] = Depends(get_synthesis_principal)):
+    """
+    Créer un job de synthèse pour un texte long: retourne immédiatement l'id du
+    job, à suivre avec GET /tts/jobs/{id} ou GET /tts/jobs/{id}/events (SSE).
+    Les crédits sont débités avant la mise en file et remboursés si le job échoue.
+    """
+    voice, speed = _voice_settings(request.voice, request.speed, principal)
+    voice_error = _voice_error(voice)
+    if voice_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=voice_error)
+    metrics.label_request(voice=voice, format="wav")
+
+    charge = None
+    if principal is not None and principal["credits"] is not None:
+        try:
+            charge = await credit_meter.reserve(principal["id"], credit_meter.cost(request.text))
+        except InsufficientCreditsError as e:
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=f"Crédits insuffisants: {e}"
+            )
+
+    try:
+        job = await job_manager.create(
+            request.text,
+            voice,
+            speed,
+            user_id=principal["id"] if principal else None,
+            credits_charged=charge.amount if charge else 0,
+        )
+    except Exception as e:
+        if charge is not None:
+            credit_meter.refund(charge)
+        logging.error(f"Could not create synthesis job: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Impossible d'enregistrer le job de synthèse"
+        )
+    return job
+
+
+@router.get("/tts/jobs/{job_id}")
+async def get_tts_job(job_id: str):
+    """
+    État et progression d'un job de synthèse
+    """
+    try:
+        return await job_manager.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job introuvable")
+
+
+@router.get("/tts/jobs/{job_id}/events")
+async def tts_job_events(job_id: str):
+    """
+    Progression d'un job en Server-Sent Events, jusqu'à sa fin (commentaire
+    keepalive périodique pour que les proxys ne ferment pas la connexion)
+    """
+    try:
+        await job_manager.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job introuvable")
+
+    async def _events():
+        async for job in job_manager.events(job_id):
+            if job is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
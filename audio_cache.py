@@ -0,0 +1,350 @@
+"""
+Cache audio adressé par contenu
+
+Une requête (texte normalisé, voix, vitesse, version du modèle) donne toujours
+le même fichier `<sha256>.wav`: une phrase déjà synthétisée est renvoyée
+directement. Le cache n'a pas de budget propre: la taille et l'âge des
+fichiers de outputs/ sont gérés par RetentionManager (retention.py), qui
+conserve ceux de l'historique des utilisateurs. Les écritures sont
+atomiques, et des requêtes identiques simultanées ne déclenchent qu'une seule
+synthèse (single-flight), menée à son terme même si la requête qui l'a lancée
+est annulée. Les variantes encodées (Opus, MP3, FLAC, autre
+fréquence) sont rangées à côté du WAV source; la rétention les supprime
+avec lui (même unité de suppression, voir retention.py). Avec
+TTS_OUTPUT_SHARDING=1, les fichiers sont répartis dans `ab/cd/<sha256>.wav`
+pour qu'aucun répertoire ne contienne des centaines de milliers d'entrées.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from audio_formats import encode_file, variant_filename
+from tts_engine import MODEL_VERSION, write_wav
+
+# Répartition des fichiers dans des sous-répertoires ab/cd/ (préfixe de la clé)
+TTS_OUTPUT_SHARDING = os.environ.get("TTS_OUTPUT_SHARDING", "0").lower() in ("1", "true", "yes")
+
+_KEY_FILE_RE = re.compile(r"^[0-9a-f]{64}\.wav$")
+# Variantes encodées: <clé>.<fréquence>[.<débit>k].<ext>
+_VARIANT_FILE_RE = re.compile(r"^([0-9a-f]{64})\.[0-9]+(?:\.[0-9]+k)?\.(?:wav|flac|ogg|mp3)$")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def key_for_file(name: str) -> Optional[str]:
+    """
+    Clé de cache d'un fichier (WAV source ou variante encodée), None si le fichier n'appartient pas au cache
+    """
+    name = os.path.basename(name)
+    if _KEY_FILE_RE.match(name):
+        return name[:64]
+    match = _VARIANT_FILE_RE.match(name)
+    return match.group(1) if match else None
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliser un texte pour la clé de cache (Unicode NFC, espaces fusionnés)
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(
+    text: str, voice: str, speed: float, model_version: str = MODEL_VERSION, lang: Optional[str] = None
+) -> str:
+    """
+    Clé de cache: sha256 du texte normalisé, de la voix, de la vitesse et de la version du modèle
+    (et de la langue si elle diffère de celle de la voix; les clés existantes restent valides)
+    """
+    fields = [normalize_text(text), voice, round(float(speed), 3), model_version]
+    if lang and lang != voice[:1]:
+        fields.append(lang)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Index des fichiers WAV d'un répertoire (taille, ordre d'utilisation)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sharded: bool = TTS_OUTPUT_SHARDING,
+    ):
+        self.directory = directory
+        self.sharded = sharded
+        # clé -> taille en octets (source + variantes), du moins récemment utilisé au plus récent
+        self._index: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._total_bytes = 0
+        # clé -> noms (relatifs au répertoire) des fichiers de variantes encodées
+        self._variants: Dict[str, Set[str]] = {}
+        # Travaux partagés en cours (clé, ou clé:variante) -> tâche
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Entrées épinglées (segments d'un job en cours) -> nombre d'épinglages
+        self._pinned: Dict[str, int] = {}
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.encodes = 0
+
+    def _relative(self, key: str, name: str) -> str:
+        """Chemin relatif d'un fichier de la clé (dans ab/cd/ si le cache est réparti)"""
+        return f"{key[:2]}/{key[2:4]}/{name}" if self.sharded else name
+
+    def filename(self, key: str) -> str:
+        return self._relative(key, f"{key}.wav")
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, self.filename(key))
+
+    def load_index(self) -> None:
+        """
+        Reconstruire l'index depuis le disque (ordre des dates de modification)
+        """
+        entries = []
+        variants: Dict[str, Dict[str, int]] = {}
+        moved = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                key = key_for_file(name)
+                if key is None:
+                    continue
+                path = os.path.join(root, name)
+                # Fichier rangé selon l'autre disposition (répartition activée ou désactivée): le déplacer
+                expected = os.path.join(self.directory, self._relative(key, name))
+                if path != expected:
+                    os.makedirs(os.path.dirname(expected), exist_ok=True)
+                    os.replace(path, expected)
+                    moved += 1
+                stat = os.stat(expected)
+                if _KEY_FILE_RE.match(name):
+                    entries.append((stat.st_mtime, key, stat.st_size))
+                else:
+                    variants.setdefault(key, {})[self._relative(key, name)] = stat.st_size
+        if moved:
+            logging.info(f"Audio cache: moved {moved} files to the {'sharded' if self.sharded else 'flat'} layout")
+        entries.sort()
+        self._index = collections.OrderedDict(
+            (key, size + sum(variants.get(key, {}).values())) for _, key, size in entries
+        )
+        self._variants = {key: set(variants[key]) for key in self._index if key in variants}
+        # Variantes dont le WAV source a disparu: plus rien ne les référence
+        for key, files in variants.items():
+            if key not in self._index:
+                for name in files:
+                    self._remove(name)
+        self._total_bytes = sum(self._index.values())
+        logging.info(f"Audio cache loaded: {len(self._index)} files, {self._total_bytes / 1e6:.1f} MB")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Nom du fichier en cache pour cette clé (et le marquer comme récent), ou None
+        """
+        if key not in self._index:
+            return None
+        path = self.path_for(key)
+        try:
+            # La date de modification sert d'âge à la rétention (fichiers les moins utilisés supprimés d'abord)
+            os.utime(path)
+        except FileNotFoundError:
+            self._total_bytes -= self._index.pop(key)
+            for name in self._variants.pop(key, ()):
+                self._remove(name)
+            return None
+        self._index.move_to_end(key)
+        return self.filename(key)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Comme `lookup`, en comptant le hit ou le miss
+        """
+        filename = self.lookup(key)
+        if filename is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return filename
+
+    async def store(self, key: str, audio: np.ndarray) -> str:
+        """
+        Écrire un signal dans le cache (écriture atomique) et retourner le nom du fichier
+        """
+        voice = metrics.request_labels()["voice"]
+        start = time.perf_counter()
+        size = await run_in_threadpool(self._write_atomic, key, audio)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="file_write", voice=voice, format="wav")
+        metrics.OUTPUT_BYTES.inc(size, voice=voice, format="wav")
+        # Un WAV source réécrit rend ses anciennes variantes obsolètes
+        for name in self._variants.pop(key, ()):
+            self._remove(name)
+        self._add(key, size)
+        return self.filename(key)
+
+    async def get_or_create(
+        self,
+        key: str,
+        producer: Callable[[], Awaitable[np.ndarray]],
+    ) -> Tuple[str, bool]:
+        """
+        Retourner (nom de fichier, hit). En cas d'absence, `producer` est appelé
+        une seule fois même si plusieurs requêtes identiques arrivent en même temps.
+        """
+        filename = self.lookup(key)
+        if filename is not None:
+            self.hits += 1
+            return filename, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), True
+
+        self.misses += 1
+        task = self._start_flight(key, self._produce(key, producer))
+        return await asyncio.shield(task), False
+
+    async def _produce(self, key: str, producer: Callable[[], Awaitable[np.ndarray]]) -> str:
+        audio = await producer()
+        return await self.store(key, audio)
+
+    def _start_flight(self, flight: str, work: Awaitable[str]) -> asyncio.Task:
+        """
+        Lancer un travail partagé (synthèse, encodage) dans sa propre tâche: la
+        requête qui l'a lancé peut être annulée (client déconnecté) sans que les
+        requêtes identiques qui l'attendent échouent
+        """
+        task = asyncio.ensure_future(work)
+        self._inflight[flight] = task
+
+        def _done(task: asyncio.Task) -> None:
+            if self._inflight.get(flight) is task:
+                del self._inflight[flight]
+            if not task.cancelled():
+                task.exception()  # marquer l'exception comme récupérée s'il n'y a plus d'attente
+
+        task.add_done_callback(_done)
+        return task
+
+    async def get_variant(self, key: str, name: str, sample_rate: int, bitrate: Optional[int]) -> str:
+        """
+        Fichier encodé (format, fréquence, débit) d'une entrée du cache, encodé
+        depuis le WAV source au premier appel puis réutilisé
+        """
+        filename = variant_filename(key, name, sample_rate, bitrate)
+        filename = self._relative(key, filename)
+        if filename == self.filename(key) or filename in self._variants.get(key, ()):
+            if os.path.exists(os.path.join(self.directory, filename)):
+                return filename
+
+        flight = f"{key}:{filename}"
+        inflight = self._inflight.get(flight)
+        if inflight is None:
+            inflight = self._start_flight(flight, self._encode(key, filename, name, sample_rate, bitrate))
+        return await asyncio.shield(inflight)
+
+    async def _encode(self, key: str, filename: str, name: str, sample_rate: int, bitrate: Optional[int]) -> str:
+        start = time.perf_counter()
+        size = await run_in_threadpool(
+            encode_file, self.path_for(key), os.path.join(self.directory, filename), name, sample_rate, bitrate
+        )
+        voice = metrics.request_labels()["voice"]
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="encode", voice=voice, format=name)
+        metrics.OUTPUT_BYTES.inc(size, voice=voice, format=name)
+        self.encodes += 1
+        if key in self._index:
+            self._variants.setdefault(key, set()).add(filename)
+            self._add(key, self._index[key] + size)
+        return filename
+
+    def _write_atomic(self, key: str, audio: np.ndarray) -> int:
+        """
+        Écrire dans un fichier temporaire puis renommer: un lecteur ne voit jamais un WAV partiel
+        """
+        path = self.path_for(key)
+        if self.sharded:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write_wav(tmp_path, audio)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return os.path.getsize(path)
+
+    def _add(self, key: str, size: int) -> None:
+        if key in self._index:
+            self._total_bytes -= self._index[key]
+        self._index[key] = size
+        self._index.move_to_end(key)
+        self._total_bytes += size
+
+    def pin(self, keys: Iterable[str]) -> None:
+        """
+        Protéger des entrées de la rétention jusqu'à `unpin`
+        (fichiers encore lus après leur synthèse, ex: concaténation d'un job)
+        """
+        for key in keys:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+
+    def discard(self, key: str) -> Optional[int]:
+        """
+        Retirer une entrée (source et variantes) du cache et du disque; retourne les
+        octets libérés (0 si la clé n'est pas indexée), ou None si l'entrée est en cours d'écriture
+        ou épinglée
+        """
+        if key in self._pinned or key in self._inflight or any(flight.startswith(f"{key}:") for flight in self._inflight):
+            return None
+        size = self._index.pop(key, None)
+        if size is None:
+            return 0
+        self._total_bytes -= size
+        self._remove(self.filename(key))
+        for name in self._variants.pop(key, ()):
+            self._remove(name)
+        return size
+
+    def _remove(self, filename: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "variants": sum(len(files) for files in self._variants.values()),
+            "encodes": self.encodes,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            "inflight": len(self._inflight),
+            "pinned": len(self._pinned),
+            "sharded": self.sharded,
+        }
@@ -0,0 +1,278 @@
+"""
+Livraison des fichiers audio de outputs/ (GET/HEAD /outputs/...)
+
+Un fichier de outputs/ est écrit une fois (écriture atomique) puis n'est plus
+modifié: il est servi avec un ETag fort calculé sur son contenu (mémorisé par
+taille et date de modification) et `Cache-Control: immutable`. Les requêtes
+conditionnelles (If-None-Match, If-Modified-Since) reçoivent 304, les requêtes
+Range une réponse 206 partielle (avancer dans la lecture sans tout
+retélécharger, If-Range respecté). Quand le serveur ASGI le propose, le corps
+est envoyé sans copie (extensions `http.response.zerocopysend` ou
+`http.response.pathsend`), sinon par blocs lus hors de la boucle d'événements.
+"""
+import collections
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+
+from audio_formats import FORMATS
+
+# Durée de cache navigateur/CDN des fichiers audio (secondes)
+TTS_OUTPUT_MAX_AGE = int(os.environ.get("TTS_OUTPUT_MAX_AGE", "31536000"))
+
+# Taille des blocs lus quand le serveur ne propose pas d'envoi sans copie
+CHUNK_SIZE = 256 * 1024
+# Nombre d'ETag mémorisés (fichiers différents)
+ETAG_CACHE_ENTRIES = 10000
+
+_MEDIA_TYPES = {f".{fmt.extension}": fmt.media_type for fmt in FORMATS.values()}
+
+
+class _FileInfo:
+    __slots__ = ("path", "size", "mtime", "etag")
+
+    def __init__(self, path: str, size: int, mtime: float, etag: str):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+
+
+def _content_etag(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return f'"{digest.hexdigest()}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match: comparaison faible, liste d'ETag ou `*`"""
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervalle [début, fin] (inclus) d'un en-tête `Range: bytes=...` à un seul
+    intervalle; None si l'en-tête est à ignorer (autre unité, plusieurs
+    intervalles, syntaxe invalide: le fichier entier est alors servi).
+    Lève ValueError si l'intervalle est hors du fichier (416).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    first, last = first.strip(), last.strip()
+    if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffixe: les N derniers octets
+        if int(last) == 0 or size == 0:
+            raise ValueError("Intervalle vide")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError("Intervalle hors du fichier")
+    end = int(last) if last else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+class AudioFiles:
+    """
+    Application ASGI servant les fichiers d'un répertoire (monté sur /outputs)
+    """
+
+    def __init__(self, directory: str, max_age: int = TTS_OUTPUT_MAX_AGE):
+        self.directory = os.path.realpath(directory)
+        self.max_age = max_age
+        # chemin -> (taille, mtime_ns, ETag)
+        self._etags: "collections.OrderedDict[str, Tuple[int, int, str]]" = collections.OrderedDict()
+        self._etags_lock = threading.Lock()
+
+        # Compteurs
+        self.full = 0
+        self.partial = 0
+        self.not_modified = 0
+        self.etags_computed = 0
+
+    def _resolve(self, relative: str) -> Optional[str]:
+        """Chemin absolu d'un fichier sous le répertoire, None s'il en sort"""
+        path = os.path.realpath(os.path.join(self.directory, relative.lstrip("/")))
+        if os.path.commonpath([path, self.directory]) != self.directory or path == self.directory:
+            return None
+        return path
+
+    def _file_info(self, relative: str) -> Optional[_FileInfo]:
+        path = self._resolve(relative)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        with self._etags_lock:
+            cached = self._etags.get(path)
+            if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                self._etags.move_to_end(path)
+                return _FileInfo(path, stat.st_size, stat.st_mtime, cached[2])
+        try:
+            etag = _content_etag(path)
+        except OSError:
+            return None
+        with self._etags_lock:
+            self.etags_computed += 1
+            self._etags[path] = (stat.st_size, stat.st_mtime_ns, etag)
+            while len(self._etags) > ETAG_CACHE_ENTRIES:
+                self._etags.popitem(last=False)
+        return _FileInfo(path, stat.st_size, stat.st_mtime, etag)
+
+    def _headers(self, info: _FileInfo) -> List[Tuple[bytes, bytes]]:
+        extension = os.path.splitext(info.path)[1].lower()
+        media_type = _MEDIA_TYPES.get(extension) or mimetypes.guess_type(info.path)[0] or "application/octet-stream"
+        return [
+            (b"content-type", media_type.encode("latin-1")),
+            (b"etag", info.etag.encode("latin-1")),
+            (b"last-modified", formatdate(info.mtime, usegmt=True).encode("latin-1")),
+            (b"cache-control", f"public, max-age={self.max_age}, immutable".encode("latin-1")),
+            (b"accept-ranges", b"bytes"),
+        ]
+
+    async def __call__(self, scope, receive, send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await _send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        relative = path[len(root_path):] if path.startswith(root_path) else path
+        info = await run_in_threadpool(self._file_info, relative)
+        if info is None:
+            await _send_empty(send, 404, [], b"Not Found")
+            return
+
+        request_headers: Dict[bytes, bytes] = dict(scope["headers"])
+        headers = self._headers(info)
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if_modified_since = request_headers.get(b"if-modified-since")
+        if (if_none_match is not None and _etag_matches(if_none_match.decode("latin-1"), info.etag)) or (
+            if_none_match is None
+            and if_modified_since is not None
+            and _not_modified_since(if_modified_since.decode("latin-1"), info.mtime)
+        ):
+            self.not_modified += 1
+            await _send_empty(send, 304, headers)
+            return
+
+        start, end = 0, info.size - 1
+        status = 200
+        range_header = request_headers.get(b"range")
+        if range_header is not None and self._range_applies(request_headers.get(b"if-range"), info):
+            try:
+                byte_range = parse_range(range_header.decode("latin-1"), info.size)
+            except ValueError:
+                await _send_empty(send, 416, [(b"content-range", f"bytes */{info.size}".encode("latin-1"))])
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                headers.append((b"content-range", f"bytes {start}-{end}/{info.size}".encode("latin-1")))
+
+        length = end - start + 1 if info.size else 0
+        headers.append((b"content-length", str(length).encode("latin-1")))
+        if status == 206:
+            self.partial += 1
+        else:
+            self.full += 1
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_body(scope, send, info.path, start, length, status == 200)
+
+    @staticmethod
+    def _range_applies(if_range: Optional[bytes], info: _FileInfo) -> bool:
+        """If-Range: l'intervalle n'est servi que si le fichier est celui que le client a déjà"""
+        if if_range is None:
+            return True
+        value = if_range.decode("latin-1").strip()
+        if value.startswith('"'):
+            return value == info.etag
+        try:
+            return int(info.mtime) <= parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return False
+
+    async def _send_body(self, scope, send, path: str, start: int, length: int, whole: bool) -> None:
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": start,
+                    "count": length,
+                    "more_body": False,
+                })
+            return
+        if whole and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": path})
+            return
+
+        async with await anyio.open_file(path, "rb") as f:
+            if start:
+                await f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # Fichier raccourci pendant l'envoi (ne devrait pas arriver: écritures atomiques)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "full": self.full,
+            "partial": self.partial,
+            "not_modified": self.not_modified,
+            "etags_computed": self.etags_computed,
+            "etags_cached": len(self._etags),
+        }
+
+
+async def _send_empty(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes = b"") -> None:
+    if status == 304:
+        # 304: validateurs et cache seulement, pas de métadonnées du contenu
+        headers = [(name, value) for name, value in headers if name != b"content-type"]
+    else:
+        headers = [(name, value) for name, value in headers if name != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        if body:
+            headers.append((b"content-type", b"text/plain; charset=utf-8"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body if status != 304 else b"", "more_body": False})
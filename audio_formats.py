@@ -0,0 +1,200 @@
+"""
+Formats de sortie compressés (Opus/OGG, MP3, FLAC) encodés dans le processus
+
+L'encodage passe par libsndfile (paquet `soundfile`), sans lancer de
+processus externe. Les variantes encodées sont rangées à côté du WAV source
+(`<clé>.<fréquence>.<débit>.<ext>`) et réutilisées aux requêtes suivantes.
+"""
+import os
+import uuid
+import wave
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from tts_engine import SAMPLE_RATE, read_wav
+
+try:
+    import soundfile
+except ImportError:  # dépendance optionnelle: sans elle, seul le WAV est disponible
+    soundfile = None
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    name: str
+    extension: str
+    media_type: str
+    sf_format: str
+    sf_subtype: str
+    # Débits (kbps) min/max pour le réglage du débit, None = sans perte
+    bitrate_range: Optional[Tuple[int, int]] = None
+    default_bitrate: Optional[int] = None
+    # Fréquences d'échantillonnage acceptées par le codec (None = toutes celles de SAMPLE_RATES)
+    sample_rates: Optional[Tuple[int, ...]] = None
+
+
+FORMATS: Dict[str, AudioFormat] = {
+    "wav": AudioFormat("wav", "wav", "audio/wav", "WAV", "PCM_16"),
+    "flac": AudioFormat("flac", "flac", "audio/flac", "FLAC", "PCM_16"),
+    "opus": AudioFormat(
+        "opus", "ogg", "audio/ogg", "OGG", "OPUS",
+        bitrate_range=(6, 256), default_bitrate=48,
+        sample_rates=(8000, 12000, 16000, 24000, 48000),
+    ),
+    "mp3": AudioFormat(
+        "mp3", "mp3", "audio/mpeg", "MP3", "MPEG_LAYER_III",
+        bitrate_range=(8, 320), default_bitrate=96,
+    ),
+}
+FORMAT_ALIASES = {"ogg": "opus"}
+
+# Fréquences d'échantillonnage proposées (Kokoro produit du 24 kHz)
+SAMPLE_RATES = (8000, 16000, 22050, 24000, 44100, 48000)
+
+# Types MIME acceptés dans l'en-tête Accept -> format
+_MEDIA_TYPES = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+}
+
+
+class FormatError(ValueError):
+    """Format, fréquence ou débit demandé non pris en charge"""
+
+
+def available_formats() -> Tuple[str, ...]:
+    return tuple(FORMATS) if soundfile is not None else ("wav",)
+
+
+def resolve_format(name: Optional[str]) -> Optional[str]:
+    if name is None:
+        return None
+    name = FORMAT_ALIASES.get(name.lower(), name.lower())
+    if name not in FORMATS:
+        raise FormatError(f"Format inconnu: {name}")
+    if name not in available_formats():
+        raise FormatError(f"Format {name} indisponible (paquet soundfile manquant)")
+    return name
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Choisir un format à partir de l'en-tête Accept (types audio et q-values);
+    WAV si aucun type audio n'est demandé
+    """
+    best, best_q = None, 0.0
+    for part in (accept or "").split(","):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        name = _MEDIA_TYPES.get(media_type)
+        if name in available_formats() and q > best_q:
+            best, best_q = name, q
+    return best or "wav"
+
+
+def normalize_options(name: str, sample_rate: Optional[int], bitrate: Optional[int]) -> Tuple[int, Optional[int]]:
+    """
+    Valider fréquence et débit pour un format; retourne (fréquence, débit kbps ou None)
+    """
+    fmt = FORMATS[name]
+    sample_rate = sample_rate or SAMPLE_RATE
+    allowed = fmt.sample_rates or SAMPLE_RATES
+    if sample_rate not in allowed:
+        raise FormatError(f"Fréquence {sample_rate} Hz non prise en charge pour {name} ({', '.join(map(str, allowed))})")
+    if fmt.bitrate_range is None:
+        return sample_rate, None
+    low, high = _bitrate_range(fmt, sample_rate)
+    bitrate = bitrate or fmt.default_bitrate
+    if not low <= bitrate <= high:
+        raise FormatError(f"Débit {bitrate} kbps hors limites pour {name} à {sample_rate} Hz ({low}-{high})")
+    return sample_rate, bitrate
+
+
+def _bitrate_range(fmt: AudioFormat, sample_rate: int) -> Tuple[int, int]:
+    if fmt.name == "mp3":
+        # MPEG-1 (>= 32 kHz) va jusqu'à 320 kbps, MPEG-2 jusqu'à 160 kbps
+        return (32, 320) if sample_rate >= 32000 else (8, 160)
+    return fmt.bitrate_range
+
+
+def variant_filename(key: str, name: str, sample_rate: int, bitrate: Optional[int]) -> str:
+    """
+    Nom du fichier encodé (débit demandé, pas le débit obtenu: voir
+    measured_bitrate); le WAV à la fréquence native est le fichier source lui-même
+    """
+    if name == "wav" and sample_rate == SAMPLE_RATE:
+        return f"{key}.wav"
+    suffix = f".{bitrate}k" if bitrate else ""
+    return f"{key}.{sample_rate}{suffix}.{FORMATS[name].extension}"
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Rééchantillonnage par FFT (signal entier, pas de dépendance à scipy)
+    """
+    if source_rate == target_rate or audio.size == 0:
+        return audio
+    target_size = int(round(audio.size * target_rate / source_rate))
+    spectrum = np.fft.rfft(audio)
+    resized = np.zeros(target_size // 2 + 1, dtype=spectrum.dtype)
+    n = min(resized.size, spectrum.size)
+    resized[:n] = spectrum[:n]
+    return (np.fft.irfft(resized, n=target_size) * (target_size / audio.size)).astype(np.float32)
+
+
+def encode_file(source_path: str, output_path: str, name: str, sample_rate: int, bitrate: Optional[int]) -> int:
+    """
+    Encoder un WAV source dans un autre format/fréquence (écriture atomique); retourne la taille
+    """
+    fmt = FORMATS[name]
+    audio = resample(read_wav(source_path), SAMPLE_RATE, sample_rate)
+    options = {}
+    if bitrate is not None:
+        low, high = _bitrate_range(fmt, sample_rate)
+        # libsndfile règle le débit par un niveau de compression: 0 = débit max, 1 = débit min
+        # (interpolation linéaire, le débit obtenu n'est qu'approché)
+        options["compression_level"] = min(0.99, max(0.0, (high - bitrate) / (high - low)))
+        if name == "mp3":
+            options["bitrate_mode"] = "CONSTANT"
+
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        if soundfile is None:
+            from tts_engine import write_wav
+
+            write_wav(tmp_path, audio, sample_rate)
+        else:
+            soundfile.write(tmp_path, audio, sample_rate, format=fmt.sf_format, subtype=fmt.sf_subtype, **options)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(output_path)
+
+
+def measured_bitrate(encoded_path: str, source_path: str) -> Optional[float]:
+    """
+    Débit moyen effectivement obtenu (kbps): taille du fichier encodé (en-têtes
+    du conteneur compris) sur la durée du WAV source
+    """
+    with wave.open(source_path, "rb") as source:
+        duration = source.getnframes() / source.getframerate()
+    if duration <= 0:
+        return None
+    return round(os.path.getsize(encoded_path) * 8 / duration / 1000, 1)
@@ -1,11 +1,20 @@
 """
 Utilitaires d'authentification: hashage de mots de passe et JWT
+
+bcrypt coûte ~250 ms de CPU par appel: les versions async (`verify_password_async`,
+`get_password_hash_async`) l'exécutent dans un pool de threads dédié et borné,
+pour qu'une rafale de connexions ne bloque ni la boucle d'événements ni le
+pool de threads partagé par les autres routes.
+
+python-jose (et la pile cryptography qu'il charge) n'est importé qu'à la
+première création ou vérification de token, pas au démarrage de l'API.
 """
+import asyncio
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
-from jose import JWTError, jwt
 import bcrypt
 import logging
 
@@ -14,6 +23,10 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 jours
 
+# Threads réservés au hashage bcrypt (bcrypt libère le GIL pendant le calcul)
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", "2"))
+_hash_executor = ThreadPoolExecutor(max_workers=max(1, AUTH_HASH_WORKERS), thread_name_prefix="bcrypt")
+
 logging.info("Auth module initialized")
 
 
@@ -68,6 +81,22 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    `verify_password` exécuté dans le pool bcrypt
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    `get_password_hash` exécuté dans le pool bcrypt
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Créer un token JWT
@@ -79,6 +108,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
+    from jose import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -87,6 +118,8 @@ def decode_access_token(token: str) -> Optional[dict]:
     """
     Décoder et vérifier un token JWT
     """
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -0,0 +1,158 @@
+"""
+Benchmark du journal d'accès: coût par requête du middleware
+
+Appelle directement une petite application Starlette (sans réseau ni
+serveur) avec différents middlewares de journalisation: aucun, l'ancien
+LoggingMiddleware (BaseHTTPMiddleware, deux lignes INFO par requête) et
+AccessLogMiddleware (ASGI pur) avec toutes les requêtes journalisées, un
+échantillon, ou le logger désactivé. Les logs sont formatés puis écrits dans
+/dev/null. Deux routes: une réponse JSON courte et un corps en streaming.
+
+Usage:
+    python benchmarks/bench_access_log.py
+    python benchmarks/bench_access_log.py --requests 20000 --output bench_access_log.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access_log import AccessLogMiddleware, logger as access_logger  # noqa: E402
+
+STREAM_CHUNKS = 16
+STREAM_CHUNK_BYTES = 4096
+
+
+class LoggingMiddleware(BaseHTTPMiddleware):
+    """Middleware de journalisation d'avant (référence)"""
+
+    async def dispatch(self, request: Request, call_next):
+        origin = request.headers.get("origin", "no origin")
+        logging.info(f"{request.method} {request.url.path} from {request.client.host if request.client else 'unknown'} (origin: {origin})")
+        response = await call_next(request)
+        cors_headers = {k: v for k, v in response.headers.items() if k.lower().startswith("access-control")}
+        logging.info(f"Response: {response.status_code}, CORS headers: {cors_headers}")
+        return response
+
+
+async def small(request):
+    return JSONResponse({"status": "healthy"})
+
+
+async def stream(request):
+    chunk = b"\0" * STREAM_CHUNK_BYTES
+
+    async def body():
+        for _ in range(STREAM_CHUNKS):
+            yield chunk
+
+    return StreamingResponse(body(), media_type="audio/wav")
+
+
+def build_app(variant: str):
+    app = Starlette(routes=[Route("/small", small), Route("/stream", stream)])
+    if variant == "base_http":
+        return LoggingMiddleware(app)
+    if variant == "asgi":
+        return AccessLogMiddleware(app, sample=1.0)
+    if variant == "asgi_sample_10pct":
+        return AccessLogMiddleware(app, sample=0.1)
+    if variant == "asgi_disabled":
+        return AccessLogMiddleware(app)
+    return app
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"origin", b"http://localhost:5173")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+def _receiver():
+    """Corps vide puis, comme un client qui reste connecté, plus aucun message"""
+    sent = [False]
+
+    async def receive():
+        if not sent[0]:
+            sent[0] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def run_variant(app, path: str, requests: int) -> float:
+    """Durée moyenne (µs) d'une requête complète (corps reçu jusqu'au bout)"""
+    received = [0]
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            received[0] += len(message.get("body", b""))
+
+    for _ in range(min(200, requests)):  # échauffement
+        await app(_scope(path), _receiver(), send)
+    received[0] = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(_scope(path), _receiver(), send)
+    elapsed = time.perf_counter() - start
+    if path == "/stream" and received[0] != requests * STREAM_CHUNKS * STREAM_CHUNK_BYTES:
+        raise RuntimeError(f"Corps en streaming incomplet: {received[0]} octets")
+    return elapsed / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût par requête du middleware de journal d'accès")
+    parser.add_argument("--requests", type=int, default=5000, help="Requêtes par variante et par route")
+    parser.add_argument("--rounds", type=int, default=3, help="Mesures par variante (la meilleure est gardée)")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
+
+    variants = ["none", "base_http", "asgi", "asgi_sample_10pct", "asgi_disabled"]
+    results = {}
+    for path in ("/small", "/stream"):
+        results[path] = {}
+        for variant in variants:
+            access_logger.setLevel(logging.WARNING if variant == "asgi_disabled" else logging.INFO)
+            results[path][variant] = round(min(
+                asyncio.run(run_variant(build_app(variant), path, args.requests)) for _ in range(max(1, args.rounds))
+            ), 2)
+        baseline = results[path]["none"]
+        print(f"{path} ({args.requests} requêtes)")
+        for variant in variants:
+            us = results[path][variant]
+            print(f"  {variant:18s} {us:8.1f} µs/requête   surcoût {us - baseline:+7.1f} µs")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"requests": args.requests, "rounds": args.rounds, "us_per_request": results}, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de l'authentification: latence de /healthy pendant une rafale de connexions
+
+Un thread interroge /healthy à intervalle régulier pendant que N clients
+enchaînent des POST /api/auth/login. Si le hashage bcrypt ou les requêtes
+SQL bloquent la boucle d'événements, le p99 de /healthy pendant la rafale
+s'envole par rapport à la mesure au repos.
+
+L'API doit tourner (avec une base accessible), par exemple:
+    DATABASE_URL=sqlite:////tmp/bench.db uvicorn api:app --port 8000
+
+Usage:
+    python benchmarks/bench_auth.py
+    python benchmarks/bench_auth.py --url http://127.0.0.1:8000 --clients 16 --logins 200 --output bench_auth.json
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PASSWORD = "Bench-password-1!"
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(latencies) -> dict:
+    if not latencies:
+        return {"requests": 0}
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def probe_healthy(url: str, stop: threading.Event, interval: float) -> list:
+    """Interroger /healthy jusqu'à `stop`, retourne les latences (s)"""
+    latencies = []
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(f"{url}/healthy", timeout=30).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            time.sleep(interval)
+    return latencies
+
+
+def measure_idle(url: str, seconds: float, interval: float) -> list:
+    stop = threading.Event()
+    timer = threading.Timer(seconds, stop.set)
+    timer.start()
+    return probe_healthy(url, stop, interval)
+
+
+def measure_burst(url: str, email: str, clients: int, logins: int, interval: float):
+    """Rafale de `logins` connexions sur `clients` threads, /healthy mesuré en parallèle"""
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as prober:
+        probe = prober.submit(probe_healthy, url, stop, interval)
+
+        def _login(_):
+            start = time.perf_counter()
+            response = requests.post(f"{url}/api/auth/login", json={"email": email, "password": PASSWORD}, timeout=120)
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            login_latencies = list(pool.map(_login, range(logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return probe.result(), login_latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence de /healthy pendant une rafale de connexions")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=16, help="Connexions simultanées")
+    parser.add_argument("--logins", type=int, default=128, help="Nombre total de connexions")
+    parser.add_argument("--interval", type=float, default=0.01, help="Intervalle entre deux appels à /healthy (s)")
+    parser.add_argument("--idle-seconds", type=float, default=3.0, help="Durée de la mesure au repos")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+    url = args.url.rstrip("/")
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = requests.post(
+        f"{url}/api/auth/register", json={"email": email, "password": PASSWORD, "name": "bench"}, timeout=60
+    )
+    response.raise_for_status()
+
+    print(f"Mesure de /healthy au repos ({args.idle_seconds:.0f} s)...")
+    idle = measure_idle(url, args.idle_seconds, args.interval)
+    print(f"Rafale de {args.logins} connexions sur {args.clients} clients...")
+    burst, logins, elapsed = measure_burst(url, email, args.clients, args.logins, args.interval)
+
+    results = {
+        "healthy_idle": _summary(idle),
+        "healthy_during_logins": _summary(burst),
+        "logins": {**_summary(logins), "per_second": round(len(logins) / elapsed, 2)},
+    }
+    for name, summary in results.items():
+        print(f"{name:24s} {json.dumps(summary)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
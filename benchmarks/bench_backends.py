@@ -0,0 +1,164 @@
+"""
+Rapport qualité/vitesse des backends d'inférence: torch fp32, torch int8, ONNX
+
+Chaque backend est mesuré dans un processus Python séparé (RSS non faussé par
+les autres): temps de chargement, facteur temps réel (secondes d'audio par
+seconde de calcul), RSS après chargement et en pointe. L'audio produit est
+ensuite comparé à celui du backend de référence (torch fp32): rapport des
+durées, similarité cosinus des spectrogrammes (trames alignées sur la durée de
+la référence) et rapport signal/bruit quand les longueurs sont identiques.
+
+Le backend onnx demande un modèle exporté au préalable (python export_model.py).
+
+Usage:
+    python benchmarks/bench_backends.py
+    python benchmarks/bench_backends.py --backends torch,torch-int8,onnx --repeat 3 --output bench_backends.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+TEXTS = [
+    "Bonjour.",
+    "Bienvenue sur Kokoro TTS, votre assistant de synthèse vocale.",
+    "La synthèse vocale transforme un texte écrit en une voix naturelle. "
+    "Elle est utilisée pour l'accessibilité, les assistants vocaux et la lecture de documents.",
+    "Le rendez-vous est fixé au 12 mars à 14 h 30, au deuxième étage du bâtiment B.",
+]
+
+FRAME = 1024
+HOP = 256
+
+
+def _rss_mb() -> float:
+    from scheduler import current_rss_mb
+
+    return current_rss_mb()
+
+
+def run_backend(backend: str, repeat: int, audio_path: str) -> dict:
+    """Mesurer un backend dans le processus courant; l'audio de la dernière passe est écrit dans `audio_path`"""
+    from tts_engine import SAMPLE_RATE, KokoroEngine
+
+    rss_before = _rss_mb()
+    engine = KokoroEngine(mode="inprocess", backend=backend)
+    start = time.perf_counter()
+    engine.load()
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+    engine.synthesize(TEXTS[0])  # premier passage (allocations, JIT d'onnxruntime)
+
+    compute = 0.0
+    audio_seconds = 0.0
+    audios = []
+    for _ in range(repeat):
+        audios = []
+        for text in TEXTS:
+            start = time.perf_counter()
+            audio = engine.synthesize(text)
+            compute += time.perf_counter() - start
+            audio_seconds += len(audio) / SAMPLE_RATE
+            audios.append(audio)
+    np.savez(audio_path, *audios)
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "real_time_factor": round(audio_seconds / compute, 2),
+        "compute_seconds": round(compute, 2),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _spectrogram(audio: np.ndarray) -> np.ndarray:
+    if len(audio) < FRAME:
+        audio = np.pad(audio, (0, FRAME - len(audio)))
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME)[::HOP]
+    return np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=1))
+
+
+def similarity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Comparer deux signaux: durées, cosinus des spectrogrammes alignés, SNR si même longueur"""
+    ref_spec = np.log1p(_spectrogram(reference))
+    cand_spec = np.log1p(_spectrogram(candidate))
+    # Trames du candidat rééchantillonnées sur la durée de la référence
+    positions = np.linspace(0, len(cand_spec) - 1, len(ref_spec))
+    aligned = cand_spec[np.round(positions).astype(int)]
+    dots = np.sum(ref_spec * aligned, axis=1)
+    norms = np.linalg.norm(ref_spec, axis=1) * np.linalg.norm(aligned, axis=1)
+    cosine = float(np.mean(dots[norms > 0] / norms[norms > 0])) if np.any(norms > 0) else 0.0
+    result = {"duration_ratio": round(len(candidate) / len(reference), 4), "spectral_cosine": round(cosine, 4)}
+    if len(candidate) == len(reference):
+        noise = np.sum((reference - candidate) ** 2)
+        result["snr_db"] = round(float(10 * np.log10(np.sum(reference ** 2) / noise)), 1) if noise > 0 else None
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,torch-int8,onnx", help="Backends à comparer (le premier sert de référence)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de passes sur les textes")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--audio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.repeat, args.audio)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-backends-") as directory:
+        audios = {}
+        for backend in args.backends.split(","):
+            print(f"Mesure du backend {backend}...")
+            audio_path = os.path.join(directory, f"{backend}.npz")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", backend,
+                 "--repeat", str(args.repeat), "--audio", audio_path],
+                capture_output=True,
+                text=True,
+                cwd=ROOT_DIR,
+            )
+            if proc.returncode != 0:
+                print(f"   ❌ Échec du backend {backend}: {proc.stderr[-500:]}")
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            with np.load(audio_path) as data:
+                audios[backend] = [data[f"arr_{i}"] for i in range(len(TEXTS))]
+
+        if results:
+            reference = results[0]["backend"]
+            for result in results:
+                scores = [similarity(ref, cand) for ref, cand in zip(audios[reference], audios[result["backend"]])]
+                result["reference"] = reference
+                result["spectral_cosine"] = round(float(np.mean([s["spectral_cosine"] for s in scores])), 4)
+                result["duration_ratio"] = round(float(np.mean([s["duration_ratio"] for s in scores])), 4)
+                result["per_text"] = scores
+
+    print()
+    print(f"{'backend':<12}{'chargement':>12}{'temps réel':>12}{'RSS modèle':>12}{'RSS max':>10}{'cosinus':>10}{'durée':>8}")
+    for r in results:
+        print(
+            f"{r['backend']:<12}{r['load_seconds']:>11.2f}s{r['real_time_factor']:>11.2f}x"
+            f"{r['model_rss_mb']:>9.0f} Mo{r['peak_rss_mb']:>7.0f} Mo{r['spectral_cosine']:>10.3f}{r['duration_ratio']:>8.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"texts": TEXTS, "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
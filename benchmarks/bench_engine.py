@@ -0,0 +1,110 @@
+"""
+Benchmark du moteur de synthèse: mode résident (inprocess) contre mode subprocess
+
+Chaque mode est mesuré dans un processus Python séparé pour que le pic de
+mémoire (RSS) de l'un ne fausse pas l'autre. Les mêmes textes sont synthétisés
+dans les deux modes.
+
+Usage:
+    python benchmarks/bench_engine.py
+    python benchmarks/bench_engine.py --repeat 5 --output bench_engine.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+TEXTS = [
+    "Bonjour.",
+    "Bienvenue sur Kokoro TTS, votre assistant de synthèse vocale.",
+    "La synthèse vocale transforme un texte écrit en une voix naturelle. "
+    "Elle est utilisée pour l'accessibilité, les assistants vocaux et la lecture de documents.",
+]
+
+
+def _peak_rss_mb() -> float:
+    """Pic de RSS (Mo) de ce processus et de ses enfants terminés (ru_maxrss est en Ko sous Linux)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run_mode(mode: str, repeat: int) -> dict:
+    """Mesurer un mode dans le processus courant"""
+    from tts_engine import KokoroEngine
+
+    engine = KokoroEngine(mode=mode)
+    start = time.perf_counter()
+    engine.load()
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeat):
+        for text in TEXTS:
+            start = time.perf_counter()
+            engine.synthesize(text)
+            latencies.append(time.perf_counter() - start)
+
+    first = latencies[0]
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "load_seconds": round(load_seconds, 3),
+        "first_request_seconds": round(first, 3),
+        "mean_seconds": round(statistics.mean(latencies), 3),
+        "p50_seconds": round(latencies[len(latencies) // 2], 3),
+        "p95_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de passes sur les textes")
+    parser.add_argument("--modes", default="inprocess,subprocess", help="Modes à comparer")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.repeat)))
+        return
+
+    results = []
+    for mode in args.modes.split(","):
+        print(f"Mesure du mode {mode}...")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--repeat", str(args.repeat)],
+            capture_output=True,
+            text=True,
+            cwd=ROOT_DIR,
+        )
+        if proc.returncode != 0:
+            print(f"   ❌ Échec du mode {mode}: {proc.stderr[-500:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print()
+    print(f"{'mode':<12}{'chargement':>12}{'moyenne':>10}{'p50':>10}{'p95':>10}{'RSS max':>12}")
+    for r in results:
+        print(
+            f"{r['mode']:<12}{r['load_seconds']:>11.2f}s{r['mean_seconds']:>9.2f}s"
+            f"{r['p50_seconds']:>9.2f}s{r['p95_seconds']:>9.2f}s{r['peak_rss_mb']:>9.0f} Mo"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"texts": TEXTS, "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+Banc de charge reproductible de l'API: /tts, authentification et /outputs
+
+Sans --url, l'API est lancée localement (uvicorn) avec le moteur factice
+(TTS_ENGINE_BACKEND=fake: audio déterministe, sans poids ni kokoro), une base
+SQLite (fichier temporaire, ou en mémoire avec --db memory) et un répertoire
+outputs/ temporaire: les résultats mesurent l'API et l'ordonnancement, hors
+ligne, et se reproduisent d'une machine à l'autre. Avec --backend torch, le
+vrai modèle est utilisé.
+
+Scénarios (--scenarios):
+  - tts: POST /tts, textes du corpus rendus uniques (cache audio manqué à chaque
+    requête; les phrases communes peuvent venir du cache des phrases)
+  - tts_cached: POST /tts sur les textes du corpus déjà synthétisés (cache audio)
+  - login: POST /api/auth/login (hashage bcrypt)
+  - me: GET /api/auth/me (cache des utilisateurs)
+  - outputs: GET /outputs/... des fichiers produits
+Modes: boucle fermée (--concurrency clients qui enchaînent les requêtes) ou
+boucle ouverte (--rate arrivées par seconde, loi de Poisson à graine fixe; la
+latence part de l'heure d'arrivée prévue, attente côté client comprise).
+
+Le corpus (corpus_fr.txt) mélange des textes français de 8 à 500 caractères.
+Résultats par scénario: débit, latences p50/p95/p99, statuts, et pour /tts
+le facteur temps réel mesuré par le serveur (delta de /metrics); RSS maximal
+du serveur et de ses workers quand il est lancé localement.
+
+Usage:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --mode open --rate 20 --duration 30 --output bench_load.json
+    python benchmarks/bench_load.py --workers 2 --fake-rtf 10 --db memory --scenarios tts,outputs
+    python benchmarks/bench_load.py --url http://127.0.0.1:8000 --scenarios tts_cached,me
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_fr.txt")
+
+SCENARIOS = ("tts", "tts_cached", "login", "me", "outputs")
+PASSWORD = "Bench-password-1!"
+# Longueur maximale d'un texte de POST /tts
+MAX_TEXT_CHARS = 500
+# Compteurs de /metrics lus avant et après chaque scénario
+SERVER_COUNTERS = ("tts_characters_total", "tts_audio_seconds_total", "tts_synthesis_seconds_total")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    too_long = [text for text in texts if len(text) > MAX_TEXT_CHARS]
+    if too_long:
+        raise ValueError(f"{len(too_long)} texte(s) du corpus dépassent {MAX_TEXT_CHARS} caractères")
+    return texts
+
+
+def _percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """API lancée dans un processus uvicorn, avec le moteur et la base demandés"""
+
+    def __init__(self, backend: str, db: str, workers: int, worker_mode: str, fake_rtf: float):
+        self.directory = tempfile.mkdtemp(prefix="bench-load-")
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        database_url = "sqlite://" if db == "memory" else f"sqlite:///{os.path.join(self.directory, 'bench.db')}"
+        self.env = dict(os.environ)
+        self.env.update({
+            "TTS_ENGINE_BACKEND": backend,
+            "TTS_FAKE_RTF": str(fake_rtf),
+            "TTS_WORKERS": str(workers),
+            "TTS_WORKER_MODE": worker_mode,
+            "DATABASE_URL": database_url,
+            "TTS_OUTPUT_DIR": os.path.join(self.directory, "outputs"),
+            "TTS_G2P_CACHE_PATH": "",
+        })
+        self.env.setdefault("TTS_ACCESS_LOG_LEVEL", "OFF")
+        self.env.setdefault("TTS_RETENTION_INTERVAL_S", "0")
+        self.env.setdefault("TTS_QUEUE_SIZE", "64")
+        # Scénarios /tts sans compte (crédits hors du périmètre du banc)
+        self.env.setdefault("TTS_ALLOW_ANONYMOUS", "1")
+        self.process = None
+        self._log = None
+        # Délais depuis le lancement: première réponse de /healthy, puis /ready (préchauffage fini)
+        self.first_response_seconds = None
+        self.ready_seconds = None
+
+    def start(self, timeout: float = 300) -> None:
+        self._log = open(os.path.join(self.directory, "server.log"), "w")
+        started = time.monotonic()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "--factory", "api:create_app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=ROOT_DIR,
+            env=self.env,
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+        deadline = started + timeout
+        path = "/healthy"
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Le serveur s'est arrêté (code {self.process.returncode}), "
+                                   f"voir {self._log.name}")
+            try:
+                if requests.get(f"{self.url}{path}", timeout=2).status_code == 200:
+                    if path == "/healthy":
+                        self.first_response_seconds = time.monotonic() - started
+                        path = "/ready"
+                        continue
+                    self.ready_seconds = time.monotonic() - started
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"Le serveur n'est pas prêt après {timeout:.0f}s")
+
+    def pids(self) -> list:
+        """PID du serveur et de ses descendants (workers de synthèse)"""
+        pids, pending = [], [self.process.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+        return pids
+
+    def rss_mb(self) -> float:
+        total = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1])
+                            break
+            except OSError:
+                pass
+        return total / 1024
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log is not None:
+            self._log.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class RssSampler:
+    """RSS maximal du serveur local pendant une mesure (échantillonné)"""
+
+    def __init__(self, server, interval: float = 0.1):
+        self.server = server
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self.server.rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.server is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.server is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, self.server.rss_mb())
+
+
+def server_counters(url: str) -> dict:
+    """Somme, toutes étiquettes confondues, des compteurs de synthèse de /metrics"""
+    totals = dict.fromkeys(SERVER_COUNTERS, 0.0)
+    try:
+        text = requests.get(f"{url}/metrics", timeout=10).text
+    except requests.RequestException:
+        return totals
+    for line in text.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in totals:
+            totals[name] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+class Workload:
+    """Requêtes de chaque scénario, préparées une fois (comptes, fichiers, cache)"""
+
+    def __init__(self, url: str, corpus: list, voice: str, users: int, seed: int):
+        self.url = url
+        self.corpus = corpus
+        self.voice = voice
+        self.users = users
+        self.seed = seed
+        self.accounts = []
+        self.tokens = []
+        self.files = []
+        self._local = threading.local()
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+        self._run_id = uuid.uuid4().hex[:8]
+
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _next(self) -> int:
+        with self._counter_lock:
+            self._counter += 1
+            return self._counter
+
+    def prepare(self, scenarios) -> None:
+        session = self.session()
+        if {"tts_cached", "outputs"} & set(scenarios):
+            # Textes du corpus synthétisés une fois: cache audio et fichiers à servir
+            for text in self.corpus:
+                response = session.post(f"{self.url}/tts", json={"text": text, "voice": self.voice}, timeout=600)
+                response.raise_for_status()
+                self.files.append(response.json()["audio_file"])
+        if {"login", "me"} & set(scenarios):
+            for i in range(self.users):
+                email = f"bench-{self._run_id}-{i}@example.com"
+                response = session.post(
+                    f"{self.url}/api/auth/register", json={"email": email, "password": PASSWORD}, timeout=60
+                )
+                response.raise_for_status()
+                self.accounts.append(email)
+                self.tokens.append(response.json()["access_token"])
+
+    def text(self, i: int, unique: bool) -> str:
+        text = self.corpus[random.Random(self.seed * 1000003 + i).randrange(len(self.corpus))]
+        if unique:
+            suffix = f" Référence {self._run_id}-{self._next()}."
+            text = text[:MAX_TEXT_CHARS - len(suffix)] + suffix
+        return text
+
+    def request(self, scenario: str, i: int):
+        """Envoyer la requête `i` d'un scénario; retourne (statut, caractères synthétisés)"""
+        session = self.session()
+        if scenario in ("tts", "tts_cached"):
+            text = self.text(i, unique=scenario == "tts")
+            response = session.post(f"{self.url}/tts", json={"text": text, "voice": self.voice}, timeout=600)
+            return response.status_code, len(text) if response.status_code == 200 else 0
+        if scenario == "login":
+            email = self.accounts[i % len(self.accounts)]
+            response = session.post(f"{self.url}/api/auth/login", json={"email": email, "password": PASSWORD}, timeout=60)
+            return response.status_code, 0
+        if scenario == "me":
+            token = self.tokens[i % len(self.tokens)]
+            response = session.get(f"{self.url}/api/auth/me", headers={"Authorization": f"Bearer {token}"}, timeout=60)
+            return response.status_code, 0
+        if scenario == "outputs":
+            response = session.get(f"{self.url}{self.files[i % len(self.files)]}", timeout=60)
+            return response.status_code, 0
+        raise ValueError(f"Scénario inconnu: {scenario}")
+
+
+def run_closed(workload: Workload, scenario: str, concurrency: int, duration: float, max_requests: int) -> tuple:
+    """Boucle fermée: chaque client envoie sa requête suivante dès la réponse reçue"""
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(max_requests or sys.maxsize))
+
+    def client():
+        while time.perf_counter() < deadline:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status, characters = workload.request(scenario, i)
+            except requests.RequestException:
+                status, characters = 0, 0
+            with lock:
+                samples.append((time.perf_counter() - start, status, characters))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def run_open(workload: Workload, scenario: str, rate: float, duration: float, max_inflight: int, seed: int) -> tuple:
+    """
+    Boucle ouverte: arrivées de Poisson à `rate` par seconde, indépendantes des
+    réponses; la latence compte depuis l'arrivée prévue
+    """
+    rng = random.Random(seed)
+    arrivals = []
+    at = rng.expovariate(rate)
+    while at < duration:
+        arrivals.append(at)
+        at += rng.expovariate(rate)
+
+    samples = []
+    lock = threading.Lock()
+
+    def send(i: int, scheduled: float):
+        try:
+            status, characters = workload.request(scenario, i)
+        except requests.RequestException:
+            status, characters = 0, 0
+        with lock:
+            samples.append((time.perf_counter() - scheduled, status, characters))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        for i, offset in enumerate(arrivals):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, i, scheduled)
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed: float) -> dict:
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = sorted(latency for latency, status, _ in samples if 200 <= status < 400)
+    result = {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "statuses": dict(sorted(statuses.items())),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if ok:
+        result.update({
+            "latency_p50_ms": round(_percentile(ok, 0.50) * 1000, 2),
+            "latency_p95_ms": round(_percentile(ok, 0.95) * 1000, 2),
+            "latency_p99_ms": round(_percentile(ok, 0.99) * 1000, 2),
+            "latency_max_ms": round(ok[-1] * 1000, 2),
+        })
+    characters = sum(c for _, _, c in samples)
+    if characters:
+        result["characters_per_second"] = round(characters / elapsed, 1)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API déjà lancée (sinon lancée localement avec le moteur factice)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scénarios séparés par des virgules")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients simultanés (boucle fermée)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Arrivées par seconde (boucle ouverte)")
+    parser.add_argument("--max-inflight", type=int, default=64, help="Requêtes simultanées au plus (boucle ouverte)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de chaque scénario (s)")
+    parser.add_argument("--requests", type=int, default=0, help="Requêtes au plus par scénario (boucle fermée, 0 = illimité)")
+    parser.add_argument("--voice", default="ff_siwis")
+    parser.add_argument("--users", type=int, default=8, help="Comptes créés pour login et me")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="fake", help="Backend du serveur local (fake, torch, torch-int8, onnx)")
+    parser.add_argument("--db", choices=("file", "memory"), default="file", help="Base SQLite du serveur local")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de synthèse du serveur local")
+    parser.add_argument("--worker-mode", choices=("process", "thread"), default="process")
+    parser.add_argument("--fake-rtf", type=float, default=20.0, help="Facteur temps réel simulé par le moteur factice")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Scénarios inconnus: {', '.join(sorted(unknown))}")
+    corpus = load_corpus()
+
+    server = None
+    url = args.url.rstrip("/") if args.url else None
+    if url is None:
+        print(f"Démarrage de l'API locale (backend {args.backend}, base SQLite {args.db}, "
+              f"{args.workers} worker(s) {args.worker_mode})...")
+        server = LocalServer(args.backend, args.db, args.workers, args.worker_mode, args.fake_rtf)
+        server.start()
+        url = server.url
+
+    try:
+        print(f"Préparation ({', '.join(scenarios)})...")
+        workload = Workload(url, corpus, args.voice, args.users, args.seed)
+        workload.prepare(scenarios)
+        health = requests.get(f"{url}/health", timeout=10).json()
+        plan = requests.get(f"{url}/scheduler/stats", timeout=10).json().get("thread_plan")
+
+        results = {}
+        for scenario in scenarios:
+            print(f"Mesure de {scenario} ({args.mode})...")
+            before = server_counters(url)
+            with RssSampler(server) as sampler:
+                if args.mode == "closed":
+                    samples, elapsed = run_closed(workload, scenario, args.concurrency, args.duration, args.requests)
+                else:
+                    samples, elapsed = run_open(workload, scenario, args.rate, args.duration, args.max_inflight, args.seed)
+            after = server_counters(url)
+            result = summarize(samples, elapsed)
+            audio = after["tts_audio_seconds_total"] - before["tts_audio_seconds_total"]
+            compute = after["tts_synthesis_seconds_total"] - before["tts_synthesis_seconds_total"]
+            if audio > 0:
+                result["audio_seconds"] = round(audio, 2)
+                result["audio_seconds_per_second"] = round(audio / elapsed, 2)
+                result["real_time_factor"] = round(audio / compute, 2) if compute > 0 else None
+            result["peak_rss_mb"] = round(sampler.peak_mb, 1) if server is not None else None
+            results[scenario] = result
+    finally:
+        if server is not None:
+            server.stop()
+
+    print()
+    print(f"{'scénario':<12}{'req':>7}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'temps réel':>12}{'RSS max':>10}  statuts")
+    for scenario, r in results.items():
+        rtf = f"{r['real_time_factor']:.1f}x" if r.get("real_time_factor") else "-"
+        rss = f"{r['peak_rss_mb']:.0f} Mo" if r["peak_rss_mb"] else "-"
+        print(f"{scenario:<12}{r['requests']:>7}{r['throughput_rps']:>9.1f}"
+              f"{r.get('latency_p50_ms', 0):>8.0f}ms{r.get('latency_p95_ms', 0):>8.0f}ms{r.get('latency_p99_ms', 0):>8.0f}ms"
+              f"{rtf:>12}{rss:>10}  {r['statuses']}")
+
+    if args.output:
+        report = {
+            "mode": args.mode,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "duration": args.duration,
+            "seed": args.seed,
+            "server": {
+                "url": args.url,
+                "backend": health.get("engine_backend", args.backend),
+                "db": args.db if server is not None else None,
+                "first_response_seconds": round(server.first_response_seconds, 3) if server is not None else None,
+                "ready_seconds": round(server.ready_seconds, 3) if server is not None else None,
+                "thread_plan": plan,
+            },
+            "client": {"python": platform.python_version(), "cpus": os.cpu_count()},
+            "corpus": {"texts": len(corpus), "min_chars": min(map(len, corpus)), "max_chars": max(map(len, corpus))},
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
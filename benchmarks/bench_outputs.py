@@ -0,0 +1,147 @@
+"""
+Benchmark de la livraison des fichiers audio: StaticFiles contre AudioFiles
+
+Appelle directement (sans réseau ni serveur) l'ancien montage StaticFiles et
+la nouvelle application AudioFiles sur des fichiers WAV factices, pour trois
+usages d'un lecteur audio:
+  - full: téléchargement complet
+  - seek: déplacement dans la lecture (Range de 64 Kio à une position aléatoire)
+  - replay: relecture avec le validateur reçu (If-None-Match)
+La variante `audio_files_pathsend` simule un serveur qui propose l'extension
+ASGI `http.response.pathsend` (le fichier n'est alors pas lu par l'application).
+Mesure les requêtes par seconde et le débit des octets livrés au client.
+
+Usage:
+    python benchmarks/bench_outputs.py
+    python benchmarks/bench_outputs.py --files 50 --size-kb 1024 --requests 2000 --output bench_outputs.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from starlette.staticfiles import StaticFiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_delivery import AudioFiles  # noqa: E402
+
+SEEK_BYTES = 64 * 1024
+
+
+def _scope(name: str, headers, pathsend: bool = False) -> dict:
+    path = f"/outputs/{name}"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "/outputs",
+        "headers": [(b"host", b"localhost")] + headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    if pathsend:
+        scope["extensions"] = {"http.response.pathsend": {}}
+    return scope
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run(app, names, scenario: str, requests: int, size: int, pathsend: bool) -> dict:
+    state = {"bytes": 0, "status": None, "etag": None}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+            state["etag"] = dict(message["headers"]).get(b"etag")
+        elif message["type"] == "http.response.body":
+            state["bytes"] += len(message.get("body", b""))
+        elif message["type"] == "http.response.pathsend":
+            state["bytes"] += os.path.getsize(message["path"])
+
+    # Validateurs reçus lors d'un premier téléchargement (pour replay)
+    etags = {}
+    for name in names:
+        await app(_scope(name, [], pathsend), _receive, send)
+        etags[name] = state["etag"]
+
+    rng = random.Random(0)
+    statuses = {}
+    state["bytes"] = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        name = names[i % len(names)]
+        if scenario == "seek":
+            offset = rng.randrange(0, size - SEEK_BYTES)
+            headers = [(b"range", f"bytes={offset}-{offset + SEEK_BYTES - 1}".encode())]
+        elif scenario == "replay":
+            headers = [(b"if-none-match", etags[name])]
+        else:
+            headers = []
+        await app(_scope(name, headers, pathsend), _receive, send)
+        statuses[state["status"]] = statuses.get(state["status"], 0) + 1
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "mb_per_second": round(state["bytes"] / elapsed / (1024 * 1024), 1),
+        "bytes_per_request": state["bytes"] // requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de /outputs: StaticFiles contre AudioFiles")
+    parser.add_argument("--files", type=int, default=20, help="Nombre de fichiers")
+    parser.add_argument("--size-kb", type=int, default=512, help="Taille de chaque fichier (Kio)")
+    parser.add_argument("--requests", type=int, default=1000, help="Requêtes par scénario et par variante")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    size = args.size_kb * 1024
+    directory = tempfile.mkdtemp(prefix="bench-outputs-")
+    try:
+        names = []
+        for i in range(args.files):
+            name = f"{i:064x}.wav"
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(os.urandom(size))
+            names.append(name)
+
+        variants = {
+            "static_files": (StaticFiles(directory=directory), False),
+            "audio_files": (AudioFiles(directory), False),
+            "audio_files_pathsend": (AudioFiles(directory), True),
+        }
+        results = {}
+        print(f"{args.files} fichiers de {args.size_kb} Kio, {args.requests} requêtes par scénario")
+        for scenario in ("full", "seek", "replay"):
+            results[scenario] = {}
+            for variant, (app, pathsend) in variants.items():
+                result = asyncio.run(run(app, names, scenario, args.requests, size, pathsend))
+                results[scenario][variant] = result
+                print(f"  {scenario:7s} {variant:22s} {result['requests_per_second']:9.1f} req/s "
+                      f"{result['mb_per_second']:9.1f} Mio/s  {result['bytes_per_request']:>8d} o/req  "
+                      f"statuts {result['statuses']}")
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"files": args.files, "size_kb": args.size_kb, "requests": args.requests, "results": results}, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
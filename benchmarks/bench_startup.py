@@ -0,0 +1,155 @@
+"""
+Temps de démarrage à froid de l'API: imports par module et première requête servie
+
+Chaque mesure est faite dans des processus neufs, --repeat fois (médiane):
+  - import: `python -X importtime -c "import api"`: durée de l'import de api,
+    modules importés directement par api (temps cumulé) et modules du projet
+    (temps propre, hors dépendances), plus la durée totale du processus
+  - serveur: uvicorn (--factory api:create_app) lancé comme en production,
+    délai avant le premier 200 de /healthy (première requête servie) puis de
+    /ready (workers préchauffés)
+Le serveur tourne avec le moteur factice et une base SQLite temporaire (voir
+bench_load.py): pas de poids ni de PostgreSQL, résultats reproductibles.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --top 20 --output bench_startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_load import ROOT_DIR, LocalServer
+
+
+def _import_env(directory: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        "TTS_OUTPUT_DIR": os.path.join(directory, "outputs"),
+        "TTS_ENGINE_BACKEND": "fake",
+    })
+    return env
+
+
+def parse_importtime(stderr: str) -> list:
+    """Lignes de -X importtime: (profondeur, module, temps propre en s, temps cumulé en s)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((depth, name.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+    return entries
+
+
+def measure_import() -> dict:
+    """Importer api dans un processus neuf"""
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as directory:
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import api"],
+            capture_output=True,
+            text=True,
+            cwd=ROOT_DIR,
+            env=_import_env(directory),
+        )
+        process_seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import de api impossible: {proc.stderr[-500:]}")
+
+    entries = parse_importtime(proc.stderr)
+    # Modules importés par api: entre l'import de premier niveau précédent et api, un niveau plus bas
+    api_index = max(i for i, entry in enumerate(entries) if entry[1] == "api" and entry[0] == 0)
+    first = max((i + 1 for i, entry in enumerate(entries[:api_index]) if entry[0] == 0), default=0)
+    direct = {}
+    for depth, name, _, cumulative in entries[first:api_index]:
+        if depth == 1:
+            direct[name] = direct.get(name, 0.0) + cumulative
+    project = {
+        name: own
+        for _, name, own, _ in entries
+        if os.path.exists(os.path.join(ROOT_DIR, f"{name}.py"))
+    }
+    return {
+        "process_seconds": process_seconds,
+        "import_api_seconds": entries[api_index][3],
+        "direct_imports": direct,
+        "project_modules": project,
+    }
+
+
+def measure_server() -> dict:
+    """Lancer uvicorn et attendre /healthy puis /ready"""
+    server = LocalServer("fake", "file", workers=1, worker_mode="process", fake_rtf=0)
+    try:
+        server.start()
+        return {"first_response_seconds": server.first_response_seconds, "ready_seconds": server.ready_seconds}
+    finally:
+        server.stop()
+
+
+def _median_by_key(runs: list) -> dict:
+    keys = {key for run in runs for key in run}
+    return {key: statistics.median(run.get(key, 0.0) for run in runs) for key in keys}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de mesures (médiane)")
+    parser.add_argument("--top", type=int, default=15, help="Modules affichés")
+    parser.add_argument("--skip-server", action="store_true", help="Ne mesurer que les imports")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    imports = []
+    servers = []
+    for i in range(args.repeat):
+        print(f"Mesure {i + 1}/{args.repeat}...")
+        imports.append(measure_import())
+        if not args.skip_server:
+            servers.append(measure_server())
+
+    direct = _median_by_key([run["direct_imports"] for run in imports])
+    project = _median_by_key([run["project_modules"] for run in imports])
+    result = {
+        "repeat": args.repeat,
+        "python": sys.version.split()[0],
+        "import_api_ms": round(statistics.median(run["import_api_seconds"] for run in imports) * 1000, 1),
+        "import_process_ms": round(statistics.median(run["process_seconds"] for run in imports) * 1000, 1),
+        "direct_imports_ms": {
+            name: round(seconds * 1000, 1) for name, seconds in sorted(direct.items(), key=lambda item: -item[1])
+        },
+        "project_modules_self_ms": {
+            name: round(seconds * 1000, 1) for name, seconds in sorted(project.items(), key=lambda item: -item[1])
+        },
+    }
+    if servers:
+        result["first_response_ms"] = round(statistics.median(run["first_response_seconds"] for run in servers) * 1000, 1)
+        result["ready_ms"] = round(statistics.median(run["ready_seconds"] for run in servers) * 1000, 1)
+
+    print()
+    print(f"Import de api: {result['import_api_ms']:.0f} ms (processus complet: {result['import_process_ms']:.0f} ms)")
+    if servers:
+        print(f"Première requête servie (/healthy): {result['first_response_ms']:.0f} ms, /ready: {result['ready_ms']:.0f} ms")
+    print("\nImports directs de api les plus coûteux (cumulé):")
+    for name, ms in list(result["direct_imports_ms"].items())[:args.top]:
+        print(f"  {name:<32}{ms:>9.1f} ms")
+    print("\nModules du projet (temps propre):")
+    for name, ms in list(result["project_modules_self_ms"].items())[:args.top]:
+        print(f"  {name:<32}{ms:>9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
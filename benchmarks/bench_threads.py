@@ -0,0 +1,150 @@
+"""
+Balayage des plans de threads: workers x threads par worker, débit contre latence
+
+Chaque configuration est mesurée dans un processus Python séparé (le plan doit
+être appliqué avant l'import de torch): l'ordonnanceur démarre ses workers,
+attend leur préchauffage, puis des clients en boucle fermée (deux par worker
+par défaut) envoient les mêmes textes. Pour chaque configuration: débit
+(requêtes et secondes d'audio par seconde) et latence de bout en bout (p50,
+p95, attente en file comprise). Les configurations par défaut couvrent les
+découpages des CPU disponibles (workers x threads <= CPU) et le mode thread.
+
+Usage:
+    python benchmarks/bench_threads.py
+    python benchmarks/bench_threads.py --configs 1x4,2x2,4x1,thread --requests 60 --output bench_threads.json
+    python benchmarks/bench_threads.py --pin --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+TEXTS = [
+    "Bonjour.",
+    "Bienvenue sur Kokoro TTS, votre assistant de synthèse vocale.",
+    "La synthèse vocale transforme un texte écrit en une voix naturelle. "
+    "Elle est utilisée pour l'accessibilité, les assistants vocaux et la lecture de documents.",
+    "Le rendez-vous est fixé au 12 mars à 14 h 30, au deuxième étage du bâtiment B.",
+]
+
+
+def default_configs(cpus: int) -> list:
+    """Découpages des CPU en workers x threads (puissances de deux), puis le mode thread"""
+    configs = []
+    threads = 1
+    while threads <= cpus:
+        workers = cpus // threads
+        configs.append(f"{workers}x{threads}")
+        threads *= 2
+    configs.append("thread")
+    return configs
+
+
+async def _run(config: str, requests: int, concurrency: int, pin: bool) -> dict:
+    from scheduler import SynthesisScheduler
+    from thread_plan import apply_plan, plan_threads
+    from tts_engine import SAMPLE_RATE, KokoroEngine
+
+    if config == "thread":
+        plan = plan_threads(1, "thread", pin=pin)
+    else:
+        workers, threads = (int(value) for value in config.split("x"))
+        plan = plan_threads(workers, "process", threads_per_worker=threads, pin=pin)
+    apply_plan(plan)
+    concurrency = concurrency or 2 * plan.workers
+
+    scheduler = SynthesisScheduler(KokoroEngine(), worker_mode=plan.worker_mode, queue_size=concurrency, plan=plan)
+    start = time.perf_counter()
+    await scheduler.start()
+    while scheduler.warmup_seconds is None:
+        await asyncio.sleep(0.05)
+    startup_seconds = time.perf_counter() - start
+
+    latencies = []
+    audio_seconds = 0.0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal audio_seconds
+        for i in counter:
+            sent = time.perf_counter()
+            audio = await scheduler.synthesize(TEXTS[i % len(TEXTS)])
+            latencies.append(time.perf_counter() - sent)
+            audio_seconds += len(audio) / SAMPLE_RATE
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+
+    latencies.sort()
+    return {
+        "config": config,
+        "plan": plan.as_dict(),
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "startup_seconds": round(startup_seconds, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "audio_seconds_per_second": round(audio_seconds / elapsed, 2),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        "latency_max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    from thread_plan import available_cpus
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", help="Configurations séparées par des virgules (WORKERSxTHREADS ou thread)")
+    parser.add_argument("--requests", type=int, default=40, help="Requêtes par configuration")
+    parser.add_argument("--concurrency", type=int, default=0, help="Clients simultanés (0 = deux par worker)")
+    parser.add_argument("--pin", action="store_true", help="Épingler les workers sur leurs cœurs")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_run(args.child, args.requests, args.concurrency, args.pin))))
+        return
+
+    cpus, source = available_cpus()
+    configs = args.configs.split(",") if args.configs else default_configs(cpus)
+    print(f"{cpus} CPU disponible(s) ({source}), configurations: {', '.join(configs)}")
+
+    results = []
+    for config in configs:
+        print(f"Mesure de {config}...")
+        command = [sys.executable, os.path.abspath(__file__), "--child", config,
+                   "--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+        if args.pin:
+            command.append("--pin")
+        proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT_DIR)
+        if proc.returncode != 0:
+            print(f"   ❌ Échec de {config}: {proc.stderr[-500:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print()
+    print(f"{'config':<10}{'clients':>8}{'req/s':>9}{'audio/s':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for r in results:
+        print(
+            f"{r['config']:<10}{r['concurrency']:>8}{r['requests_per_second']:>9.2f}{r['audio_seconds_per_second']:>9.2f}s"
+            f"{r['latency_p50_ms']:>8.0f}ms{r['latency_p95_ms']:>8.0f}ms{r['latency_max_ms']:>8.0f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cpus": cpus, "cpu_source": source, "texts": TEXTS, "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
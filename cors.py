@@ -0,0 +1,75 @@
+"""
+Politique CORS de l'API
+
+Les origines autorisées sont lues une fois au démarrage (TTS_CORS_ORIGINS,
+TTS_CORS_ORIGIN_REGEX) et appliquées à un seul endroit: CORSMiddleware pour
+toutes les réponses et les préflights, et `headers_for` pour les erreurs 500
+produites hors de la pile de middlewares. Les navigateurs gardent la réponse
+au préflight pendant TTS_CORS_MAX_AGE secondes.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Pattern, Tuple
+
+# Frontend et domaines de déploiement autorisés par défaut
+DEFAULT_ORIGINS = (
+    "https://tts-programme.vercel.app",
+    "https://kokoro-tts-api-production-b52e.up.railway.app",
+    "http://localhost:5173",  # Vite dev server
+    "http://localhost:4173",  # Vite preview server
+    "http://localhost:8000",  # API locale
+    "http://127.0.0.1:5173",
+    "http://127.0.0.1:4173",
+    "http://127.0.0.1:8000",  # API locale
+)
+
+# Origines autorisées, séparées par des virgules (remplace la liste par défaut)
+TTS_CORS_ORIGINS = os.environ.get("TTS_CORS_ORIGINS", ",".join(DEFAULT_ORIGINS))
+# Expression régulière d'origines supplémentaires (ex: déploiements de preview), vide = aucune
+TTS_CORS_ORIGIN_REGEX = os.environ.get("TTS_CORS_ORIGIN_REGEX", "")
+# Durée de cache des préflights côté navigateur (secondes)
+TTS_CORS_MAX_AGE = int(os.environ.get("TTS_CORS_MAX_AGE", "3600"))
+
+
+@dataclass(frozen=True)
+class CORSPolicy:
+    origins: FrozenSet[str]
+    origin_regex: Optional[Pattern[str]] = None
+    allow_credentials: bool = True
+    allow_methods: Tuple[str, ...] = ("GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD")
+    max_age: int = TTS_CORS_MAX_AGE
+
+    @classmethod
+    def from_env(cls) -> "CORSPolicy":
+        return cls(
+            origins=frozenset(origin.strip().rstrip("/") for origin in TTS_CORS_ORIGINS.split(",") if origin.strip()),
+            origin_regex=re.compile(TTS_CORS_ORIGIN_REGEX) if TTS_CORS_ORIGIN_REGEX else None,
+        )
+
+    def is_allowed(self, origin: str) -> bool:
+        return origin in self.origins or (self.origin_regex is not None and self.origin_regex.fullmatch(origin) is not None)
+
+    def middleware_options(self) -> Dict[str, object]:
+        """Paramètres de CORSMiddleware"""
+        return {
+            "allow_origins": sorted(self.origins),
+            "allow_origin_regex": self.origin_regex.pattern if self.origin_regex is not None else None,
+            "allow_credentials": self.allow_credentials,
+            "allow_methods": list(self.allow_methods),
+            "allow_headers": ["*"],
+            "expose_headers": ["*"],
+            "max_age": self.max_age,
+        }
+
+    def headers_for(self, origin: str) -> Dict[str, str]:
+        """
+        En-têtes CORS d'une réponse construite hors de CORSMiddleware
+        (vide si l'origine n'est pas autorisée)
+        """
+        if not origin or not self.is_allowed(origin):
+            return {}
+        headers = {"Access-Control-Allow-Origin": origin, "Vary": "Origin"}
+        if self.allow_credentials:
+            headers["Access-Control-Allow-Credentials"] = "true"
+        return headers
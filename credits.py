@@ -0,0 +1,312 @@
+"""
+Comptage des crédits par utilisateur
+
+Un texte coûte ceil(caractères / TTS_CREDIT_CHARS_PER_CREDIT) crédits. Pour ne
+pas ajouter d'aller-retour en base à chaque synthèse, chaque processus de l'API
+loue des blocs de crédits à `users.credits` par un UPDATE conditionnel (jamais
+de lecture-modification-écriture), puis débite en mémoire: la base n'est
+sollicitée que quand le bloc loué est épuisé. Les débits et remboursements sont
+cumulés et écrits dans `credit_ledger` à chaque passage périodique, qui
+restitue aussi les blocs inutilisés des utilisateurs inactifs. Un arrêt brutal
+du processus perd au plus un bloc par utilisateur actif (visible dans le
+journal: location sans restitution).
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import CreditLedger, User
+
+# Caractères synthétisés par crédit
+TTS_CREDIT_CHARS_PER_CREDIT = int(os.environ.get("TTS_CREDIT_CHARS_PER_CREDIT", "100"))
+# Crédits loués d'un coup à la base par processus et par utilisateur
+TTS_CREDIT_LEASE_BLOCK = int(os.environ.get("TTS_CREDIT_LEASE_BLOCK", "50"))
+# Intervalle d'écriture du journal et de restitution des blocs inutilisés (secondes)
+TTS_CREDIT_FLUSH_INTERVAL_S = int(os.environ.get("TTS_CREDIT_FLUSH_INTERVAL_S", "30"))
+# Inactivité au-delà de laquelle le reste d'un bloc est rendu à la base (secondes)
+TTS_CREDIT_LEASE_IDLE_S = int(os.environ.get("TTS_CREDIT_LEASE_IDLE_S", "300"))
+
+# Tentatives de prise du reste des crédits quand un autre processus modifie le solde en même temps
+_CAS_ATTEMPTS = 3
+
+
+class InsufficientCreditsError(Exception):
+    def __init__(self, needed: int, available: int):
+        super().__init__(f"{needed} crédit(s) nécessaire(s), {available} disponible(s)")
+        self.needed = needed
+        self.available = available
+
+
+@dataclass
+class Charge:
+    """Débit réservé pour une synthèse (remboursable tant qu'il n'est pas réglé)"""
+    user_id: int
+    amount: int
+    settled: bool = False
+
+
+@dataclass
+class _Lease:
+    """Crédits loués par ce processus pour un utilisateur, et mouvements pas encore journalisés"""
+    balance: int = 0
+    charged: int = 0
+    charges: int = 0
+    refunded: int = 0
+    refunds: int = 0
+    last_used: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def pending(self) -> bool:
+        return bool(self.charges or self.refunds)
+
+
+def _take_credits(user_id: int, wanted: int, needed: int) -> Tuple[int, Optional[int]]:
+    """
+    Louer `wanted` crédits (ou tout le reste s'il couvre `needed`) par UPDATE conditionnel.
+    Retourne (crédits obtenus, solde restant en base), solde None = crédits illimités.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, User.credits >= wanted)
+            .values(credits=User.credits - wanted)
+            .execution_options(synchronize_session=False)
+        )
+        granted = wanted if result.rowcount == 1 else 0
+        remaining = None
+        for _ in range(_CAS_ATTEMPTS):
+            if granted:
+                break
+            remaining = db.query(User.credits).filter(User.id == user_id).scalar()
+            if remaining is None or remaining < needed:
+                break
+            # Moins qu'un bloc mais assez pour cette synthèse: prendre le reste si le solde n'a pas bougé
+            result = db.execute(
+                update(User)
+                .where(User.id == user_id, User.credits == remaining)
+                .values(credits=0)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                granted, remaining = remaining, 0
+        if granted:
+            db.add(CreditLedger(user_id=user_id, kind="lease", amount=granted))
+        db.commit()
+        return granted, remaining
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _settle(user_id: int, returned: int, charged: int, charges: int, refunded: int, refunds: int) -> None:
+    """
+    Rendre des crédits loués à la base et journaliser les débits/remboursements cumulés (une transaction)
+    """
+    db = SessionLocal()
+    try:
+        if returned:
+            result = db.execute(
+                update(User)
+                .where(User.id == user_id, User.credits.isnot(None))
+                .values(credits=User.credits + returned)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                db.add(CreditLedger(user_id=user_id, kind="return", amount=returned))
+        if charges:
+            db.add(CreditLedger(user_id=user_id, kind="charge", amount=charged, operations=charges))
+        if refunds:
+            db.add(CreditLedger(user_id=user_id, kind="refund", amount=refunded, operations=refunds))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class CreditMeter:
+    """
+    Réservation, remboursement et journalisation des crédits, avec location par blocs
+    """
+
+    def __init__(
+        self,
+        chars_per_credit: int = TTS_CREDIT_CHARS_PER_CREDIT,
+        lease_block: int = TTS_CREDIT_LEASE_BLOCK,
+        flush_interval: int = TTS_CREDIT_FLUSH_INTERVAL_S,
+        idle_seconds: int = TTS_CREDIT_LEASE_IDLE_S,
+        on_change: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        self.chars_per_credit = max(1, chars_per_credit)
+        self.lease_block = max(1, lease_block)
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        # Appelé quand le solde en base d'un utilisateur change (invalidation du cache utilisateur)
+        self.on_change = on_change
+        self._leases: Dict[int, _Lease] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Compteurs
+        self.reservations = 0
+        self.local_reservations = 0
+        self.lease_round_trips = 0
+        self.refunds = 0
+        self.rejected = 0
+        self.flush_errors = 0
+
+    def cost(self, text: str) -> int:
+        return max(1, math.ceil(len(text) / self.chars_per_credit))
+
+    def split_cost(self, parts: List[str]) -> List[int]:
+        """
+        Coût de chaque partie d'un texte découpé (segments d'un flux): chaque
+        partie paie les crédits entamés par ses caractères, le total est celui du texte
+        """
+        costs = []
+        characters = charged = 0
+        for part in parts:
+            characters += len(part)
+            total = max(1, math.ceil(characters / self.chars_per_credit))
+            costs.append(total - charged)
+            charged = total
+        return costs
+
+    def leased(self, user_id: int) -> int:
+        """Crédits loués par ce processus et pas encore consommés"""
+        lease = self._leases.get(user_id)
+        return lease.balance if lease else 0
+
+    async def _changed(self, user_id: int) -> None:
+        if self.on_change is not None:
+            await self.on_change(user_id)
+
+    async def reserve(self, user_id: int, amount: int) -> Charge:
+        """
+        Débiter `amount` crédits (sans accès base si le bloc loué suffit);
+        lève InsufficientCreditsError si le solde ne couvre pas la synthèse
+        """
+        lease = self._leases.setdefault(user_id, _Lease())
+        lease.last_used = time.monotonic()
+        self.reservations += 1
+        if lease.balance >= amount:
+            self.local_reservations += 1
+        else:
+            async with lease.lock:
+                while lease.balance < amount:
+                    needed = amount - lease.balance
+                    granted, remaining = await run_in_threadpool(
+                        _take_credits, user_id, max(self.lease_block, needed), needed
+                    )
+                    self.lease_round_trips += 1
+                    if granted == 0 and remaining is None:
+                        # Crédits illimités (ou passés à illimité): rien à débiter
+                        return Charge(user_id, 0, settled=True)
+                    if granted == 0:
+                        self.rejected += 1
+                        raise InsufficientCreditsError(amount, lease.balance + (remaining or 0))
+                    lease.balance += granted
+                    await self._changed(user_id)
+        lease.balance -= amount
+        lease.charged += amount
+        lease.charges += 1
+        return Charge(user_id, amount)
+
+    def refund(self, charge: Charge) -> None:
+        """Rendre les crédits d'une synthèse échouée (au bloc loué, restitué plus tard à la base)"""
+        if charge.settled or charge.amount <= 0:
+            return
+        charge.settled = True
+        lease = self._leases.setdefault(charge.user_id, _Lease())
+        lease.balance += charge.amount
+        lease.refunded += charge.amount
+        lease.refunds += 1
+        self.refunds += 1
+
+    def commit(self, charge: Charge) -> None:
+        """Marquer un débit comme définitif (la synthèse a réussi)"""
+        charge.settled = True
+
+    async def flush(self, force: bool = False) -> None:
+        """
+        Journaliser les mouvements cumulés et rendre les blocs des utilisateurs
+        inactifs (tous si `force`, à l'arrêt)
+        """
+        now = time.monotonic()
+        for user_id, lease in list(self._leases.items()):
+            if lease.lock.locked():
+                continue
+            idle = force or now - lease.last_used > self.idle_seconds
+            returned = lease.balance if idle else 0
+            if not returned and not lease.pending():
+                if idle:
+                    del self._leases[user_id]
+                continue
+
+            moves = (lease.charged, lease.charges, lease.refunded, lease.refunds)
+            lease.balance -= returned
+            lease.charged = lease.charges = lease.refunded = lease.refunds = 0
+            try:
+                await run_in_threadpool(_settle, user_id, returned, *moves)
+            except Exception as e:
+                # Réessayé au prochain passage
+                self.flush_errors += 1
+                lease.balance += returned
+                lease.charged += moves[0]
+                lease.charges += moves[1]
+                lease.refunded += moves[2]
+                lease.refunds += moves[3]
+                logging.error(f"Credit flush failed for user {user_id}: {e}")
+                continue
+            if returned:
+                await self._changed(user_id)
+            if idle and lease.balance == 0 and not lease.pending() and self._leases.get(user_id) is lease:
+                del self._leases[user_id]
+
+    def start(self) -> None:
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(force=True)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Credit flush pass failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "chars_per_credit": self.chars_per_credit,
+            "lease_block": self.lease_block,
+            "active_leases": len(self._leases),
+            "leased_credits": sum(lease.balance for lease in self._leases.values()),
+            "reservations": self.reservations,
+            # Réservations servies par le bloc loué, sans aller-retour en base
+            "local_reservations": self.local_reservations,
+            "lease_round_trips": self.lease_round_trips,
+            "refunds": self.refunds,
+            "rejected": self.rejected,
+            "flush_errors": self.flush_errors,
+        }
@@ -3,9 +3,11 @@ Configuration de la base de données PostgreSQL
 """
 import os
 import logging
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 logging.basicConfig(level=logging.INFO)
 
@@ -26,29 +28,85 @@ if DATABASE_URL.startswith("postgres://"):
 db_host = DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else "unknown"
 logging.info(f"Database URL configured: ***@{db_host}")
 
-# Créer le moteur SQLAlchemy
+# Options du moteur SQLAlchemy
 # Forcer l'utilisation d'IPv4 si localhost est utilisé
 connect_args = {}
-if "localhost" in DATABASE_URL or "127.0.0.1" in DATABASE_URL:
+pool_options = {"pool_size": 5, "max_overflow": 10}
+if DATABASE_URL.startswith("sqlite"):
+    # SQLite (benchmarks et essais hors ligne): sessions utilisées depuis le threadpool
+    connect_args = {"check_same_thread": False}
+    if DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+        # Base en mémoire: une seule connexion partagée, sinon chaque connexion a sa propre base vide
+        pool_options = {"poolclass": StaticPool}
+elif "localhost" in DATABASE_URL or "127.0.0.1" in DATABASE_URL:
     # Forcer IPv4 pour éviter les problèmes de résolution
     connect_args = {"connect_timeout": 10}
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Vérifier la connexion avant utilisation
-    pool_size=5,
-    max_overflow=10,
-    echo=False,  # Mettre à True pour voir les requêtes SQL en développement
-    connect_args=connect_args
-)
+# Moteur créé au premier accès à la base, pas à l'import: le pilote (psycopg2)
+# et le pool ne sont chargés que par les processus qui en ont besoin
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Moteur SQLAlchemy du processus (créé au premier appel)
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    DATABASE_URL,
+                    pool_pre_ping=True,  # Vérifier la connexion avant utilisation
+                    echo=False,  # Mettre à True pour voir les requêtes SQL en développement
+                    connect_args=connect_args,
+                    **pool_options
+                )
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+class _LazySessionMaker(sessionmaker):
+    """Session factory qui crée le moteur à la première session ouverte"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
 
 # Créer la session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _LazySessionMaker(autocommit=False, autoflush=False)
+
+
+def __getattr__(name):
+    # `from database import engine` reste possible (crée le moteur)
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Base pour les modèles
 Base = declarative_base()
 
 
+def pool_status() -> dict:
+    """
+    État du pool de connexions, lu en mémoire (n'ouvre aucune connexion,
+    ne crée pas le moteur)
+    """
+    if _engine is None:
+        return {"class": None}
+    pool = _engine.pool
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
 def get_db():
     """
     Dependency pour obtenir une session de base de données
@@ -64,9 +122,9 @@ def init_db():
     """
     Initialiser la base de données (créer les tables)
     """
-    from models import User  # Import ici pour éviter les imports circulaires
+    from models import User, SynthesisJob, SynthesisHistory, CreditLedger  # Import ici pour éviter les imports circulaires
     
     logging.info("Initializing database...")
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
     logging.info("Database initialized successfully")
 
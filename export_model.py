@@ -0,0 +1,107 @@
+"""
+Export hors ligne du modèle Kokoro pour le backend onnx (TTS_ENGINE_BACKEND=onnx)
+
+Usage:
+    python export_model.py
+    python export_model.py --output models/kokoro.onnx --no-quantize
+    python export_model.py --output models/kokoro-int8.onnx --repo-id hexgrad/Kokoro-82M
+
+Le modèle torch est exporté en ONNX (entrées: input_ids, ref_s, speed; sortie:
+le signal), puis, sauf --no-quantize, ses poids sont quantifiés en int8
+(quantification dynamique d'onnxruntime). Le vocabulaire des phonèmes est
+écrit à côté, dans `<fichier>.json`. Demande torch, kokoro, onnx et
+onnxruntime; à lancer une fois (ou à chaque changement de version de kokoro),
+pas au démarrage de l'API.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from tts_engine import KOKORO_REPO_ID, MAX_PHONEMES, TTS_ONNX_MODEL_PATH, _package_version
+
+# Opset ONNX de l'export (STFT réel sans nombres complexes)
+OPSET = 17
+
+
+def export_onnx(repo_id: str, path: str) -> dict:
+    import torch
+    from kokoro import KModel
+
+    # disable_complex: STFT sans tenseurs complexes, non exportables en ONNX
+    model = KModel(repo_id=repo_id, disable_complex=True).to("cpu").eval()
+
+    class _Export(torch.nn.Module):
+        def __init__(self, kmodel):
+            super().__init__()
+            self.kmodel = kmodel
+
+        def forward(self, input_ids, ref_s, speed):
+            audio, _ = self.kmodel.forward_with_tokens(input_ids, ref_s, speed)
+            return audio
+
+    input_ids = torch.zeros((1, 64), dtype=torch.long)
+    ref_s = torch.randn(1, 256)
+    speed = torch.ones(1, dtype=torch.float32)
+    torch.onnx.export(
+        _Export(model),
+        (input_ids, ref_s, speed),
+        path,
+        input_names=["input_ids", "ref_s", "speed"],
+        output_names=["audio"],
+        dynamic_axes={"input_ids": {1: "tokens"}, "audio": {0: "samples"}},
+        opset_version=OPSET,
+        do_constant_folding=True,
+    )
+    return model.vocab
+
+
+def quantize(source: str, destination: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, destination, weight_type=QuantType.QInt8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter Kokoro en ONNX (int8 par défaut)")
+    parser.add_argument("--output", default=TTS_ONNX_MODEL_PATH, help="Fichier ONNX produit")
+    parser.add_argument("--repo-id", default=KOKORO_REPO_ID)
+    parser.add_argument("--no-quantize", action="store_true", help="Garder les poids en float32")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Export de {args.repo_id} vers {args.output}")
+    print("=" * 60)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fp32_path = args.output if args.no_quantize else f"{args.output}.fp32.tmp"
+    start = time.perf_counter()
+    try:
+        vocab = export_onnx(args.repo_id, fp32_path)
+        print(f"✅ Export ONNX float32 en {time.perf_counter() - start:.1f}s ({os.path.getsize(fp32_path) / 1e6:.0f} Mo)")
+        if not args.no_quantize:
+            quantize(fp32_path, args.output)
+            print(f"✅ Quantification int8 ({os.path.getsize(args.output) / 1e6:.0f} Mo)")
+    except Exception as e:
+        print(f"❌ Export impossible: {e}")
+        sys.exit(1)
+    finally:
+        if not args.no_quantize and os.path.exists(fp32_path):
+            os.remove(fp32_path)
+
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "repo_id": args.repo_id,
+            "kokoro_version": _package_version("kokoro"),
+            "quantized": not args.no_quantize,
+            "opset": OPSET,
+            "max_phonemes": MAX_PHONEMES,
+            "vocab": vocab,
+        }, f, ensure_ascii=False)
+    print(f"✅ Métadonnées écrites dans {args.output}.json")
+    print(f"   Lancer l'API avec TTS_ENGINE_BACKEND=onnx TTS_ONNX_MODEL_PATH={args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Cache des phonèmes (G2P) devant le pipeline Kokoro
+
+La conversion graphèmes -> phonèmes (misaki, espeak) coûte une bonne part du
+CPU d'une synthèse, alors que les mêmes phrases reviennent souvent. Chaque
+moteur garde donc les phonèmes par (langue, phrase normalisée), avec une
+taille bornée (LRU) et, si TTS_G2P_CACHE_PATH est défini, une copie sur disque
+relue au démarrage. Les phonèmes sont ensuite passés directement au modèle
+(`KPipeline.generate_from_tokens`).
+"""
+import collections
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Nombre maximal de phrases gardées par moteur (0 = cache désactivé)
+TTS_G2P_CACHE_ENTRIES = int(os.environ.get("TTS_G2P_CACHE_ENTRIES", "20000"))
+# Fichier de persistance (vide = cache en mémoire uniquement)
+TTS_G2P_CACHE_PATH = os.environ.get("TTS_G2P_CACHE_PATH", "")
+# Nouvelles entrées après lesquelles le fichier est réécrit
+TTS_G2P_CACHE_SAVE_EVERY = int(os.environ.get("TTS_G2P_CACHE_SAVE_EVERY", "500"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_FILE_FORMAT = 1
+
+
+def normalize_sentence(text: str) -> str:
+    """Normaliser une phrase pour la clé du cache (Unicode NFC, espaces fusionnés)"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class G2PCache:
+    """
+    Cache LRU (langue, phrase normalisée) -> morceaux de phonèmes, avec persistance optionnelle
+    """
+
+    def __init__(
+        self,
+        max_entries: int = TTS_G2P_CACHE_ENTRIES,
+        path: str = TTS_G2P_CACHE_PATH,
+        version: str = "",
+        save_every: int = TTS_G2P_CACHE_SAVE_EVERY,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        # Version du G2P (kokoro/misaki): un fichier d'une autre version est ignoré
+        self.version = version
+        self.save_every = max(1, save_every)
+        self._entries: "collections.OrderedDict[Tuple[str, str], List[str]]" = collections.OrderedDict()
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.g2p_seconds = 0.0
+        self.loaded_entries = 0
+        self.saves = 0
+        self.save_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_or_compute(self, lang: str, sentence: str, compute: Callable[[str], List[str]]) -> List[str]:
+        """
+        Phonèmes d'une phrase (déjà normalisée), calculés par `compute` si absents du cache
+        """
+        key = (lang, sentence)
+        phonemes = self._entries.get(key)
+        if phonemes is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return phonemes
+
+        start = time.perf_counter()
+        phonemes = compute(sentence)
+        self.g2p_seconds += time.perf_counter() - start
+        self.misses += 1
+        if self.enabled:
+            self._entries[key] = phonemes
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            if self.path and self._unsaved >= self.save_every:
+                self.save()
+        return phonemes
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._entries
+
+    def load(self) -> int:
+        """Relire le fichier de persistance (entrées les plus récentes en dernier)"""
+        if not self.path or not self.enabled or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read G2P cache {self.path}: {e}")
+            return 0
+        if data.get("format") != _FILE_FORMAT or data.get("version") != self.version:
+            logging.info(f"G2P cache {self.path} was written by another G2P version, ignoring it")
+            return 0
+        for lang, sentence, phonemes in data.get("entries", [])[-self.max_entries:]:
+            self._entries[(lang, sentence)] = phonemes
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.loaded_entries = len(self._entries)
+        logging.info(f"G2P cache: {self.loaded_entries} sentence(s) loaded from {self.path}")
+        return self.loaded_entries
+
+    def save(self) -> None:
+        """
+        Écrire le cache sur disque (écriture atomique). Les entrées déjà présentes
+        dans le fichier (écrites par d'autres workers) sont conservées.
+        """
+        if not self.path or not self.enabled:
+            return
+        with self._save_lock:
+            merged: "collections.OrderedDict[Tuple[str, str], List[str]]" = collections.OrderedDict()
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("format") == _FILE_FORMAT and data.get("version") == self.version:
+                    for lang, sentence, phonemes in data.get("entries", []):
+                        merged[(lang, sentence)] = phonemes
+            except (OSError, ValueError):
+                pass
+            for key, phonemes in list(self._entries.items()):
+                merged.pop(key, None)
+                merged[key] = phonemes
+            entries = [[lang, sentence, phonemes] for (lang, sentence), phonemes in merged.items()]
+            entries = entries[-self.max_entries:]
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"format": _FILE_FORMAT, "version": self.version, "entries": entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.save_errors += 1
+                logging.warning(f"Could not write G2P cache {self.path}: {e}")
+                return
+            self._unsaved = 0
+            self.saves += 1
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        mean_g2p_ms = self.g2p_seconds * 1000 / self.misses if self.misses else None
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": bool(self.path),
+            "loaded_entries": self.loaded_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "g2p_ms_total": round(self.g2p_seconds * 1000, 1),
+            "g2p_ms_per_miss": round(mean_g2p_ms, 2) if mean_g2p_ms is not None else None,
+            # Temps de G2P évité: chaque hit aurait coûté un G2P moyen
+            "saved_ms_estimate": round(self.hits * mean_g2p_ms, 1) if mean_g2p_ms is not None else None,
+            "saves": self.saves,
+            "save_errors": self.save_errors,
+        }
+
+
+def merge_stats(all_stats: Iterable[Dict[str, object]]) -> Dict[str, object]:
+    """Cumuler les statistiques des caches de plusieurs moteurs (workers)"""
+    all_stats = [stats for stats in all_stats if stats]
+    hits = sum(stats["hits"] for stats in all_stats)
+    misses = sum(stats["misses"] for stats in all_stats)
+    g2p_ms = sum(stats["g2p_ms_total"] for stats in all_stats)
+    mean_g2p_ms = g2p_ms / misses if misses else None
+    return {
+        "engines": len(all_stats),
+        "entries": sum(stats["entries"] for stats in all_stats),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        "g2p_ms_total": round(g2p_ms, 1),
+        "g2p_ms_per_miss": round(mean_g2p_ms, 2) if mean_g2p_ms is not None else None,
+        "saved_ms_estimate": round(hits * mean_g2p_ms, 1) if mean_g2p_ms is not None else None,
+        # G2P évité en moyenne par phrase synthétisée
+        "saved_ms_per_sentence": round(hits * mean_g2p_ms / (hits + misses), 2) if mean_g2p_ms is not None else None,
+    }
@@ -0,0 +1,172 @@
+"""
+Historique de synthèse des utilisateurs (table synthesis_history)
+
+Chaque génération d'un utilisateur connecté ajoute une ligne; la lecture est
+paginée par curseur (keyset) sur (created_at, id) décroissants, ce qui reste
+en temps constant quelle que soit la profondeur de la page grâce à l'index
+(user_id, created_at).
+"""
+import base64
+import hashlib
+import json
+import logging
+import wave
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, undefer
+
+from audio_cache import normalize_text
+from database import SessionLocal
+from models import SynthesisHistory, User
+
+# Taille de page par défaut et maximale de GET /api/history
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+class InvalidCursorError(ValueError):
+    """Curseur de pagination illisible"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def wav_duration(path: str) -> Optional[float]:
+    """Durée d'un fichier WAV en secondes (None si illisible)"""
+    try:
+        with wave.open(path, "rb") as source:
+            return round(source.getnframes() / source.getframerate(), 3)
+    except (OSError, wave.Error):
+        return None
+
+
+def _new_entry(user_id: int, text: str, voice: str, speed: float, **fields) -> SynthesisHistory:
+    return SynthesisHistory(
+        user_id=user_id,
+        text_hash=text_hash(text),
+        text_preview=text[:200],
+        text_length=len(text),
+        voice=voice,
+        speed=speed,
+        **fields,
+    )
+
+
+def record_synthesis(
+    user_id: int,
+    text: str,
+    voice: str,
+    speed: float,
+    audio_format: str,
+    audio_file: str,
+    source_path: str,
+    synthesis_ms: float,
+    cached: bool,
+) -> None:
+    """
+    Enregistrer une génération dans l'historique (appelé en tâche de fond, après la réponse)
+    """
+    db = SessionLocal()
+    try:
+        db.add(_new_entry(
+            user_id, text, voice, speed,
+            created_at=datetime.now(timezone.utc),
+            format=audio_format,
+            audio_file=audio_file,
+            duration_seconds=wav_duration(source_path),
+            synthesis_ms=round(synthesis_ms, 1),
+            cached=cached,
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Could not record synthesis history for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+def encode_cursor(entry: SynthesisHistory) -> str:
+    payload = json.dumps([entry.created_at.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(cursor) from e
+
+
+def list_history(
+    db: Session, user_id: int, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Une page de l'historique, du plus récent au plus ancien; retourne (entrées, curseur suivant)
+    """
+    query = db.query(SynthesisHistory).filter(SynthesisHistory.user_id == user_id)
+    if cursor:
+        created_at, entry_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            SynthesisHistory.created_at < created_at,
+            and_(SynthesisHistory.created_at == created_at, SynthesisHistory.id < entry_id),
+        ))
+    rows = (
+        query.order_by(SynthesisHistory.created_at.desc(), SynthesisHistory.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [row.to_dict() for row in rows[:limit]], next_cursor
+
+
+def _parse_created_at(value) -> datetime:
+    if isinstance(value, str):
+        try:
+            created_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc)
+
+
+def migrate_json_history(db: Session, batch_size: int = 100) -> Tuple[int, int]:
+    """
+    Déplacer les historiques JSON (`User.history`) dans la table synthesis_history,
+    un utilisateur par transaction; relançable sans doublon (le JSON est vidé une
+    fois copié). Retourne (utilisateurs migrés, entrées migrées).
+    """
+    users_done = entries_done = 0
+    last_id = 0
+    while True:
+        users = (
+            db.query(User)
+            .options(undefer(User.history))
+            .filter(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not users:
+            break
+        for user in users:
+            last_id = user.id
+            if not user.history:
+                continue
+            items = [item for item in user.history if isinstance(item, dict)]
+            for item in items:
+                db.add(_new_entry(
+                    user.id, item.get("text") or "", item.get("voice") or "ff_siwis", float(item.get("speed") or 1.0),
+                    created_at=_parse_created_at(item.get("created_at")),
+                    format="wav",
+                    audio_file=item.get("audio_file"),
+                ))
+            user.history = []
+            db.commit()
+            users_done += 1
+            entries_done += len(items)
+    return users_done, entries_done
@@ -0,0 +1,299 @@
+"""
+Jobs de synthèse asynchrones pour les textes longs
+
+`POST /tts/jobs` crée un job en base et rend la main immédiatement; le texte
+est découpé en segments synthétisés en arrière-plan (plusieurs à la fois dans
+la file de l'ordonnanceur, chaque segment passe par le cache audio), puis les
+segments sont raccordés (silence et fondus de segment_pipeline) dans
+`job_<id>.wav`. L'état est conservé en base: les jobs interrompus reprennent
+au démarrage suivant, les segments déjà synthétisés étant retrouvés dans le cache.
+"""
+import asyncio
+import collections
+import logging
+import os
+import uuid
+import wave
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from audio_cache import AudioCache, cache_key
+from credits import Charge, CreditMeter
+from database import SessionLocal
+from models import SynthesisJob
+from segment_pipeline import SegmentPipeline, iter_stitch
+from text_pipeline import split_sentences
+from tts_engine import SAMPLE_RATE, read_wav, to_pcm16
+
+# Longueur maximale d'un texte de job (caractères)
+JOB_MAX_CHARS = int(os.environ.get("TTS_JOB_MAX_CHARS", "100000"))
+# Nombre de jobs traités en parallèle (chacun garde au plus SEGMENTS_PER_WORKER segments par worker en file)
+JOB_CONCURRENCY = int(os.environ.get("TTS_JOB_CONCURRENCY", "1"))
+# Intervalle des commentaires keepalive du flux SSE de progression (secondes, 0 = aucun)
+JOB_EVENTS_KEEPALIVE_S = float(os.environ.get("TTS_JOB_EVENTS_KEEPALIVE_S", "15"))
+# Segments d'un job en file en même temps, par worker de synthèse
+SEGMENTS_PER_WORKER = 2
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+# Fichier du job supprimé par la rétention de outputs/ (voir retention.py)
+STATUS_EXPIRED = "expired"
+TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_EXPIRED)
+
+
+class JobNotFoundError(Exception):
+    """Job inconnu"""
+
+
+def _update_job(job_id: str, **fields) -> Optional[dict]:
+    """Mettre à jour un job en base et retourner son nouvel état"""
+    db = SessionLocal()
+    try:
+        job = db.query(SynthesisJob).filter(SynthesisJob.id == job_id).first()
+        if job is None:
+            return None
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.commit()
+        db.refresh(job)
+        return job.to_dict()
+    finally:
+        db.close()
+
+
+class JobManager:
+    """
+    Exécution des jobs en arrière-plan et diffusion de leur progression (SSE)
+    """
+
+    def __init__(
+        self,
+        segment_pipeline: SegmentPipeline,
+        audio_cache: AudioCache,
+        output_dir: str,
+        credit_meter: Optional[CreditMeter] = None,
+    ):
+        self.segment_pipeline = segment_pipeline
+        self.scheduler = segment_pipeline.scheduler
+        self.audio_cache = audio_cache
+        self.output_dir = output_dir
+        self.credit_meter = credit_meter
+        self._semaphore = asyncio.Semaphore(max(1, JOB_CONCURRENCY))
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    # ---------- API ----------
+
+    async def create(
+        self, text: str, voice: str, speed: float, user_id: Optional[int] = None, credits_charged: int = 0
+    ) -> dict:
+        """Enregistrer un job en base et lancer son exécution en arrière-plan"""
+        def _insert():
+            db = SessionLocal()
+            try:
+                job = SynthesisJob(
+                    id=uuid.uuid4().hex,
+                    user_id=user_id,
+                    status=STATUS_QUEUED,
+                    text=text,
+                    voice=voice,
+                    speed=speed,
+                    segments_total=len(split_sentences(text)),
+                    segments_done=0,
+                    credits_charged=credits_charged,
+                )
+                db.add(job)
+                db.commit()
+                db.refresh(job)
+                return job.to_dict()
+            finally:
+                db.close()
+
+        job = await run_in_threadpool(_insert)
+        self._start(job["id"])
+        logging.info(f"Synthesis job {job['id']} created ({len(text)} chars, {job['segments_total']} segments)")
+        return job
+
+    async def get(self, job_id: str) -> dict:
+        def _load():
+            db = SessionLocal()
+            try:
+                job = db.query(SynthesisJob).filter(SynthesisJob.id == job_id).first()
+                return job.to_dict() if job else None
+            finally:
+                db.close()
+
+        job = await run_in_threadpool(_load)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    async def resume(self) -> int:
+        """Relancer les jobs non terminés (appelé au démarrage)"""
+        def _pending_ids() -> List[str]:
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(SynthesisJob.id)
+                    .filter(SynthesisJob.status.in_([STATUS_QUEUED, STATUS_RUNNING]))
+                    .order_by(SynthesisJob.created_at)
+                    .all()
+                )
+                return [row[0] for row in rows]
+            finally:
+                db.close()
+
+        job_ids = await run_in_threadpool(_pending_ids)
+        for job_id in job_ids:
+            self._start(job_id)
+        if job_ids:
+            logging.info(f"Resumed {len(job_ids)} unfinished synthesis job(s)")
+        return len(job_ids)
+
+    async def events(self, job_id: str, keepalive: float = JOB_EVENTS_KEEPALIVE_S):
+        """
+        Générateur d'événements de progression: l'état courant, puis chaque
+        mise à jour jusqu'à la fin du job. None après `keepalive` secondes sans
+        mise à jour (commentaire SSE, pour que les proxys ne ferment pas la connexion)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await self.get(job_id)
+            yield job
+            while job["status"] not in TERMINAL_STATUSES:
+                try:
+                    job = await asyncio.wait_for(queue.get(), keepalive if keepalive > 0 else None)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield job
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def stop(self) -> None:
+        """Annuler les jobs en cours (ils seront repris au prochain démarrage)"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    # ---------- Exécution ----------
+
+    def _start(self, job_id: str) -> None:
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def _publish(self, job: Optional[dict]) -> None:
+        if job is None:
+            return
+        for queue in self._subscribers.get(job["id"], ()):
+            queue.put_nowait(job)
+
+    async def _set(self, job_id: str, **fields) -> Optional[dict]:
+        job = await run_in_threadpool(_update_job, job_id, **fields)
+        self._publish(job)
+        return job
+
+    async def _synthesize_segments(
+        self, job_id: str, segments: List[str], keys: List[str], voice: str, speed: float
+    ) -> None:
+        """
+        Synthétiser les segments absents du cache: plusieurs segments en file à
+        la fois pour occuper tous les workers, écrits dans le cache dans l'ordre
+        du texte (la progression avance segment par segment)
+        """
+        window = SEGMENTS_PER_WORKER * max(1, self.scheduler.worker_count)
+        pending: Deque[Tuple[str, Optional[asyncio.Future]]] = collections.deque()
+        done = 0
+        try:
+            for index, segment in enumerate(segments):
+                future = None
+                if self.audio_cache.get(keys[index]) is None:
+                    future = await self.segment_pipeline.enqueue_segment(segment, voice, speed)
+                pending.append((keys[index], future))
+                while pending and (len(pending) > window or index == len(segments) - 1):
+                    key, future = pending.popleft()
+                    if future is not None:
+                        await self.audio_cache.store(key, await future)
+                    done += 1
+                    await self._set(job_id, segments_done=done)
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    async def _run(self, job_id: str) -> None:
+        async with self._semaphore:
+            def _load():
+                db = SessionLocal()
+                try:
+                    job = db.query(SynthesisJob).filter(SynthesisJob.id == job_id).first()
+                    return (job.text, job.voice, job.speed, job.user_id, job.credits_charged) if job else None
+                finally:
+                    db.close()
+
+            params = await run_in_threadpool(_load)
+            if params is None:
+                return
+            text, voice, speed, user_id, credits_charged = params
+            metrics.label_request(voice=voice, format="wav")
+            segments = split_sentences(text)
+            keys = [cache_key(segment, voice, speed) for segment in segments]
+
+            try:
+                await self._set(job_id, status=STATUS_RUNNING, segments_total=len(segments), segments_done=0, error=None)
+                # Les fichiers des segments sont relus à la concaténation: épinglés jusque-là
+                self.audio_cache.pin(keys)
+                try:
+                    await self._synthesize_segments(job_id, segments, keys, voice, speed)
+                    output_file = f"job_{job_id}.wav"
+                    await run_in_threadpool(self._concatenate, keys, output_file)
+                finally:
+                    self.audio_cache.unpin(keys)
+                await self._set(
+                    job_id,
+                    status=STATUS_COMPLETED,
+                    audio_file=f"/outputs/{output_file}",
+                    completed_at=datetime.now(timezone.utc),
+                )
+                logging.info(f"Synthesis job {job_id} completed ({len(segments)} segments)")
+            except asyncio.CancelledError:
+                logging.info(f"Synthesis job {job_id} interrupted, will resume on next startup")
+                raise
+            except Exception as e:
+                logging.error(f"Synthesis job {job_id} failed: {e}", exc_info=True)
+                await self._set(job_id, status=STATUS_FAILED, error=str(e)[:500])
+                if credits_charged and user_id is not None and self.credit_meter is not None:
+                    self.credit_meter.refund(Charge(user_id, credits_charged))
+                    await self._set(job_id, credits_charged=0)
+
+    def _concatenate(self, keys: List[str], output_file: str) -> None:
+        """
+        Raccorder les segments dans le fichier final, un segment en mémoire à la
+        fois (écriture atomique)
+        """
+        path = os.path.join(self.output_dir, output_file)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with wave.open(tmp_path, "wb") as out:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(SAMPLE_RATE)
+                chunks = (read_wav(self.audio_cache.path_for(key)) for key in keys)
+                for audio in iter_stitch(chunks):
+                    out.writeframes(to_pcm16(audio))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
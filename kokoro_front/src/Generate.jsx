@@ -1,7 +1,8 @@
 import { useState } from 'react';
 import { Link } from 'react-router-dom';
-import axios from 'axios';
 import UserMenu from '@/components/UserMenu.jsx';
+import { playStreamingTts } from '@/utils/streamAudio.js';
+import { getAuthenticatedAxios } from '@/utils/api.js';
 import './Generate.css';
 
 export default function Generate() {
@@ -9,6 +10,8 @@ export default function Generate() {
   const [audioUrl, setAudioUrl] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [streaming, setStreaming] = useState(true);
+  const [playing, setPlaying] = useState(false);
 
   const handleSubmit = async () => {
     if (!text.trim()) {
@@ -17,26 +20,40 @@ export default function Generate() {
     }
 
     setLoading(true);
+    setPlaying(false);
     setError('');
     setAudioUrl('');
 
     try {
       const API_URL = (import.meta.env.VITE_API_URL || 'https://kokoro-tts-api-production-b52e.up.railway.app').replace(/\/$/, '');
       
-      const response = await axios.post(`${API_URL}/tts`, 
-        { text: text.trim() },
-        { timeout: 300000 }
-      );
-      const filename = response.data.audio_file; 
-      setAudioUrl(`${API_URL}${filename}`);
+      if (streaming) {
+        // Lecture progressive: l'audio démarre dès que la première phrase est synthétisée
+        const blob = await playStreamingTts(
+          `${API_URL}/tts/stream`,
+          { text: text.trim() },
+          { onFirstAudio: () => setPlaying(true) }
+        );
+        setAudioUrl(URL.createObjectURL(blob));
+      } else {
+        // Avec le token si l'utilisateur est connecté: la génération est ajoutée à son historique
+        const response = await getAuthenticatedAxios().post('/tts',
+          { text: text.trim() },
+          { timeout: 300000 }
+        );
+        const filename = response.data.audio_file; 
+        setAudioUrl(`${API_URL}${filename}`);
+      }
     }
     catch (error) {
       console.error('Erreur lors de la génération de la synthèse vocale:', error);
       let errorMessage = 'Une erreur est survenue lors de la génération de la synthèse vocale.';
       
-      if (error.response) {
-        const status = error.response.status;
-        const detail = error.response.data?.detail || error.response.data?.message || 'Erreur inconnue';
+      if (error.response || error.status) {
+        const status = error.response ? error.response.status : error.status;
+        const detail = error.response
+          ? error.response.data?.detail || error.response.data?.message || 'Erreur inconnue'
+          : error.message;
         
         if (status === 404) {
           errorMessage = 'Endpoint non trouvé. Vérifiez que l\'URL de l\'API est correcte.';
@@ -44,6 +61,8 @@ export default function Generate() {
           errorMessage = `Erreur serveur: ${detail}`;
         } else if (status === 504) {
           errorMessage = 'La génération prend trop de temps. Essayez avec un texte plus court.';
+        } else if (status === 429 || status === 503) {
+          errorMessage = `Le service est très sollicité. ${detail}`;
         } else {
           errorMessage = `Erreur ${status}: ${detail}`;
         }
@@ -57,6 +76,7 @@ export default function Generate() {
     }
     finally {
       setLoading(false);
+      setPlaying(false);
     }
   };
 
@@ -112,6 +132,15 @@ export default function Generate() {
                   </span>
                 )}
               </div>
+              <label className="stream-toggle">
+                <input
+                  type="checkbox"
+                  checked={streaming}
+                  onChange={(e) => setStreaming(e.target.checked)}
+                  disabled={loading}
+                />
+                <span>Lecture progressive (écouter pendant la génération)</span>
+              </label>
             </div>
 
             {error && (
@@ -132,7 +161,7 @@ export default function Generate() {
               {loading ? (
                 <>
                   <div className="spinner"></div>
-                  <span>Génération en cours...</span>
+                  <span>{playing ? 'Lecture en cours...' : 'Génération en cours...'}</span>
                 </>
               ) : (
                 <>
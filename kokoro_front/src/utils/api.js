@@ -7,19 +7,26 @@ const getApiUrl = () => {
   return (import.meta.env.VITE_API_URL || 'https://kokoro-tts-api-production-b52e.up.railway.app').replace(/\/$/, '');
 };
 
+/**
+ * En-têtes JSON avec le token d'authentification s'il existe (axios et fetch)
+ */
+export const getAuthHeaders = () => {
+  const token = localStorage.getItem('token');
+  return {
+    'Content-Type': 'application/json',
+    ...(token && { 'Authorization': `Bearer ${token}` })
+  };
+};
+
 /**
  * Créer une instance axios avec le token d'authentification
  */
 export const getAuthenticatedAxios = () => {
-  const token = localStorage.getItem('token');
   const API_URL = getApiUrl();
   
   const instance = axios.create({
     baseURL: API_URL,
-    headers: {
-      'Content-Type': 'application/json',
-      ...(token && { 'Authorization': `Bearer ${token}` })
-    }
+    headers: getAuthHeaders()
   });
   
   return instance;
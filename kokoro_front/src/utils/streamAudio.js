@@ -0,0 +1,131 @@
+/**
+ * Lecture progressive de l'audio renvoyé par POST /tts/stream
+ *
+ * Le serveur envoie un en-tête WAV (longueur inconnue) puis du PCM 16 bits
+ * mono au fur et à mesure de la synthèse des phrases. Chaque morceau reçu est
+ * planifié dans un AudioContext à la suite du précédent, donc la lecture
+ * commence dès la première phrase. Le contexte est fermé à la fin de la lecture.
+ */
+
+import { getAuthHeaders } from './api.js';
+
+const WAV_HEADER_SIZE = 44;
+
+const concat = (a, b) => {
+  const out = new Uint8Array(a.length + b.length);
+  out.set(a, 0);
+  out.set(b, a.length);
+  return out;
+};
+
+/**
+ * Construire un fichier WAV complet (tailles corrigées) à partir des octets reçus
+ */
+const buildWavBlob = (chunks) => {
+  const total = chunks.reduce((sum, chunk) => sum + chunk.length, 0);
+  const bytes = new Uint8Array(total);
+  let offset = 0;
+  for (const chunk of chunks) {
+    bytes.set(chunk, offset);
+    offset += chunk.length;
+  }
+  const view = new DataView(bytes.buffer);
+  view.setUint32(4, total - 8, true);
+  view.setUint32(40, total - WAV_HEADER_SIZE, true);
+  return new Blob([bytes], { type: 'audio/wav' });
+};
+
+/**
+ * Lancer la synthèse en streaming et jouer l'audio au fil de l'eau.
+ *
+ * @param {string} url - URL complète de /tts/stream
+ * @param {object} body - Corps JSON de la requête ({ text })
+ * @param {object} options - { onFirstAudio, signal }
+ * @returns {Promise<Blob>} le fichier WAV complet, une fois le flux terminé
+ */
+export const playStreamingTts = async (url, body, { onFirstAudio, signal } = {}) => {
+  const response = await fetch(url, {
+    method: 'POST',
+    // Avec le token si l'utilisateur est connecté: la synthèse est décomptée de ses crédits
+    headers: getAuthHeaders(),
+    body: JSON.stringify(body),
+    signal,
+  });
+
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    const error = new Error(data.detail || `Erreur ${response.status}`);
+    error.status = response.status;
+    error.retryAfter = response.headers.get('Retry-After');
+    throw error;
+  }
+
+  const audioContext = new AudioContext();
+  // Les navigateurs limitent le nombre d'AudioContext ouverts: fermer celui-ci
+  // à la fin de la lecture, sur erreur et sur abandon
+  const closeContext = () => {
+    if (audioContext.state !== 'closed') {
+      audioContext.close().catch(() => {});
+    }
+  };
+  const reader = response.body.getReader();
+  const received = [];
+  let pending = new Uint8Array(0);
+  let sampleRate = null;
+  let playHead = 0;
+  let started = false;
+  let lastSource = null;
+
+  try {
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      received.push(value);
+      pending = concat(pending, value);
+
+      if (sampleRate === null) {
+        if (pending.length < WAV_HEADER_SIZE) continue;
+        sampleRate = new DataView(pending.buffer).getUint32(24, true);
+        pending = pending.slice(WAV_HEADER_SIZE);
+      }
+
+      // Ne jouer que des échantillons complets (2 octets)
+      const usable = pending.length - (pending.length % 2);
+      if (usable === 0) continue;
+      const samples = new Int16Array(pending.slice(0, usable).buffer);
+      pending = pending.slice(usable);
+
+      const floats = new Float32Array(samples.length);
+      for (let i = 0; i < samples.length; i += 1) {
+        floats[i] = samples[i] / 32768;
+      }
+      const buffer = audioContext.createBuffer(1, floats.length, sampleRate);
+      buffer.copyToChannel(floats, 0);
+      const source = audioContext.createBufferSource();
+      source.buffer = buffer;
+      source.connect(audioContext.destination);
+      playHead = Math.max(playHead, audioContext.currentTime + 0.05);
+      source.start(playHead);
+      playHead += buffer.duration;
+      lastSource = source;
+
+      if (!started) {
+        started = true;
+        onFirstAudio?.();
+      }
+    }
+  } catch (error) {
+    closeContext();
+    throw error;
+  }
+
+  // Le flux est reçu mais la lecture continue: fermer après le dernier morceau
+  if (lastSource) {
+    lastSource.onended = closeContext;
+  } else {
+    closeContext();
+  }
+  signal?.addEventListener('abort', closeContext, { once: true });
+
+  return buildWavBlob(received);
+};
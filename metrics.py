@@ -0,0 +1,275 @@
+"""
+Métriques au format d'exposition texte de Prometheus (GET /metrics)
+
+Compteurs, jauges et histogrammes en mémoire du processus de l'API, sans
+dépendance externe. Les étapes de synthèse mesurées dans les workers (G2P,
+inférence, sous-processus kokoro) reviennent avec chaque réponse du worker et
+sont enregistrées par l'ordonnanceur; l'écriture des fichiers et l'encodage
+sont mesurés par le cache audio. Les étiquettes `voice` et `format` d'une
+requête HTTP sont posées par le handler (`label_request`) et reprises par
+toutes les mesures faites pendant cette requête.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes (secondes) des histogrammes de durée: de quelques ms (G2P en cache) à la minute (texte long)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Facteur temps réel: secondes d'audio produites par seconde de calcul
+RATIO_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+# Caractères synthétisés par seconde de calcul
+RATE_BUCKETS = (10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0)
+
+REGISTRY: List["_Metric"] = []
+
+# Étiquettes de la requête HTTP en cours (dictionnaire modifiable, partagé avec les tâches filles)
+_request_labels: "contextvars.ContextVar[Optional[Dict[str, str]]]" = contextvars.ContextVar(
+    "tts_request_labels", default=None
+)
+
+
+def label_request(**labels: str) -> None:
+    """Poser les étiquettes (voice, format) de la requête ou de la tâche en cours"""
+    current = _request_labels.get()
+    if current is None:
+        current = {"voice": "", "format": ""}
+        _request_labels.set(current)
+    current.update({name: str(value) for name, value in labels.items()})
+
+
+def request_labels() -> Dict[str, str]:
+    """Étiquettes voice/format de la requête en cours (vides hors requête)"""
+    current = _request_labels.get()
+    return {"voice": current.get("voice", ""), "format": current.get("format", "")} if current else {"voice": "", "format": ""}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Jauge; la valeur peut aussi être lue au moment du rendu par `set_function`
+    (fonction retournant un nombre, ou {tuple d'étiquettes: valeur})
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        self._function = function
+
+    def samples(self) -> Iterable[str]:
+        if self._function is not None:
+            result = self._function()
+            values = list(result.items()) if isinstance(result, dict) else ([((), result)] if result is not None else [])
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        for key, value in values:
+            if value is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DURATION_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # étiquettes -> [comptes par borne (non cumulés, +Inf en dernier), somme, nombre]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        """Mesurer la durée d'un bloc `with`"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def _endpoint(scope) -> str:
+    """Chemin de la route (ex: /tts/jobs/{job_id}) pour borner le nombre de séries"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "other")
+    if "app_root_path" in scope:
+        # Application montée (fichiers de /outputs): préfixe du montage
+        return scope["root_path"]
+    return "other"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: compte les requêtes (route, méthode, statut, voix, format)
+    et mesure leur durée jusqu'au dernier octet du corps (streaming compris)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"voice": "", "format": ""}
+        token = _request_labels.set(labels)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_labels.reset(token)
+            endpoint = _endpoint(scope)
+            HTTP_REQUESTS.inc(method=scope["method"], endpoint=endpoint, status=str(status_code), **labels)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], endpoint=endpoint, **labels)
+
+
+def render() -> str:
+    """Toutes les métriques au format d'exposition texte"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# Requêtes HTTP (toutes routes; `endpoint` est le chemin de la route, pas l'URL)
+HTTP_REQUESTS = Counter(
+    "tts_http_requests_total", "Requêtes HTTP traitées", ("method", "endpoint", "status", "voice", "format")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "tts_http_request_seconds", "Durée des requêtes HTTP, corps de réponse compris", ("method", "endpoint", "voice", "format")
+)
+
+# Étapes de la synthèse: queue_wait, process_spawn, model_load, warmup, g2p, inference,
+# subprocess (mode subprocess), file_write, encode
+STAGE_SECONDS = Histogram("tts_stage_seconds", "Durée de chaque étape de la synthèse", ("stage", "voice", "format"))
+
+CHARACTERS = Counter("tts_characters_total", "Caractères synthétisés (hors cache)", ("voice", "format"))
+AUDIO_SECONDS = Counter("tts_audio_seconds_total", "Secondes d'audio synthétisées", ("voice", "format"))
+SYNTHESIS_SECONDS = Counter("tts_synthesis_seconds_total", "Temps de calcul des synthèses dans les workers", ("voice", "format"))
+CHARACTERS_PER_SECOND = Histogram(
+    "tts_characters_per_second", "Caractères synthétisés par seconde de calcul, par job", ("voice", "format"), RATE_BUCKETS
+)
+REAL_TIME_FACTOR = Histogram(
+    "tts_real_time_factor", "Secondes d'audio produites par seconde de calcul, par job", ("voice", "format"), RATIO_BUCKETS
+)
+OUTPUT_BYTES = Counter("tts_output_bytes_total", "Octets de fichiers audio écrits dans outputs/", ("voice", "format"))
+
+# Jauges lues au moment du rendu (fonctions posées par api.py)
+QUEUE_DEPTH = Gauge("tts_queue_depth", "Jobs en attente dans la file de synthèse")
+WORKERS = Gauge("tts_workers", "Workers de synthèse par état", ("state",))
+WARMUP_SECONDS = Gauge("tts_warmup_seconds", "Durée du préchauffage des workers au démarrage")
+DB_POOL_CONNECTIONS = Gauge("tts_db_pool_connections", "Connexions du pool de la base par état", ("state",))
@@ -0,0 +1,44 @@
+"""
+Migration unique: historiques JSON (colonne users.history) -> table synthesis_history
+
+Usage:
+    python migrate_history.py
+    python migrate_history.py --batch-size 500
+
+Le script crée la table si besoin, puis copie les entrées utilisateur par
+utilisateur (une transaction chacun) et vide la colonne JSON correspondante:
+il peut être relancé après une interruption sans créer de doublons.
+"""
+import argparse
+import sys
+
+from database import SessionLocal, init_db
+from history import migrate_json_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrer users.history vers la table synthesis_history")
+    parser.add_argument("--batch-size", type=int, default=100, help="Utilisateurs lus par requête")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Migration de l'historique JSON vers synthesis_history")
+    print("=" * 60)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        users, entries = migrate_json_history(db, batch_size=args.batch_size)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Migration interrompue: {e}")
+        print("   Les utilisateurs déjà traités sont conservés; relancez le script pour reprendre.")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"✅ {entries} entrée(s) migrée(s) pour {users} utilisateur(s)")
+
+
+if __name__ == "__main__":
+    main()
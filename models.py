@@ -1,7 +1,8 @@
 """
 Modèles de base de données SQLAlchemy
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, Float, ForeignKey, Index
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from database import Base
 import json
@@ -31,10 +32,12 @@ class User(Base):
     # Voix favorites: ["ff_siwis", "voice2", ...]
     favorite_voices = Column(JSON, default=list)
     
-    # Historique: liste d'objets avec {text, voice, created_at, audio_file}
-    history = Column(JSON, default=list)
+    # Ancien historique (liste JSON {text, voice, created_at, audio_file}), remplacé par la
+    # table synthesis_history (voir migrate_history.py); chargé seulement si on y accède
+    history = deferred(Column(JSON, default=list))
     
-    # Crédits: nombre de générations restantes (None = illimité)
+    # Crédits restants (None = illimité), débités par caractère synthétisé (voir credits.py);
+    # les crédits loués par un processus de l'API n'y figurent plus jusqu'à leur restitution
     credits = Column(Integer, nullable=True, default=None)
     
     # Préférences utilisateur
@@ -61,4 +64,132 @@ class User(Base):
         }
 
 
+class SynthesisJob(Base):
+    """
+    Job de synthèse asynchrone (textes longs): l'état est conservé en base
+    pour reprendre les jobs interrompus après un redémarrage
+    """
+    __tablename__ = "synthesis_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+
+    # queued -> running -> completed | failed; completed -> expired (fichier supprimé par la rétention)
+    status = Column(String(16), nullable=False, default="queued", index=True)
+
+    # Paramètres de synthèse
+    text = Column(Text, nullable=False)
+    voice = Column(String(64), nullable=False)
+    speed = Column(Float, nullable=False, default=1.0)
+
+    # Progression
+    segments_total = Column(Integer, nullable=False, default=0)
+    segments_done = Column(Integer, nullable=False, default=0)
+
+    # Crédits débités à la création (remboursés si le job échoue)
+    credits_charged = Column(Integer, nullable=False, default=0)
+
+    # Résultat
+    audio_file = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Métadonnées
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<SynthesisJob(id={self.id}, status={self.status})>"
+
+    def to_dict(self):
+        """
+        Convertir le job en dictionnaire (sans le texte complet)
+        """
+        return {
+            "id": self.id,
+            "status": self.status,
+            "voice": self.voice,
+            "speed": self.speed,
+            "text_length": len(self.text) if self.text else 0,
+            "segments_total": self.segments_total,
+            "segments_done": self.segments_done,
+            "progress": round(self.segments_done / self.segments_total, 4) if self.segments_total else 0.0,
+            "audio_file": self.audio_file,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
 
+
+
+class SynthesisHistory(Base):
+    """
+    Entrée de l'historique de synthèse d'un utilisateur (une ligne par génération)
+    """
+    __tablename__ = "synthesis_history"
+    __table_args__ = (
+        # Pagination par curseur: (user_id, created_at) décroissant
+        Index("ix_synthesis_history_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Paramètres de synthèse (le texte n'est conservé qu'en aperçu)
+    text_hash = Column(String(64), nullable=False)
+    text_preview = Column(String(200), nullable=True)
+    text_length = Column(Integer, nullable=False, default=0)
+    voice = Column(String(64), nullable=False)
+    speed = Column(Float, nullable=False, default=1.0)
+    format = Column(String(8), nullable=False, default="wav")
+
+    # Résultat
+    audio_file = Column(String(255), nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+    synthesis_ms = Column(Float, nullable=True)
+    cached = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<SynthesisHistory(id={self.id}, user_id={self.user_id})>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "text_hash": self.text_hash,
+            "text_preview": self.text_preview,
+            "text_length": self.text_length,
+            "voice": self.voice,
+            "speed": self.speed,
+            "format": self.format,
+            "audio_file": self.audio_file,
+            "duration_seconds": self.duration_seconds,
+            "synthesis_ms": self.synthesis_ms,
+            "cached": self.cached,
+        }
+
+
+class CreditLedger(Base):
+    """
+    Journal des mouvements de crédits: locations et restitutions de blocs
+    (écrites avec la mise à jour de users.credits), débits et remboursements
+    (cumulés en mémoire puis écrits périodiquement)
+    """
+    __tablename__ = "credit_ledger"
+    __table_args__ = (
+        Index("ix_credit_ledger_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # lease | return | charge | refund
+    kind = Column(String(16), nullable=False)
+    amount = Column(Integer, nullable=False)
+    # Nombre d'opérations cumulées dans cette ligne (débits/remboursements)
+    operations = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<CreditLedger(user_id={self.user_id}, kind={self.kind}, amount={self.amount})>"
@@ -0,0 +1,284 @@
+"""
+Rétention du répertoire outputs/
+
+Une tâche de fond supprime périodiquement les fichiers trop anciens, puis les
+plus anciens tant que le répertoire dépasse son budget. Les fichiers encore
+référencés dans l'historique d'un utilisateur sont conservés; un job dont le
+fichier est supprimé passe à l'état `expired` (plus d'`audio_file`). Les entrées du
+cache audio (WAV source et variantes encodées) passent par le cache pour que
+son index reste cohérent.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from audio_cache import AudioCache, key_for_file
+from database import SessionLocal
+from jobs import STATUS_COMPLETED, STATUS_EXPIRED
+from models import SynthesisHistory, SynthesisJob, User
+
+# Âge maximal d'un fichier (heures, 0 = pas de limite)
+TTS_OUTPUT_MAX_AGE_HOURS = float(os.environ.get("TTS_OUTPUT_MAX_AGE_HOURS", "168"))
+# Taille maximale du répertoire outputs/ (Mo, 0 = pas de limite)
+TTS_OUTPUT_MAX_MB = int(os.environ.get("TTS_OUTPUT_MAX_MB", "2048"))
+# Intervalle entre deux passages (secondes)
+TTS_RETENTION_INTERVAL_S = int(os.environ.get("TTS_RETENTION_INTERVAL_S", "600"))
+
+# Fichiers temporaires abandonnés (écriture interrompue) supprimés au-delà de cet âge
+_TMP_MAX_AGE_S = 3600
+
+
+@dataclass
+class _Unit:
+    """Fichiers supprimés ensemble: une entrée du cache (source + variantes) ou un fichier isolé"""
+    files: List[str] = field(default_factory=list)  # chemins relatifs à outputs/
+    size: int = 0
+    mtime: float = 0.0
+    key: Optional[str] = None  # clé du cache audio, le cas échéant
+
+
+def _referenced_files() -> Set[str]:
+    """
+    Fichiers (chemins relatifs à outputs/) référencés dans l'historique des utilisateurs
+    (table synthesis_history, et ancien historique JSON tant qu'il n'est pas migré)
+    """
+    db = SessionLocal()
+    try:
+        referenced = set()
+        rows = db.query(SynthesisHistory.audio_file).filter(SynthesisHistory.audio_file.isnot(None)).distinct()
+        for (audio_file,) in rows:
+            if audio_file.startswith("/outputs/"):
+                referenced.add(audio_file[len("/outputs/"):])
+        for (history,) in db.query(User.history).filter(User.history.isnot(None)):
+            for item in history or []:
+                audio_file = item.get("audio_file") if isinstance(item, dict) else None
+                if audio_file and audio_file.startswith("/outputs/"):
+                    referenced.add(audio_file[len("/outputs/"):])
+        return referenced
+    finally:
+        db.close()
+
+
+def _expire_jobs(deleted_files: List[str]) -> int:
+    """
+    Passer à l'état expiré les jobs terminés dont le fichier vient d'être supprimé
+    """
+    audio_files = [f"/outputs/{relative}" for relative in deleted_files if relative.startswith("job_")]
+    if not audio_files:
+        return 0
+    db = SessionLocal()
+    try:
+        expired = (
+            db.query(SynthesisJob)
+            .filter(SynthesisJob.status == STATUS_COMPLETED, SynthesisJob.audio_file.in_(audio_files))
+            .update({"status": STATUS_EXPIRED, "audio_file": None}, synchronize_session=False)
+        )
+        db.commit()
+        return expired
+    finally:
+        db.close()
+
+
+class RetentionManager:
+    """
+    Application périodique de l'âge maximal et du budget disque de outputs/
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        audio_cache: AudioCache,
+        max_age_hours: float = TTS_OUTPUT_MAX_AGE_HOURS,
+        max_bytes: int = TTS_OUTPUT_MAX_MB * 1024 * 1024,
+        interval: int = TTS_RETENTION_INTERVAL_S,
+    ):
+        self.directory = directory
+        self.audio_cache = audio_cache
+        self.max_age_hours = max_age_hours
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Compteurs cumulés et état du dernier passage
+        self.runs = 0
+        self.deleted_age = 0
+        self.deleted_size = 0
+        self.deleted_tmp = 0
+        self.expired_jobs = 0
+        self.bytes_freed = 0
+        self.last_run: Dict[str, object] = {}
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"Output retention pass failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def _scan(self) -> List[_Unit]:
+        """
+        Inventaire de outputs/ regroupé par unité de suppression (les .tmp anciens sont supprimés ici)
+        """
+        now = time.time()
+        units: Dict[str, _Unit] = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - stat.st_mtime > _TMP_MAX_AGE_S:
+                        try:
+                            os.remove(path)
+                            self.deleted_tmp += 1
+                        except FileNotFoundError:
+                            pass
+                    continue
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                key = key_for_file(name)
+                unit = units.setdefault(key or relative, _Unit(key=key))
+                unit.files.append(relative)
+                unit.size += stat.st_size
+                # Pour le cache, l'âge est celui du WAV source (rafraîchi à chaque hit)
+                if key is None or name == f"{key}.wav":
+                    unit.mtime = stat.st_mtime
+                elif not unit.mtime:
+                    unit.mtime = stat.st_mtime
+        return list(units.values())
+
+    def _delete_files(self, unit: _Unit) -> int:
+        freed = 0
+        for relative in unit.files:
+            path = os.path.join(self.directory, relative)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    async def _delete(self, unit: _Unit) -> bool:
+        """Supprimer une unité; False si elle est en cours d'écriture ou épinglée dans le cache"""
+        if unit.key is not None:
+            freed = self.audio_cache.discard(unit.key)
+            if freed is None:
+                return False
+            if freed:
+                return True
+            # Clé absente de l'index (fichiers orphelins): suppression directe
+        await run_in_threadpool(self._delete_files, unit)
+        return True
+
+    async def run_once(self) -> Dict[str, object]:
+        """
+        Un passage de rétention: âge maximal, puis budget disque (les plus anciens d'abord)
+        """
+        started = time.perf_counter()
+        try:
+            referenced = await run_in_threadpool(_referenced_files)
+        except Exception as e:
+            # Sans l'historique, on ne sait pas quels fichiers protéger: on ne supprime rien
+            logging.warning(f"Output retention skipped, history unavailable: {e}")
+            return self.last_run
+
+        units = await run_in_threadpool(self._scan)
+        units.sort(key=lambda unit: unit.mtime)
+        total_bytes = sum(unit.size for unit in units)
+        protected = 0
+        candidates = []
+        for unit in units:
+            if any(name in referenced for name in unit.files):
+                protected += 1
+            else:
+                candidates.append(unit)
+
+        deleted_age = deleted_size = freed = 0
+        deleted_files: List[str] = []
+        if self.max_age_hours > 0:
+            cutoff = time.time() - self.max_age_hours * 3600
+            kept = []
+            for unit in candidates:
+                if unit.mtime < cutoff and await self._delete(unit):
+                    deleted_age += 1
+                    deleted_files.extend(unit.files)
+                    freed += unit.size
+                    total_bytes -= unit.size
+                else:
+                    kept.append(unit)
+            candidates = kept
+
+        if self.max_bytes > 0:
+            for unit in candidates:
+                if total_bytes <= self.max_bytes:
+                    break
+                if await self._delete(unit):
+                    deleted_size += 1
+                    deleted_files.extend(unit.files)
+                    freed += unit.size
+                    total_bytes -= unit.size
+
+        expired_jobs = 0
+        try:
+            expired_jobs = await run_in_threadpool(_expire_jobs, deleted_files)
+        except Exception as e:
+            logging.warning(f"Could not mark deleted job files as expired: {e}")
+
+        self.runs += 1
+        self.expired_jobs += expired_jobs
+        self.deleted_age += deleted_age
+        self.deleted_size += deleted_size
+        self.bytes_freed += freed
+        self.last_run = {
+            "at": time.time(),
+            "seconds": round(time.perf_counter() - started, 3),
+            "entries": len(units) - deleted_age - deleted_size,
+            "bytes": total_bytes,
+            "protected": protected,
+            "deleted_age": deleted_age,
+            "deleted_size": deleted_size,
+            "expired_jobs": expired_jobs,
+            "bytes_freed": freed,
+        }
+        if deleted_age or deleted_size:
+            logging.info(
+                f"Output retention: deleted {deleted_age} expired and {deleted_size} over-budget entries "
+                f"({freed / 1e6:.1f} MB freed, {total_bytes / 1e6:.1f} MB kept, {protected} protected, "
+                f"{expired_jobs} job(s) expired)"
+            )
+        return self.last_run
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_age_hours": self.max_age_hours,
+            "max_bytes": self.max_bytes,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "deleted_age": self.deleted_age,
+            "deleted_size": self.deleted_size,
+            "deleted_tmp": self.deleted_tmp,
+            "expired_jobs": self.expired_jobs,
+            "bytes_freed": self.bytes_freed,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,685 @@
+"""
+Ordonnanceur de synthèse: pool fixe de workers, file FIFO bornée et contre-pression
+
+Chaque worker "process" est un processus Python qui garde son propre modèle
+Kokoro chargé; le mode "thread" exécute le moteur dans le processus de l'API
+(utile quand la mémoire ne permet qu'un seul modèle). Quand la file est
+pleine, `submit` lève QueueFullError au lieu de lancer une synthèse de plus.
+"""
+import asyncio
+import collections
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from thread_plan import TTS_WORKER_MODE, TTS_WORKERS, ThreadPlan, apply_plan, plan_threads
+from tts_engine import SAMPLE_RATE, KokoroEngine
+from voices import DEFAULT_VOICE, TTS_HOT_VOICES
+
+# Configuration (variables d'environnement; TTS_WORKERS et TTS_WORKER_MODE: voir thread_plan.py)
+TTS_QUEUE_SIZE = int(os.environ.get("TTS_QUEUE_SIZE", "8"))
+# Plafond de RSS par worker (Mo, 0 = illimité): au-delà, le worker est recyclé
+TTS_WORKER_MAX_RSS_MB = int(os.environ.get("TTS_WORKER_MAX_RSS_MB", "0"))
+
+# Opérations du moteur autorisées dans les workers
+WORKER_OPS = {"synthesize", "synthesize_batch", "prewarm_g2p"}
+
+# Fenêtre glissante pour les statistiques d'attente et de service
+STATS_WINDOW = 1000
+
+# Délai avant de relancer un worker dont le redémarrage a échoué (secondes, doublé à chaque échec)
+_RESTART_BACKOFF_S = 1.0
+_RESTART_BACKOFF_MAX_S = 60.0
+
+
+class QueueFullError(Exception):
+    """La file d'attente est pleine (HTTP 429)"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("File d'attente de synthèse pleine")
+        self.retry_after = retry_after
+
+
+class SchedulerUnavailableError(Exception):
+    """L'ordonnanceur n'accepte pas de travail (démarrage, arrêt: HTTP 503)"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WorkerCrashedError(Exception):
+    """Le processus worker est mort pendant la synthèse (ex: SIGKILL sur dépassement mémoire)"""
+
+    def __init__(self, returncode: Optional[int]):
+        super().__init__(f"Le worker de synthèse s'est arrêté (code {returncode})")
+        self.returncode = returncode
+
+
+def current_rss_mb() -> float:
+    """RSS actuel du processus en Mo (Linux), 0 si indisponible"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _worker_state(engine: KokoroEngine) -> Dict[str, Any]:
+    """
+    État renvoyé avec chaque réponse d'un worker (mémoire, résidence des voix,
+    cache G2P, durées des étapes de la dernière opération)
+    """
+    return {
+        "rss_mb": current_rss_mb(),
+        "voices": engine.voices.stats(),
+        "g2p": engine.g2p.stats(),
+        "timings": engine.timings(),
+    }
+
+
+def _observe_start(stages: Dict[str, Optional[float]]) -> None:
+    """Durées de démarrage d'un worker (lancement du processus, chargement du modèle, préchauffage)"""
+    for stage, seconds in stages.items():
+        if seconds is not None and seconds >= 0:
+            metrics.STAGE_SECONDS.observe(seconds, stage=stage, voice="", format="")
+
+
+def _worker_main(conn, engine_mode: str, voices: List[str], plan: ThreadPlan, index: int) -> None:
+    """
+    Boucle d'un processus worker: appliquer le plan de threads (avant l'import
+    de torch), charger et préchauffer le modèle une fois puis traiter les jobs
+    """
+    apply_plan(plan, index)
+    engine = KokoroEngine(mode=engine_mode)
+    start = time.perf_counter()
+    engine.warm_up(voices)
+    info = {
+        "load_seconds": engine.load_seconds or 0.0,
+        "warmup_seconds": time.perf_counter() - start,
+        "warmup_error": engine.warmup_error,
+        # Mode effectif (repli possible en subprocess), backend et modèle chargé
+        "mode": engine.mode,
+        "backend": engine.backend,
+        "loaded": engine.loaded,
+    }
+    conn.send(("ready", info, _worker_state(engine)))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            engine.close()
+            break
+        op, kwargs = message
+        engine.reset_timings()
+        try:
+            if op not in WORKER_OPS:
+                raise ValueError(f"Opération inconnue: {op}")
+            result = getattr(engine, op)(**kwargs)
+            conn.send(("ok", result, _worker_state(engine)))
+        except Exception as e:
+            try:
+                conn.send(("error", e, _worker_state(engine)))
+            except Exception:
+                conn.send(("error", RuntimeError(str(e)), _worker_state(engine)))
+
+
+class _Job:
+    __slots__ = ("op", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, op: str, kwargs: Dict[str, Any], future: asyncio.Future):
+        self.op = op
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _ProcessWorker:
+    """
+    Worker dans un processus séparé; les appels bloquants (pipe) sont faits
+    dans le threadpool par la tâche consommatrice.
+    """
+
+    def __init__(self, index: int, engine_mode: str, voices: List[str], max_rss_mb: int, plan: ThreadPlan):
+        self.index = index
+        self.engine_mode = engine_mode
+        self.voices = voices
+        self.plan = plan
+        self.max_rss_mb = max_rss_mb
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.rss_mb = 0.0
+        self.voices_stats: Dict[str, Any] = {}
+        self.g2p_stats: Dict[str, Any] = {}
+        self.tasks = 0
+        self.restarts = 0
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        # État du moteur du worker, connu quand il est prêt
+        self.mode: Optional[str] = None
+        self.backend: Optional[str] = None
+        self.loaded = False
+        self._started_at = 0.0
+        # Un seul échange à la fois sur le pipe (tâche consommatrice et `broadcast`)
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.engine_mode, self.voices, self.plan, self.index),
+            name=f"tts-worker-{self.index}",
+            daemon=True,
+        )
+        self._started_at = time.perf_counter()
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = False
+        self.loaded = False
+
+    def wait_ready(self) -> None:
+        """Attendre que le worker ait chargé son modèle (bloquant)"""
+        try:
+            _, info, state = self.conn.recv()
+        except EOFError:
+            raise WorkerCrashedError(self._returncode())
+        self.load_seconds = info["load_seconds"]
+        self.warmup_seconds = info["warmup_seconds"]
+        self.warmup_error = info["warmup_error"]
+        self.mode = info["mode"]
+        self.backend = info["backend"]
+        self.loaded = info["loaded"]
+        self._update_state(state)
+        self.ready = True
+        _observe_start({
+            # Lancement du processus et imports, hors chargement et préchauffage dans le worker
+            "process_spawn": time.perf_counter() - self._started_at - self.warmup_seconds,
+            "model_load": self.load_seconds,
+            "warmup": self.warmup_seconds - self.load_seconds,
+        })
+        logging.info(f"TTS worker {self.index} ready (pid {self.process.pid}, mode {info['mode']}, "
+                     f"load {self.load_seconds:.2f}s, warm-up {self.warmup_seconds:.2f}s, rss {self.rss_mb:.0f} MB)")
+
+    def _update_state(self, state: Dict[str, Any]) -> None:
+        self.rss_mb = state["rss_mb"]
+        self.voices_stats = state["voices"]
+        self.g2p_stats = state["g2p"]
+
+    def call(self, op: str, kwargs: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Any:
+        """
+        Exécuter une opération dans le worker (bloquant); `timings` reçoit
+        les durées des étapes mesurées dans le worker. Un worker mort ou au-delà
+        du plafond de RSS n'est plus prêt: la tâche consommatrice le relance
+        """
+        with self._lock:
+            try:
+                self.conn.send((op, kwargs))
+                status_, result, state = self.conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                returncode = self._returncode()
+                logging.error(f"TTS worker {self.index} died (return code {returncode}), restarting")
+                self.ready = False
+                self.loaded = False
+                raise WorkerCrashedError(returncode)
+
+            self.tasks += 1
+            self._update_state(state)
+            if timings is not None:
+                timings.update(state["timings"])
+            if self.max_rss_mb and self.rss_mb > self.max_rss_mb:
+                logging.warning(f"TTS worker {self.index} RSS {self.rss_mb:.0f} MB > cap {self.max_rss_mb} MB, recycling")
+                self.ready = False
+        if status_ == "error":
+            raise result
+        return result
+
+    def restart(self) -> None:
+        """
+        Relancer le processus (bloquant); le chargement du modèle est attendu
+        hors du verrou du pipe, pour ne pas bloquer `broadcast` ni les sondes
+        """
+        with self._lock:
+            self.stop()
+            self.restarts += 1
+            self.start()
+        self.wait_ready()
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.ready = False
+        self.loaded = False
+
+    def _returncode(self) -> Optional[int]:
+        self.process.join(timeout=5)
+        return self.process.exitcode
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "kind": "process",
+            "pid": self.process.pid if self.process else None,
+            "cores": list(self.plan.cores_for(self.index) or ()) or None,
+            "alive": self.alive(),
+            "ready": self.ready,
+            "rss_mb": round(self.rss_mb, 1),
+            "max_rss_mb": self.max_rss_mb or None,
+            "tasks": self.tasks,
+            "restarts": self.restarts,
+            "mode": self.mode,
+            "backend": self.backend,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_error": self.warmup_error,
+            "voices": self.voices_stats,
+            "g2p": self.g2p_stats,
+        }
+
+
+class _ThreadWorker:
+    """
+    Worker exécuté dans le processus de l'API (moteur partagé, préchauffé par le premier worker)
+    """
+
+    def __init__(self, index: int, engine: KokoroEngine, voices: List[str]):
+        self.index = index
+        self.engine = engine
+        self.voices = voices
+        self.ready = False
+        self.tasks = 0
+
+    @property
+    def mode(self) -> str:
+        return self.engine.mode
+
+    @property
+    def backend(self) -> str:
+        return self.engine.backend
+
+    @property
+    def loaded(self) -> bool:
+        return self.ready and self.engine.loaded
+
+    def start(self) -> None:
+        pass
+
+    def restart(self) -> None:
+        self.wait_ready()
+
+    def wait_ready(self) -> None:
+        self.engine.warm_up(self.voices)
+        self.ready = True
+        if self.index == 0:
+            load_seconds = self.engine.load_seconds or 0.0
+            _observe_start({"model_load": load_seconds, "warmup": self.engine.warmup_seconds - load_seconds})
+
+    def call(self, op: str, kwargs: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Any:
+        if op not in WORKER_OPS:
+            raise ValueError(f"Opération inconnue: {op}")
+        self.engine.reset_timings()
+        result = getattr(self.engine, op)(**kwargs)
+        self.tasks += 1
+        if timings is not None:
+            timings.update(self.engine.timings())
+        return result
+
+    def stop(self) -> None:
+        pass
+
+    def alive(self) -> bool:
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "kind": "thread",
+            "pid": os.getpid(),
+            "cores": None,
+            "alive": True,
+            "ready": self.ready,
+            "rss_mb": round(current_rss_mb(), 1),
+            "max_rss_mb": None,
+            "tasks": self.tasks,
+            "restarts": 0,
+            "mode": self.mode,
+            "backend": self.backend,
+            "loaded": self.loaded,
+            "load_seconds": self.engine.load_seconds,
+            "warmup_seconds": self.engine.warmup_seconds,
+            "warmup_error": self.engine.warmup_error,
+            "voices": self.engine.voices.stats(),
+            "g2p": self.engine.g2p.stats(),
+        }
+
+
+class SynthesisScheduler:
+    """
+    Pool fixe de workers alimenté par une file FIFO bornée
+    """
+
+    def __init__(
+        self,
+        engine: KokoroEngine,
+        workers: Any = TTS_WORKERS,
+        worker_mode: str = TTS_WORKER_MODE,
+        queue_size: int = TTS_QUEUE_SIZE,
+        max_rss_mb: int = TTS_WORKER_MAX_RSS_MB,
+        voices: Optional[List[str]] = None,
+        plan: Optional[ThreadPlan] = None,
+    ):
+        self.engine = engine
+        # Nombre de workers et threads par worker (voir thread_plan.py)
+        self.plan = plan or plan_threads(workers, worker_mode)
+        self.worker_count = self.plan.workers
+        self.worker_mode = worker_mode
+        self.queue_size = max(1, queue_size)
+        self.max_rss_mb = max_rss_mb
+        # Voix chaudes préchargées par chaque worker
+        self.voices = voices or list(TTS_HOT_VOICES)
+        self.workers: List[Any] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        # Jobs retirés de la file et en cours d'exécution dans un worker
+        self._inflight: Set[_Job] = set()
+        self._running = False
+        # Préchauffage: workers qui n'ont pas encore fini leur premier démarrage
+        self._warming = 0
+        self._started_at = 0.0
+        self.warmup_seconds: Optional[float] = None
+
+        # Métriques
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # Horodatage (epoch) de la dernière opération réussie / échouée
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self._waits: Deque[float] = collections.deque(maxlen=STATS_WINDOW)
+        self._services: Deque[float] = collections.deque(maxlen=STATS_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def ready(self) -> bool:
+        """Préchauffage terminé et au moins un worker prêt (sonde /ready)"""
+        return (
+            self._running
+            and self.warmup_seconds is not None
+            and any(worker.ready and worker.alive() for worker in self.workers)
+        )
+
+    async def start(self) -> None:
+        """Démarrer les workers (chargement et préchauffage des modèles en arrière-plan)"""
+        if self._running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._started_at = time.monotonic()
+        self.warmup_seconds = None
+
+        if self.worker_mode == "thread":
+            self.workers = [_ThreadWorker(i, self.engine, self.voices) for i in range(self.worker_count)]
+        else:
+            self.workers = [
+                _ProcessWorker(i, self.engine.mode, self.voices, self.max_rss_mb, self.plan)
+                for i in range(self.worker_count)
+            ]
+            for worker in self.workers:
+                worker.start()
+
+        self._warming = len(self.workers)
+        self._consumers = [asyncio.create_task(self._consume(worker)) for worker in self.workers]
+        self._running = True
+        logging.info(f"Synthesis scheduler started: {self.worker_count} {self.worker_mode} worker(s), "
+                     f"queue size {self.queue_size}, max RSS {self.max_rss_mb or 'unlimited'} MB")
+
+    async def stop(self) -> None:
+        """
+        Arrêter les workers; les jobs en cours et en file échouent avec 503
+        (une tâche consommatrice annulée ne résoudrait plus leur future)
+        """
+        if not self._running:
+            return
+        self._running = False
+        pending = list(self._inflight)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for job in pending:
+            if not job.future.done():
+                job.future.set_exception(SchedulerUnavailableError("Service en cours d'arrêt"))
+        self._inflight.clear()
+        for task in self._consumers:
+            task.cancel()
+        for worker in self.workers:
+            await run_in_threadpool(worker.stop)
+        if self.worker_mode == "thread":
+            await run_in_threadpool(self.engine.close)
+        logging.info("Synthesis scheduler stopped")
+
+    def retry_after(self) -> int:
+        """Estimation (secondes) du temps avant qu'une place se libère dans la file"""
+        service = sum(self._services) / len(self._services) if self._services else 5.0
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1, math.ceil((depth + 1) * service / self.worker_count))
+
+    def enqueue(self, op: str, **kwargs) -> asyncio.Future:
+        """
+        Mettre un job en file sans attendre son résultat. Les refus (file
+        pleine, service arrêté) sont levés immédiatement.
+        """
+        if not self._running:
+            raise SchedulerUnavailableError("Le service de synthèse n'est pas prêt")
+        if not any(worker.alive() for worker in self.workers):
+            raise SchedulerUnavailableError("Aucun worker de synthèse disponible")
+
+        job = _Job(op, kwargs, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        self.submitted += 1
+        return job.future
+
+    async def enqueue_wait(self, op: str, **kwargs) -> asyncio.Future:
+        """
+        Comme `enqueue`, mais attendre qu'une place se libère si la file est
+        pleine (pour la suite d'un travail déjà admis: streaming, lot)
+        """
+        while True:
+            try:
+                return self.enqueue(op, **kwargs)
+            except QueueFullError as e:
+                await asyncio.sleep(min(e.retry_after, 1))
+
+    async def submit(self, op: str, **kwargs) -> Any:
+        """Mettre un job en file et attendre son résultat"""
+        return await self.enqueue(op, **kwargs)
+
+    async def synthesize(self, text: str, voice: str = DEFAULT_VOICE, speed: float = 1.0, lang: Optional[str] = None):
+        """Synthétiser un texte via le pool (signal float32)"""
+        if lang:
+            return await self.submit("synthesize", text=text, voice=voice, speed=speed, lang=lang)
+        return await self.submit("synthesize", text=text, voice=voice, speed=speed)
+
+    async def broadcast(self, op: str, **kwargs) -> List[Any]:
+        """
+        Exécuter une opération sur chaque moteur prêt, hors file (après la
+        synthèse en cours du worker); un seul moteur en mode thread
+        """
+        if not self._running:
+            raise SchedulerUnavailableError("Le service de synthèse n'est pas prêt")
+        if op not in WORKER_OPS:
+            raise ValueError(f"Opération inconnue: {op}")
+        workers = [worker for worker in self.workers if worker.ready and worker.alive()]
+        if self.worker_mode == "thread":
+            workers = workers[:1]
+        if not workers:
+            raise SchedulerUnavailableError("Aucun worker de synthèse disponible")
+        return list(await asyncio.gather(*(run_in_threadpool(worker.call, op, kwargs) for worker in workers)))
+
+    async def _consume(self, worker) -> None:
+        try:
+            await run_in_threadpool(worker.wait_ready)
+        except Exception as e:
+            logging.error(f"TTS worker {worker.index} failed to start: {e}")
+        finally:
+            self._warming -= 1
+            if self._warming == 0:
+                self.warmup_seconds = time.monotonic() - self._started_at
+                ready = sum(1 for w in self.workers if w.ready)
+                logging.info(f"Synthesis warm-up finished in {self.warmup_seconds:.2f}s "
+                             f"({ready}/{len(self.workers)} worker(s) ready)")
+
+        while True:
+            # Worker non prêt (échec du démarrage, crash, recyclage): aucun job avant sa relance
+            if not worker.ready:
+                await self._restart(worker)
+            job = await self._queue.get()
+            if job.future.done():  # client parti entre-temps
+                continue
+            started = time.monotonic()
+            self._waits.append(started - job.enqueued_at)
+            metrics.STAGE_SECONDS.observe(
+                started - job.enqueued_at, stage="queue_wait", voice=job.kwargs.get("voice", ""), format="wav"
+            )
+            timings: Dict[str, float] = {}
+            self._inflight.add(job)
+            try:
+                result = await run_in_threadpool(worker.call, job.op, job.kwargs, timings)
+            except Exception as e:
+                self.failed += 1
+                self.last_failure_at = time.time()
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                self.last_success_at = time.time()
+                if not job.future.done():
+                    job.future.set_result(result)
+                self._observe(job, result, timings)
+            finally:
+                self._inflight.discard(job)
+                self._services.append(time.monotonic() - started)
+
+    async def _restart(self, worker) -> None:
+        """
+        Relancer un worker jusqu'à ce qu'il soit prêt, avec un délai croissant
+        entre deux échecs (un worker qui ne démarre pas n'échoue pas tous les jobs)
+        """
+        delay = _RESTART_BACKOFF_S
+        while not worker.ready:
+            try:
+                await run_in_threadpool(worker.restart)
+            except Exception as e:
+                logging.error(f"TTS worker {worker.index} failed to restart: {e}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _RESTART_BACKOFF_MAX_S)
+
+    def _observe(self, job: _Job, result: Any, timings: Dict[str, float]) -> None:
+        """Métriques d'un job réussi: durées des étapes, caractères, secondes d'audio, facteur temps réel"""
+        labels = {"voice": job.kwargs.get("voice", ""), "format": "wav"}
+        for stage, seconds in timings.items():
+            metrics.STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+        if job.op == "synthesize":
+            texts, audios = [job.kwargs["text"]], [result]
+        elif job.op == "synthesize_batch":
+            texts, audios = [text for text, _ in job.kwargs["items"]], [audio for audio, _ in result]
+        else:
+            return
+        characters = sum(len(text) for text in texts)
+        audio_seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+        compute_seconds = sum(timings.values())
+        metrics.CHARACTERS.inc(characters, **labels)
+        metrics.AUDIO_SECONDS.inc(audio_seconds, **labels)
+        metrics.SYNTHESIS_SECONDS.inc(compute_seconds, **labels)
+        if compute_seconds > 0:
+            metrics.CHARACTERS_PER_SECOND.observe(characters / compute_seconds, **labels)
+            metrics.REAL_TIME_FACTOR.observe(audio_seconds / compute_seconds, **labels)
+
+    def health(self) -> Dict[str, Any]:
+        """
+        État du service lu en mémoire, sans appel aux workers (sonde /health)
+        """
+        now = time.time()
+        return {
+            "running": self._running,
+            "ready": self.ready,
+            "engine_loaded": any(worker.loaded and worker.alive() for worker in self.workers),
+            "workers": len(self.workers),
+            "workers_alive": sum(1 for worker in self.workers if worker.alive()),
+            "workers_ready": sum(1 for worker in self.workers if worker.ready),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.queue_size,
+            "last_success_at": self.last_success_at,
+            "seconds_since_success": round(now - self.last_success_at, 1) if self.last_success_at else None,
+            "last_failure_at": self.last_failure_at,
+            # Moteur de chaque worker (ceux qui synthétisent, pas le moteur du processus de l'API)
+            "engines": [
+                {
+                    "index": worker.index,
+                    "alive": worker.alive(),
+                    "ready": worker.ready,
+                    "mode": worker.mode,
+                    "backend": worker.backend,
+                    "loaded": worker.loaded,
+                }
+                for worker in self.workers
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Profondeur de file, attente en file, temps de service et état des workers"""
+        waits = sorted(self._waits)
+        services = list(self._services)
+        return {
+            "running": self._running,
+            "ready": self.ready,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "worker_mode": self.worker_mode,
+            "thread_plan": self.plan.as_dict(),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.queue_size,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_seconds": {
+                "mean": round(sum(waits) / len(waits), 4) if waits else None,
+                "p50": round(waits[len(waits) // 2], 4) if waits else None,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else None,
+                "max": round(waits[-1], 4) if waits else None,
+            },
+            "service_seconds_mean": round(sum(services) / len(services), 4) if services else None,
+            "workers": [worker.stats() for worker in self.workers],
+        }
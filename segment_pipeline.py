@@ -0,0 +1,213 @@
+"""
+Synthèse par segments: découpage en phrases, synthèse parallèle, raccord sans coupure
+
+Le texte est découpé en phrases (text_pipeline), chaque phrase est mise en
+file séparément pour que plusieurs workers la synthétisent en parallèle, puis
+les signaux sont raccordés avec un silence et un fondu configurables. Les
+signaux des segments sont gardés dans un cache mémoire LRU: modifier une
+phrase d'un long texte ne resynthétise que cette phrase.
+"""
+import asyncio
+import collections
+import itertools
+import os
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from audio_cache import cache_key
+from scheduler import SynthesisScheduler
+from text_pipeline import split_sentences
+from tts_engine import SAMPLE_RATE
+
+# Silence inséré entre deux phrases (ms)
+TTS_SEGMENT_SILENCE_MS = int(os.environ.get("TTS_SEGMENT_SILENCE_MS", "120"))
+# Fondu aux raccords (ms); sans silence, les segments se chevauchent de cette durée
+TTS_SEGMENT_CROSSFADE_MS = int(os.environ.get("TTS_SEGMENT_CROSSFADE_MS", "10"))
+# Budget mémoire du cache de segments (Mo)
+TTS_SEGMENT_CACHE_MB = int(os.environ.get("TTS_SEGMENT_CACHE_MB", "64"))
+
+# Seuil sous lequel un échantillon est considéré comme du silence (bords des segments)
+_SILENCE_THRESHOLD = 1e-3
+# Silence naturel conservé aux bords d'un segment avant le raccord (ms)
+_EDGE_KEEP_MS = 20
+
+
+def _ms_to_samples(ms: int, sample_rate: int = SAMPLE_RATE) -> int:
+    return int(sample_rate * ms / 1000)
+
+
+def trim_silence(audio: np.ndarray, keep_ms: int = _EDGE_KEEP_MS) -> np.ndarray:
+    """
+    Retirer le silence de début et de fin d'un segment (en gardant `keep_ms`),
+    pour que l'écart entre deux phrases ne dépende que du silence configuré
+    """
+    voiced = np.flatnonzero(np.abs(audio) > _SILENCE_THRESHOLD)
+    if voiced.size == 0:
+        return audio
+    keep = _ms_to_samples(keep_ms)
+    return audio[max(0, voiced[0] - keep):voiced[-1] + 1 + keep]
+
+
+def edge_fade(audio: np.ndarray, crossfade_ms: int = TTS_SEGMENT_CROSSFADE_MS) -> np.ndarray:
+    """
+    Appliquer un fondu (demi-cosinus) en entrée et en sortie pour éviter les clics aux raccords
+    """
+    n = min(_ms_to_samples(crossfade_ms), audio.size // 2)
+    if n <= 0:
+        return audio
+    ramp = (0.5 - 0.5 * np.cos(np.linspace(0, np.pi, n))).astype(np.float32)
+    audio = audio.astype(np.float32, copy=True)
+    audio[:n] *= ramp
+    audio[-n:] *= ramp[::-1]
+    return audio
+
+
+def iter_stitch(
+    chunks: Iterable[np.ndarray],
+    silence_ms: int = TTS_SEGMENT_SILENCE_MS,
+    crossfade_ms: int = TTS_SEGMENT_CROSSFADE_MS,
+) -> Iterator[np.ndarray]:
+    """
+    Raccord incrémental de `stitch`: le signal raccordé est produit morceau par
+    morceau, sans garder plus d'un segment en mémoire (jobs de textes longs)
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None:
+        yield first
+        return
+
+    gap = np.zeros(_ms_to_samples(silence_ms), dtype=np.float32)
+    overlap = _ms_to_samples(crossfade_ms)
+    # Fin du signal déjà raccordé, retenue pour le fondu enchaîné avec le segment suivant
+    held: Optional[np.ndarray] = None
+    for index, chunk in enumerate(itertools.chain((first, second), chunks)):
+        chunk = edge_fade(trim_silence(chunk), crossfade_ms)
+        if silence_ms > 0:
+            if index:
+                yield gap
+            yield chunk
+            continue
+
+        # Fondu enchaîné: les fondus de sortie/entrée se superposent
+        if held is None:
+            held = chunk
+        else:
+            n = min(held.size, chunk.size)
+            held = np.concatenate([held[:held.size - n], held[held.size - n:] + chunk[:n], chunk[n:]])
+        if held.size > overlap:
+            yield held[:held.size - overlap]
+            held = held[held.size - overlap:]
+    if held is not None:
+        yield held
+
+
+def stitch(
+    chunks: List[np.ndarray],
+    silence_ms: int = TTS_SEGMENT_SILENCE_MS,
+    crossfade_ms: int = TTS_SEGMENT_CROSSFADE_MS,
+) -> np.ndarray:
+    """
+    Raccorder les signaux des segments: silence de `silence_ms` entre deux
+    segments, ou chevauchement en fondu enchaîné de `crossfade_ms` si le silence est nul
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(list(iter_stitch(chunks, silence_ms, crossfade_ms)))
+
+
+class SegmentPipeline:
+    """
+    Étage de segmentation devant l'ordonnanceur, avec cache mémoire des segments
+    """
+
+    def __init__(self, scheduler: SynthesisScheduler, max_cache_bytes: int = TTS_SEGMENT_CACHE_MB * 1024 * 1024):
+        self.scheduler = scheduler
+        self.max_cache_bytes = max_cache_bytes
+        self._cache: "collections.OrderedDict[str, np.ndarray]" = collections.OrderedDict()
+        self._cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        audio = self._cache.get(key)
+        if audio is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return audio
+
+    def _cache_put(self, key: str, audio: np.ndarray) -> None:
+        if audio.nbytes > self.max_cache_bytes:
+            return
+        if key in self._cache:
+            self._cache_bytes -= self._cache.pop(key).nbytes
+        self._cache[key] = audio
+        self._cache_bytes += audio.nbytes
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted.nbytes
+
+    async def enqueue_segment(
+        self, segment: str, voice: str, speed: float, wait: bool = True, lang: Optional[str] = None
+    ) -> asyncio.Future:
+        """
+        Future du signal d'un segment: résolue immédiatement si le segment est en
+        cache, sinon mise en file (`wait=False`: refus immédiat si la file est pleine)
+        """
+        key = cache_key(segment, voice, speed, lang=lang)
+        audio = self._cache_get(key)
+        if audio is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(audio)
+            return future
+
+        kwargs = {"text": segment, "voice": voice, "speed": speed}
+        if lang:
+            kwargs["lang"] = lang
+        if wait:
+            future = await self.scheduler.enqueue_wait("synthesize", **kwargs)
+        else:
+            future = self.scheduler.enqueue("synthesize", **kwargs)
+
+        def _remember(done: asyncio.Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                self._cache_put(key, done.result())
+
+        future.add_done_callback(_remember)
+        return future
+
+    async def synthesize(self, text: str, voice: str, speed: float = 1.0, lang: Optional[str] = None) -> np.ndarray:
+        """
+        Synthétiser un texte segment par segment (en parallèle sur les workers) et raccorder le résultat
+        """
+        segments = split_sentences(text) or [text]
+        # Le premier segment est admis ou refusé tout de suite (429/503 pour le client)
+        futures = [await self.enqueue_segment(segments[0], voice, speed, wait=False, lang=lang)]
+        try:
+            for segment in segments[1:]:
+                futures.append(await self.enqueue_segment(segment, voice, speed, lang=lang))
+            chunks = await asyncio.gather(*futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return stitch(list(chunks))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "bytes": self._cache_bytes,
+            "max_bytes": self.max_cache_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "silence_ms": TTS_SEGMENT_SILENCE_MS,
+            "crossfade_ms": TTS_SEGMENT_CROSSFADE_MS,
+        }
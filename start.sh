@@ -14,21 +14,8 @@ echo "PORT environment variable: $PORT"
 PORT=${PORT:-10000}
 echo "Using port: $PORT"
 
-# Vérifier que uvicorn est installé
-echo "Checking uvicorn..."
-if ! python -m uvicorn --version; then
-    echo "ERROR: uvicorn not found!"
-    exit 1
-fi
-
-# Vérifier que l'API peut être importée
-echo "Checking API import..."
-if ! python -c "import api; print('API imported successfully')"; then
-    echo "ERROR: API import failed!"
-    exit 1
-fi
-
-# Démarrer le serveur
+# Démarrer le serveur (une seule importation de l'API: une erreur d'import
+# arrête uvicorn avec un code non nul, sans vérification préalable qui
+# doublerait le temps de démarrage)
 echo "Starting uvicorn on port $PORT..."
-exec python -m uvicorn api:app --host 0.0.0.0 --port $PORT
-
+exec python -m uvicorn --factory api:create_app --host 0.0.0.0 --port $PORT
@@ -0,0 +1,35 @@
+"""
+Script de test pour vérifier que le découpage en segments garde l'ordre du texte
+
+    python test_text_pipeline.py
+"""
+import random
+import sys
+
+from text_pipeline import split_sentences
+
+_WORDS = ["le", "texte", "long,", "proposition;", "suite:", "phrase.", "fin!", "anticonstitutionnellement"]
+
+
+def check_word_order(text: str, max_chars: int) -> None:
+    segments = split_sentences(text, max_chars)
+    assert " ".join(segments) == " ".join(text.split()), f"ordre modifié ({max_chars}): {text!r} -> {segments!r}"
+    assert all(len(segment) <= max_chars for segment in segments), f"segment trop long: {segments!r}"
+
+
+def test_split_keeps_word_order():
+    # Proposition trop longue après une proposition courte
+    check_word_order("Premier bout, " + " ".join(f"mot{i}" for i in range(100)) + ".", 100)
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 200)))
+        check_word_order(text, rng.randint(30, 300))
+
+
+if __name__ == "__main__":
+    try:
+        test_split_keeps_word_order()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ Découpage en segments: ordre des mots conservé")
@@ -0,0 +1,58 @@
+"""
+Découpage du texte avant la synthèse
+
+Le texte est découpé en phrases (puis en propositions si une phrase est trop
+longue) pour pouvoir synthétiser et envoyer l'audio segment par segment.
+"""
+import re
+from typing import List
+
+# Longueur maximale d'un segment (caractères); Kokoro tronque au-delà de ~510 phonèmes
+MAX_SEGMENT_CHARS = 300
+
+# Fin de phrase: ponctuation forte suivie d'un espace, ou saut de ligne
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+# Fin de proposition: virgule, point-virgule, deux-points
+_CLAUSE_SPLIT_RE = re.compile(r"(?<=[,;:])\s+")
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """
+    Découper une phrase trop longue aux virgules/points-virgules, puis aux espaces
+    """
+    parts: List[str] = []
+    current = ""
+    for clause in _CLAUSE_SPLIT_RE.split(sentence):
+        if len(clause) > max_chars:
+            # Proposition trop longue: découpée aux espaces à la suite du segment en cours (ordre du texte)
+            clause = f"{current} {clause}".strip()
+            current = ""
+        elif current and len(current) + 1 + len(clause) > max_chars:
+            parts.append(current)
+            current = ""
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            parts.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        current = f"{current} {clause}".strip()
+    if current:
+        parts.append(current)
+    return [part for part in parts if part]
+
+
+def split_sentences(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[str]:
+    """
+    Découper un texte en segments (phrases, ou propositions pour les phrases trop longues)
+    """
+    segments: List[str] = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+        else:
+            segments.extend(_split_long(sentence, max_chars))
+    return segments
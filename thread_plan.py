@@ -0,0 +1,263 @@
+"""
+Plan de threads des workers de synthèse
+
+Les CPU réellement disponibles (quota cgroup du conteneur, affinité du
+processus, nombre de cœurs) sont répartis entre le nombre de workers et les
+threads intra-op/inter-op de chaque worker. Le plan est appliqué avant
+l'initialisation de torch (variables OMP/MKL/OpenBLAS lues une seule fois par
+les runtimes), puis confirmé dans chaque worker par `torch.set_num_threads`;
+les workers peuvent en plus être épinglés sur des cœurs distincts.
+
+En mode "process", chaque worker a son modèle: plusieurs workers à peu de
+threads donnent le meilleur débit. En mode "thread", le modèle partagé ne fait
+qu'une inférence à la fois: elle reçoit tous les CPU.
+"""
+import logging
+import math
+import os
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Nombre de workers de synthèse (0 ou "auto" = déduit des CPU et de la mémoire disponibles)
+TTS_WORKERS = os.environ.get("TTS_WORKERS", "1").strip().lower()
+TTS_WORKER_MODE = os.environ.get("TTS_WORKER_MODE", "process").lower()  # "process" ou "thread"
+# Threads intra-op par worker (0 = CPU disponibles / workers)
+TTS_THREADS_PER_WORKER = int(os.environ.get("TTS_THREADS_PER_WORKER", "0"))
+# Threads inter-op par worker (le graphe Kokoro a peu de branches parallèles)
+TTS_INTEROP_THREADS = int(os.environ.get("TTS_INTEROP_THREADS", "1"))
+# Épingler chaque worker sur ses propres cœurs (sched_setaffinity)
+TTS_PIN_WORKERS = os.environ.get("TTS_PIN_WORKERS", "0").lower() in ("1", "true", "yes")
+# Mémoire comptée par worker pour le calcul automatique du nombre de workers (Mo)
+TTS_WORKER_MEMORY_MB = int(os.environ.get("TTS_WORKER_MEMORY_MB", "700"))
+
+# Variables lues par les runtimes de calcul à leur initialisation
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+# Threads par worker visés par le calcul automatique du nombre de workers
+AUTO_THREADS_PER_WORKER = 2
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Plan appliqué au processus courant (voir `apply_plan` et `configure_torch`)
+_applied: Optional[Tuple[int, int]] = None
+
+
+@dataclass(frozen=True)
+class ThreadPlan:
+    cpus: int
+    cpu_source: str  # "cgroup", "affinity" ou "cpu_count"
+    worker_mode: str
+    workers: int
+    threads_per_worker: int
+    interop_threads: int
+    pin: bool
+    # Cœurs de chaque worker (vide si les workers ne sont pas épinglés)
+    worker_cores: Tuple[Tuple[int, ...], ...] = ()
+    memory_limit_mb: Optional[int] = None
+
+    @property
+    def oversubscribed(self) -> bool:
+        if self.worker_mode == "thread":
+            return self.threads_per_worker > self.cpus
+        return self.workers * self.threads_per_worker > self.cpus
+
+    def cores_for(self, index: int) -> Optional[Tuple[int, ...]]:
+        if not self.worker_cores:
+            return None
+        return self.worker_cores[index % len(self.worker_cores)]
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["worker_cores"] = [list(cores) for cores in self.worker_cores]
+        data["oversubscribed"] = self.oversubscribed
+        return data
+
+    def describe(self) -> str:
+        pinned = ", pinned" if self.worker_cores else ""
+        return (f"{self.workers} {self.worker_mode} worker(s) x {self.threads_per_worker} intra-op / "
+                f"{self.interop_threads} inter-op thread(s) on {self.cpus} CPU(s) ({self.cpu_source}{pinned})")
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: str = CGROUP_ROOT) -> Optional[float]:
+    """Quota CPU du cgroup en nombre de CPU (cgroup v2 puis v1), None si illimité"""
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            try:
+                return int(quota) / int(period)
+            except ValueError:
+                return None
+        return None
+    quota = _read(os.path.join(root, "cpu", "cpu.cfs_quota_us")) or _read(os.path.join(root, "cpu,cpuacct", "cpu.cfs_quota_us"))
+    period = _read(os.path.join(root, "cpu", "cpu.cfs_period_us")) or _read(os.path.join(root, "cpu,cpuacct", "cpu.cfs_period_us"))
+    try:
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    except ValueError:
+        pass
+    return None
+
+
+def cgroup_memory_limit_mb(root: str = CGROUP_ROOT) -> Optional[int]:
+    """Limite mémoire du cgroup en Mo (cgroup v2 puis v1), None si illimitée"""
+    value = _read(os.path.join(root, "memory.max")) or _read(os.path.join(root, "memory", "memory.limit_in_bytes"))
+    if not value or value == "max":
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        return None
+    # cgroup v1 sans limite: valeur proche de 2^63
+    if limit >= 1 << 60:
+        return None
+    return limit // (1024 * 1024)
+
+
+def available_cores() -> List[int]:
+    """Cœurs sur lesquels le processus peut tourner"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return list(range(os.cpu_count() or 1))
+
+
+def available_cpus() -> Tuple[int, str]:
+    """Nombre de CPU utilisables et leur origine (le plus petit de quota cgroup, affinité, cpu_count)"""
+    cpus, source = os.cpu_count() or 1, "cpu_count"
+    try:
+        affinity = len(os.sched_getaffinity(0))
+        if affinity < cpus:
+            cpus, source = affinity, "affinity"
+    except (AttributeError, OSError):
+        pass
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        # Un quota fractionnaire (1.5 CPU) ne permet pas deux threads à plein temps
+        quota_cpus = max(1, math.floor(quota))
+        if quota_cpus < cpus:
+            cpus, source = quota_cpus, "cgroup"
+    return cpus, source
+
+
+def _parse_workers(value: Any) -> int:
+    """Nombre de workers demandé, 0 = automatique"""
+    if isinstance(value, int):
+        return max(0, value)
+    value = str(value).strip().lower()
+    if value in ("", "auto"):
+        return 0
+    return max(0, int(value))
+
+
+def plan_threads(
+    workers: Any = TTS_WORKERS,
+    worker_mode: str = TTS_WORKER_MODE,
+    threads_per_worker: int = TTS_THREADS_PER_WORKER,
+    interop_threads: int = TTS_INTEROP_THREADS,
+    pin: bool = TTS_PIN_WORKERS,
+    cpus: Optional[int] = None,
+) -> ThreadPlan:
+    """
+    Répartir les CPU disponibles entre workers et threads; les valeurs
+    explicites (TTS_WORKERS, TTS_THREADS_PER_WORKER) sont respectées même si
+    elles surchargent les CPU
+    """
+    if cpus is None:
+        cpus, source = available_cpus()
+    else:
+        source = "explicit"
+    cpus = max(1, cpus)
+    memory_limit_mb = cgroup_memory_limit_mb()
+    requested = _parse_workers(workers)
+
+    if worker_mode == "thread":
+        # Modèle partagé, une inférence à la fois: tous les CPU pour elle
+        count = requested or 1
+        threads = threads_per_worker or cpus
+        cores: Tuple[Tuple[int, ...], ...] = ()
+    else:
+        if requested:
+            count = requested
+        else:
+            count = max(1, cpus // (threads_per_worker or AUTO_THREADS_PER_WORKER))
+            if memory_limit_mb and TTS_WORKER_MEMORY_MB > 0:
+                # Garder de la place pour le processus de l'API (un worker de plus)
+                count = max(1, min(count, memory_limit_mb // TTS_WORKER_MEMORY_MB - 1))
+        threads = threads_per_worker or max(1, cpus // count)
+        cores = ()
+        if pin:
+            available = available_cores()
+            if len(available) >= count * threads:
+                cores = tuple(tuple(available[i * threads:(i + 1) * threads]) for i in range(count))
+            else:
+                logging.warning(f"Cannot pin {count} worker(s) x {threads} thread(s) on {len(available)} core(s), "
+                                f"workers left unpinned")
+
+    return ThreadPlan(
+        cpus=cpus,
+        cpu_source=source,
+        worker_mode=worker_mode,
+        workers=count,
+        threads_per_worker=threads,
+        interop_threads=max(1, interop_threads),
+        pin=pin,
+        worker_cores=cores,
+        memory_limit_mb=memory_limit_mb,
+    )
+
+
+def apply_threads(threads: int, interop_threads: int = 1, cores: Optional[Tuple[int, ...]] = None) -> None:
+    """
+    Appliquer un nombre de threads au processus courant: variables
+    d'environnement (à faire avant l'import de torch), torch s'il est déjà
+    importé, affinité CPU si des cœurs sont donnés
+    """
+    global _applied
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    _applied = (threads, interop_threads)
+    if cores:
+        try:
+            os.sched_setaffinity(0, cores)
+        except (AttributeError, OSError) as e:
+            logging.warning(f"Could not pin process {os.getpid()} to cores {list(cores)}: {e}")
+    configure_torch()
+
+
+def apply_plan(plan: ThreadPlan, index: Optional[int] = None) -> None:
+    """
+    Appliquer le plan au processus de l'API (index None) ou au worker `index`
+    (seul un worker est épinglé sur ses cœurs)
+    """
+    apply_threads(plan.threads_per_worker, plan.interop_threads, plan.cores_for(index) if index is not None else None)
+
+
+def configure_torch() -> None:
+    """
+    Confirmer le plan auprès de torch s'il est importé (à appeler après son
+    import, avant la première inférence); le nombre de threads inter-op ne
+    peut être fixé qu'une fois par processus
+    """
+    torch = sys.modules.get("torch")
+    if _applied is None or torch is None:
+        return
+
+    threads, interop_threads = _applied
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    if torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Travail parallèle déjà lancé: réglage figé pour ce processus
+            pass
@@ -0,0 +1,556 @@
+"""
+Moteur de synthèse Kokoro résident
+
+Le modèle (KModel) et les packs de voix sont chargés une seule fois au
+démarrage de l'application puis réutilisés pour chaque requête, au lieu de
+relancer `python -m kokoro` (et donc de réimporter torch, spaCy, misaki et
+les poids) à chaque appel. Le mode subprocess reste disponible en secours.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from importlib import metadata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import thread_plan
+from g2p_cache import G2PCache, normalize_sentence
+from voices import DEFAULT_VOICE, TTS_HOT_VOICES, VoiceRegistry
+
+# Fréquence d'échantillonnage de Kokoro (fixe)
+SAMPLE_RATE = 24000
+
+KOKORO_REPO_ID = os.environ.get("KOKORO_REPO_ID", "hexgrad/Kokoro-82M")
+
+
+def _package_version(name: str) -> str:
+    # Lu dans les métadonnées du paquet pour ne pas importer torch ici
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+# Backend d'inférence du mode inprocess: "torch" (fp32), "torch-int8" (quantification
+# dynamique au chargement), "onnx" (modèle exporté par export_model.py, onnxruntime)
+# ou "fake" (signal factice déterministe, sans modèle: benchmarks de l'API hors ligne)
+ENGINE_BACKEND = os.environ.get("TTS_ENGINE_BACKEND", "torch").lower()
+# Modèle ONNX (fp32 ou int8) et ses métadonnées `<fichier>.json` (vocabulaire)
+TTS_ONNX_MODEL_PATH = os.environ.get(
+    "TTS_ONNX_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "kokoro-int8.onnx")
+)
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch-int8"
+BACKEND_ONNX = "onnx"
+BACKEND_FAKE = "fake"
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX, BACKEND_FAKE)
+
+# Backend fake: secondes d'audio produites par seconde d'attente simulée (0 = pas d'attente)
+TTS_FAKE_RTF = float(os.environ.get("TTS_FAKE_RTF", "20"))
+# Backend fake: durée d'audio par caractère (débit de parole d'environ 14 caractères/s)
+FAKE_SECONDS_PER_CHAR = 0.07
+
+# Version du modèle: fait partie des clés de cache audio (un autre backend produit un audio légèrement différent)
+MODEL_VERSION = os.environ.get(
+    "TTS_MODEL_VERSION",
+    f"{KOKORO_REPO_ID}@{_package_version('kokoro')}" + (f"+{ENGINE_BACKEND}" if ENGINE_BACKEND != BACKEND_TORCH else ""),
+)
+# Version du G2P: un cache de phonèmes persistant d'une autre version est ignoré
+G2P_VERSION = f"kokoro@{_package_version('kokoro')}/misaki@{_package_version('misaki')}"
+
+# "inprocess" (modèle résident) ou "subprocess" (un processus kokoro par requête)
+ENGINE_MODE = os.environ.get("TTS_ENGINE_MODE", "inprocess").lower()
+
+# 5 minutes pour permettre le téléchargement des modèles si nécessaire
+SUBPROCESS_TIMEOUT = 300
+
+# Synthèse factice par voix chaude pendant le préchauffage (0 = chargement seul)
+TTS_WARMUP_SYNTHESIS = os.environ.get("TTS_WARMUP_SYNTHESIS", "1").lower() in ("1", "true", "yes")
+
+# Textes de la synthèse de préchauffage, par langue
+WARMUP_TEXTS = {
+    "a": "Hello.",
+    "b": "Hello.",
+    "e": "Hola.",
+    "f": "Bonjour.",
+    "h": "नमस्ते।",
+    "i": "Ciao.",
+    "j": "こんにちは。",
+    "p": "Olá.",
+    "z": "你好。",
+}
+
+MODE_INPROCESS = "inprocess"
+MODE_SUBPROCESS = "subprocess"
+
+# Longueur maximale de phonèmes d'une inférence Kokoro (au-delà, KPipeline tronque)
+MAX_PHONEMES = 510
+# Taille des morceaux de texte passés au G2P hors anglais (comme KPipeline)
+G2P_CHUNK_CHARS = 400
+
+
+def lang_for_voice(voice: str) -> str:
+    """
+    Langue Kokoro correspondant à une voix (même règle que la CLI kokoro:
+    la première lettre du nom de la voix, ex: "ff_siwis" -> "f")
+    """
+    return voice[0].lower()
+
+
+def chunk_for_g2p(text: str, max_chars: int = G2P_CHUNK_CHARS) -> List[str]:
+    """
+    Regrouper les phrases d'un texte en morceaux d'au plus `max_chars`
+    caractères (découpage de KPipeline pour les langues autres que l'anglais)
+    """
+    parts = re.split(r"([.!?]+)", text)
+    chunks = []
+    current = ""
+    for i in range(0, len(parts), 2):
+        sentence = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+        if len(current) + len(sentence) <= max_chars:
+            current += sentence
+        else:
+            if current.strip():
+                chunks.append(current.strip())
+            current = sentence
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    """
+    Convertir un signal float32 [-1, 1] en PCM 16 bits little-endian
+    """
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> None:
+    """
+    Écrire un signal float32 [-1, 1] en WAV PCM 16 bits mono
+    """
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(to_pcm16(audio))
+
+
+def wav_stream_header(sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    En-tête WAV PCM 16 bits mono de longueur inconnue (tailles à 0xFFFFFFFF),
+    pour envoyer l'audio au fur et à mesure de la synthèse
+    """
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+
+def read_wav(path: str) -> np.ndarray:
+    """
+    Lire un WAV PCM 16 bits mono en signal float32 [-1, 1]
+    """
+    with wave.open(path, "rb") as wav_file:
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32767
+
+
+def quantize_int8(model):
+    """Quantification dynamique int8 des couches Linear et LSTM (poids int8, activations float)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8, inplace=True)
+
+
+class OnnxKokoro:
+    """
+    Modèle Kokoro exporté en ONNX, exécuté par onnxruntime; même rôle que
+    KModel: phonèmes + style de la voix + vitesse -> signal float32
+    """
+
+    def __init__(self, path: str = TTS_ONNX_MODEL_PATH, threads: Optional[int] = None):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("Le backend onnx demande le paquet onnxruntime (pip install onnxruntime)") from e
+        with open(f"{path}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.path = path
+        self.vocab: Dict[str, int] = meta["vocab"]
+        self.quantized = bool(meta.get("quantized"))
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or int(os.environ.get("OMP_NUM_THREADS", "1"))
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, phonemes: str, ref_s, speed: float) -> np.ndarray:
+        input_ids = [0, *(self.vocab[p] for p in phonemes if p in self.vocab), 0]
+        audio = self.session.run(None, {
+            "input_ids": np.array([input_ids], dtype=np.int64),
+            "ref_s": np.asarray(ref_s, dtype=np.float32).reshape(1, -1),
+            "speed": np.array([speed], dtype=np.float32),
+        })[0]
+        return audio.reshape(-1).astype(np.float32, copy=False)
+
+
+class FakeKokoro:
+    """
+    Moteur factice déterministe (backend fake): ni poids ni kokoro. Le signal
+    ne dépend que du texte, de la voix et de la vitesse, sa durée suit la
+    longueur du texte, et le calcul est simulé par une attente (GIL relâché,
+    comme pendant une inférence torch) de durée / TTS_FAKE_RTF.
+    """
+
+    def __init__(self, rtf: float = TTS_FAKE_RTF):
+        self.rtf = rtf
+
+    @staticmethod
+    def _seed(*parts: str) -> int:
+        return int.from_bytes(hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=8).digest(), "little")
+
+    def load_voice(self, voice: str) -> np.ndarray:
+        """Pack de voix factice (vecteur de style dérivé du nom de la voix)"""
+        return np.random.default_rng(self._seed(voice)).standard_normal(256).astype(np.float32)
+
+    def __call__(self, text: str, pack: np.ndarray, speed: float) -> np.ndarray:
+        seconds = max(0.2, len(text) * FAKE_SECONDS_PER_CHAR / speed)
+        rng = np.random.default_rng(self._seed(text, f"{speed:.3f}"))
+        t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+        # Fréquence fondamentale propre à la voix, légère variation propre au texte
+        frequency = 110.0 + 40.0 * abs(float(pack[0])) + 20.0 * rng.random()
+        envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02)
+        audio = (0.3 * envelope * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+        if self.rtf > 0:
+            time.sleep(seconds / self.rtf)
+        return audio
+
+
+def load_with_fallback(engine: "KokoroEngine", voices: Iterable[str] = TTS_HOT_VOICES) -> None:
+    """
+    Charger le moteur; en cas d'échec, repasser en mode subprocess plutôt que
+    de rendre le service indisponible
+    """
+    voices = tuple(voices)
+    try:
+        engine.load(voices)
+    except Exception as e:
+        logging.error(f"Kokoro model loading failed, falling back to subprocess mode: {e}", exc_info=True)
+        engine.mode = MODE_SUBPROCESS
+
+
+class KokoroEngine:
+    """
+    Moteur de synthèse Kokoro
+
+    En mode "inprocess", un seul KModel est partagé entre les pipelines de
+    chaque langue, et les packs de voix sont gardés par le registre `voices`
+    (voix chaudes préchargées, autres en LRU) puis passés aux pipelines. Les
+    phonèmes des phrases déjà vues viennent du cache `g2p`. En mode
+    "subprocess", chaque synthèse lance la CLI kokoro comme avant.
+    """
+
+    def __init__(self, mode: Optional[str] = None, repo_id: str = KOKORO_REPO_ID, backend: Optional[str] = None):
+        self.mode = (mode or ENGINE_MODE).lower()
+        if self.mode not in (MODE_INPROCESS, MODE_SUBPROCESS):
+            raise ValueError(f"Mode de moteur inconnu: {self.mode}")
+        self.backend = (backend or ENGINE_BACKEND).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Backend de moteur inconnu: {self.backend}")
+        self.repo_id = repo_id
+        self.python_cmd = os.environ.get("PYTHON_CMD", "python")
+        self.model = None
+        self.pipelines: Dict[str, object] = {}
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        self._warmup_lock = threading.Lock()
+        self.voices = VoiceRegistry()
+        self.g2p = G2PCache(version=G2P_VERSION)
+        # Durées des étapes (voice_load, g2p, inference, subprocess) de l'opération en cours, par thread
+        self._timings = threading.local()
+        # Le modèle torch n'est pas prévu pour des inférences concurrentes
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.mode == MODE_SUBPROCESS or self.model is not None
+
+    def load(self, voices: Iterable[str] = TTS_HOT_VOICES) -> None:
+        """
+        Charger le modèle et précharger les voix chaudes (no-op en mode subprocess)
+        """
+        if self.mode != MODE_INPROCESS or self.model is not None:
+            return
+
+        start = time.perf_counter()
+        logging.info(f"Loading Kokoro model ({self.repo_id}, backend {self.backend})...")
+        if self.backend == BACKEND_FAKE:
+            self.model = FakeKokoro()
+        elif self.backend == BACKEND_ONNX:
+            # Les pipelines ne servent qu'au G2P et aux voix (KPipeline sans modèle torch)
+            self.model = OnnxKokoro()
+        else:
+            from kokoro import KModel
+
+            # torch vient d'être importé: lui confirmer le plan de threads du processus
+            thread_plan.configure_torch()
+            self.model = KModel(repo_id=self.repo_id).to("cpu").eval()
+            if self.backend == BACKEND_TORCH_INT8:
+                self.model = quantize_int8(self.model)
+        self.g2p.load()
+        voices = tuple(voices)
+        self.voices.hot.update(voices)
+        for voice in voices:
+            self.voices.get(voice, self._load_voice)
+        self.load_seconds = time.perf_counter() - start
+        logging.info(f"Kokoro model loaded in {self.load_seconds:.2f}s (voices: {', '.join(voices)})")
+
+    def warm_up(self, voices: Iterable[str] = TTS_HOT_VOICES) -> None:
+        """
+        Préchauffer le moteur avant de recevoir du trafic: modèle et voix chaudes
+        chargés, puis une synthèse factice par voix (premier passage du modèle,
+        téléchargement des poids en mode subprocess). Ne fait rien la deuxième fois.
+        """
+        with self._warmup_lock:
+            if self.warmup_seconds is not None:
+                return
+            start = time.perf_counter()
+            voices = tuple(voices)
+            load_with_fallback(self, voices)
+            if TTS_WARMUP_SYNTHESIS:
+                for voice in voices if self.mode == MODE_INPROCESS else voices[:1]:
+                    try:
+                        self.synthesize(WARMUP_TEXTS.get(lang_for_voice(voice), "Hello."), voice=voice)
+                    except Exception as e:
+                        # Le moteur reste utilisable: l'erreur est exposée par /ready
+                        self.warmup_error = f"{voice}: {str(e)[:200]}"
+                        logging.error(f"Warm-up synthesis failed for voice {voice}: {e}", exc_info=True)
+            self.warmup_seconds = time.perf_counter() - start
+            logging.info(f"Kokoro engine warmed up in {self.warmup_seconds:.2f}s (mode {self.mode})")
+
+    def reset_timings(self) -> None:
+        """Remettre à zéro les durées d'étapes du thread courant (avant une opération)"""
+        self._timings.values = {}
+
+    def timings(self) -> Dict[str, float]:
+        """Durées d'étapes (secondes) cumulées par le thread courant depuis `reset_timings`"""
+        return dict(getattr(self._timings, "values", {}))
+
+    def _add_timing(self, stage: str, seconds: float) -> None:
+        values = getattr(self._timings, "values", None)
+        if values is None:
+            values = self._timings.values = {}
+        values[stage] = values.get(stage, 0.0) + seconds
+
+    def _pipeline(self, lang: str):
+        """
+        Pipeline (G2P + voix) d'une langue, créé à la demande autour du modèle partagé
+        """
+        pipeline = self.pipelines.get(lang)
+        if pipeline is None:
+            from kokoro import KPipeline
+
+            model = False if self.backend == BACKEND_ONNX else self.model
+            pipeline = KPipeline(lang_code=lang, repo_id=self.repo_id, model=model)
+            self.pipelines[lang] = pipeline
+        return pipeline
+
+    def _load_voice(self, voice: str):
+        """
+        Charger un pack de voix depuis le hub; le registre en devient le seul
+        détenteur (retiré du cache du pipeline pour que l'éviction libère la mémoire)
+        """
+        start = time.perf_counter()
+        if self.backend == BACKEND_FAKE:
+            pack = self.model.load_voice(voice)
+        else:
+            pipeline = self._pipeline(lang_for_voice(voice))
+            pack = pipeline.load_voice(voice)
+            pipeline.voices.pop(voice, None)
+        self._add_timing("voice_load", time.perf_counter() - start)
+        return pack
+
+    def close(self) -> None:
+        """Écrire le cache de phonèmes sur disque (arrêt du moteur)"""
+        if self.mode == MODE_INPROCESS and self.model is not None and self.backend != BACKEND_FAKE:
+            self.g2p.save()
+
+    def _phonemize(self, pipeline, lang: str, sentence: str) -> List[str]:
+        """
+        G2P d'une phrase, découpé en morceaux d'au plus MAX_PHONEMES phonèmes
+        comme le fait KPipeline (par tokens en anglais, par phrases sinon)
+        """
+        if lang in ("a", "b"):
+            _, tokens = pipeline.g2p(sentence)
+            return [ps[:MAX_PHONEMES] for _, ps, _ in pipeline.en_tokenize(tokens) if ps]
+        phonemes = [pipeline.g2p(chunk)[0] for chunk in chunk_for_g2p(sentence)]
+        return [ps[:MAX_PHONEMES] for ps in phonemes if ps]
+
+    def _sentence_phonemes(self, pipeline, lang: str, text: str) -> List[str]:
+        """Phonèmes de chaque paragraphe du texte (cache G2P), dans l'ordre"""
+        phonemes = []
+        for paragraph in re.split(r"\n+", text.strip()):
+            sentence = normalize_sentence(paragraph)
+            if sentence:
+                phonemes.extend(self.g2p.get_or_compute(
+                    lang, sentence, lambda s: self._phonemize(pipeline, lang, s)
+                ))
+        return phonemes
+
+    def _generate(self, pipeline, lang: str, text: str, pack, speed: float) -> Iterable:
+        """
+        Résultats du pipeline (itérés à la demande), à partir des phonèmes en
+        cache quand le cache est actif; le G2P est fait et mesuré ici
+        """
+        if not self.g2p.enabled or not hasattr(pipeline, "generate_from_tokens"):
+            # G2P et inférence entremêlés dans KPipeline: tout est compté en inférence
+            return pipeline(text, voice=pack, speed=speed, split_pattern=r"\n+")
+        start = time.perf_counter()
+        sentence_phonemes = self._sentence_phonemes(pipeline, lang, text)
+        self._add_timing("g2p", time.perf_counter() - start)
+        return (
+            result
+            for phonemes in sentence_phonemes
+            for result in pipeline.generate_from_tokens(phonemes, voice=pack, speed=speed)
+        )
+
+    def _infer_onnx(self, pipeline, lang: str, text: str, pack, speed: float) -> List[np.ndarray]:
+        """Inférence ONNX: phonèmes (cache G2P) puis un passage du modèle par morceau"""
+        start = time.perf_counter()
+        sentence_phonemes = self._sentence_phonemes(pipeline, lang, text)
+        self._add_timing("g2p", time.perf_counter() - start)
+        start = time.perf_counter()
+        # Style de la voix choisi selon la longueur des phonèmes, comme KPipeline
+        chunks = [self.model(phonemes, pack[len(phonemes) - 1].numpy(), speed) for phonemes in sentence_phonemes]
+        self._add_timing("inference", time.perf_counter() - start)
+        return chunks
+
+    def prewarm_g2p(self, texts: List[str], lang: str) -> Dict[str, object]:
+        """
+        Calculer à l'avance les phonèmes d'une liste de phrases (sans synthèse audio)
+        """
+        if self.mode != MODE_INPROCESS or self.backend == BACKEND_FAKE:
+            return {"sentences": 0, "added": 0, "seconds": 0.0}
+        if self.model is None:
+            self.load()
+        start = time.perf_counter()
+        with self._lock:
+            pipeline = self._pipeline(lang)
+            before = self.g2p.misses
+            for text in texts:
+                self._sentence_phonemes(pipeline, lang, text)
+            added = self.g2p.misses - before
+            if added and self.g2p.path:
+                self.g2p.save()
+        return {"sentences": len(texts), "added": added, "seconds": round(time.perf_counter() - start, 3)}
+
+    def synthesize(self, text: str, voice: str = DEFAULT_VOICE, speed: float = 1.0, lang: Optional[str] = None) -> np.ndarray:
+        """
+        Synthétiser un texte et retourner le signal float32 à SAMPLE_RATE
+        (`lang`: langue du G2P si elle diffère de celle de la voix, ex: "b" pour une voix "af_*")
+        """
+        if self.mode == MODE_SUBPROCESS:
+            if lang and lang != lang_for_voice(voice):
+                logging.warning(f"Language override '{lang}' ignored in subprocess mode")
+            return self._synthesize_subprocess(text, voice, speed)
+
+        if self.model is None:
+            self.load()
+
+        with self._lock:
+            pack = self.voices.get(voice, self._load_voice)
+            lang = lang or lang_for_voice(voice)
+            if self.backend == BACKEND_FAKE:
+                start = time.perf_counter()
+                chunks = [self.model(text, pack, speed)]
+                self._add_timing("inference", time.perf_counter() - start)
+            elif self.backend == BACKEND_ONNX:
+                chunks = self._infer_onnx(self._pipeline(lang), lang, text, pack, speed)
+            else:
+                pipeline = self._pipeline(lang)
+                results = self._generate(pipeline, lang, text, pack, speed)
+                start = time.perf_counter()
+                chunks = [result.audio.numpy() for result in results if result.audio is not None]
+                self._add_timing("inference", time.perf_counter() - start)
+        if not chunks:
+            raise RuntimeError("Kokoro n'a produit aucun audio pour ce texte")
+        return np.concatenate(chunks).astype(np.float32, copy=False)
+
+    def synthesize_batch(
+        self, items: List[Tuple[str, float]], voice: str = DEFAULT_VOICE, lang: Optional[str] = None
+    ) -> List[Tuple[np.ndarray, float]]:
+        """
+        Synthétiser plusieurs textes d'une même voix en un seul passage
+        (pack de voix chargé une fois); retourne (signal, durée de synthèse) par texte
+        """
+        results = []
+        for text, speed in items:
+            start = time.perf_counter()
+            audio = self.synthesize(text, voice=voice, speed=speed, lang=lang)
+            results.append((audio, time.perf_counter() - start))
+        return results
+
+    def synthesize_to_file(
+        self,
+        text: str,
+        output_path: str,
+        voice: str = DEFAULT_VOICE,
+        speed: float = 1.0,
+    ) -> None:
+        """
+        Synthétiser un texte directement dans un fichier WAV
+        """
+        if self.mode == MODE_SUBPROCESS:
+            self._run_cli(text, output_path, voice, speed)
+            return
+        write_wav(output_path, self.synthesize(text, voice=voice, speed=speed))
+
+    def _synthesize_subprocess(self, text: str, voice: str, speed: float) -> np.ndarray:
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            self._run_cli(text, tmp_path, voice, speed)
+            self._add_timing("subprocess", time.perf_counter() - start)
+            return read_wav(tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _run_cli(self, text: str, output_path: str, voice: str, speed: float) -> subprocess.CompletedProcess:
+        """
+        Mode de secours: lancer `python -m kokoro` (lève CalledProcessError / TimeoutExpired)
+        """
+        cmd = [
+            self.python_cmd,
+            "-m", "kokoro",
+            "--voice", voice,
+            "--text", text,
+            "--output-file", output_path,
+            "--speed", str(speed),
+        ]
+        logging.info(f"Starting kokoro subprocess (voice: {voice})...")
+        result = subprocess.run(
+            cmd,
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=SUBPROCESS_TIMEOUT,
+        )
+        logging.info(f"Subprocess completed. Return code: {result.returncode}")
+        if result.stderr:
+            logging.warning(f"Subprocess stderr (first 1000 chars): {result.stderr[:1000]}")
+        return result
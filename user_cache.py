@@ -0,0 +1,176 @@
+"""
+Cache des utilisateurs authentifiés (principal) par identifiant, avec TTL
+
+`get_current_principal` retrouve l'utilisateur d'un token dans ce cache au lieu
+de faire une requête en base à chaque appel authentifié. Les entrées expirent
+après USER_CACHE_TTL_S et sont invalidées quand le compte, les préférences ou
+les favoris changent. Avec plusieurs workers uvicorn, USER_CACHE_REDIS_URL
+partage le cache (et ses invalidations) via Redis; sans lui, chaque processus
+a son cache local et le TTL borne la durée d'une donnée périmée.
+"""
+import collections
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Durée de vie d'une entrée (secondes, 0 = cache désactivé)
+USER_CACHE_TTL_S = float(os.environ.get("USER_CACHE_TTL_S", "60"))
+# Nombre maximal d'entrées du cache local
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000"))
+# Backend Redis optionnel (ex: redis://localhost:6379/0), nécessite le paquet `redis`
+USER_CACHE_REDIS_URL = os.environ.get("USER_CACHE_REDIS_URL", "")
+
+_KEY_PREFIX = "kokoro:user:"
+
+
+class LocalBackend:
+    """
+    Backend en mémoire du processus (LRU borné, expiration à la lecture);
+    sert aussi de remplaçant de Redis dans les tests
+    """
+
+    name = "local"
+
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, Tuple[float, str]]" = collections.OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Backend partagé entre workers (client `redis.asyncio`, compatible Redis/Valkey/KeyDB)
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+
+def create_backend(redis_url: str = USER_CACHE_REDIS_URL):
+    """
+    Backend Redis si une URL est configurée et le paquet installé, sinon local
+    """
+    if redis_url:
+        try:
+            return RedisBackend(redis_url)
+        except ImportError:
+            logging.warning("USER_CACHE_REDIS_URL is set but the redis package is not installed, using local user cache")
+    return LocalBackend()
+
+
+class UserCache:
+    """
+    Cache TTL des principals (dictionnaire `User.to_dict()`) par identifiant utilisateur
+    """
+
+    def __init__(self, backend=None, ttl: float = USER_CACHE_TTL_S):
+        self.backend = backend if backend is not None else create_backend()
+        self.ttl = ttl
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.backend_errors = 0
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"{_KEY_PREFIX}{user_id}"
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        if self.ttl <= 0:
+            return None
+        try:
+            value = await self.backend.get(self._key(user_id))
+        except Exception as e:
+            # Un cache indisponible ne doit pas bloquer l'authentification: on passe par la base
+            self.backend_errors += 1
+            logging.warning(f"User cache read failed: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    async def put(self, user_id: int, principal: dict) -> None:
+        if self.ttl <= 0:
+            return
+        try:
+            await self.backend.set(self._key(user_id), json.dumps(principal), self.ttl)
+        except Exception as e:
+            self.backend_errors += 1
+            logging.warning(f"User cache write failed: {e}")
+
+    async def invalidate(self, user_id: int) -> None:
+        """À appeler après toute modification de l'utilisateur (compte, préférences, favoris...)"""
+        self.invalidations += 1
+        try:
+            await self.backend.delete(self._key(user_id))
+        except Exception as e:
+            self.backend_errors += 1
+            logging.warning(f"User cache invalidation failed: {e}")
+
+    async def get_or_load(self, user_id: int, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """
+        Principal en cache, ou chargé par `loader` (requête en base) puis mis en cache
+        """
+        principal = await self.get(user_id)
+        if principal is not None:
+            self.hits += 1
+            return principal
+        self.misses += 1
+        principal = await loader()
+        if principal is not None:
+            await self.put(user_id, principal)
+        return principal
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            # Chaque hit évite un aller-retour en base (et l'emprunt d'une connexion du pool)
+            "db_round_trips_saved": self.hits,
+            "invalidations": self.invalidations,
+            "backend_errors": self.backend_errors,
+        }
+        if isinstance(self.backend, LocalBackend):
+            stats["entries"] = len(self.backend)
+        return stats
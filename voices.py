@@ -0,0 +1,177 @@
+"""
+Voix disponibles et résidence des packs de voix en mémoire
+
+Le catalogue liste les voix Kokoro proposées par l'API (restreint par
+TTS_VOICES). Dans chaque moteur, un jeu de voix « chaudes » (TTS_HOT_VOICES)
+est chargé au démarrage et n'est jamais évincé; les autres voix sont chargées
+à la première utilisation et gardées sous un budget mémoire avec éviction LRU.
+Les temps de chargement et la résidence de chaque voix sont exposés par
+GET /voices.
+"""
+import collections
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+# Langues Kokoro (code de pipeline -> nom)
+LANGUAGES = {
+    "a": "English (US)",
+    "b": "English (UK)",
+    "e": "Español",
+    "f": "Français",
+    "h": "हिन्दी",
+    "i": "Italiano",
+    "j": "日本語",
+    "p": "Português (BR)",
+    "z": "中文",
+}
+
+# Voix Kokoro-82M v1.0 (préfixe: langue + genre, f = féminine, m = masculine)
+VOICE_CATALOG = (
+    "af_heart", "af_alloy", "af_aoede", "af_bella", "af_jessica", "af_kore", "af_nicole",
+    "af_nova", "af_river", "af_sarah", "af_sky",
+    "am_adam", "am_echo", "am_eric", "am_fenrir", "am_liam", "am_michael", "am_onyx", "am_puck", "am_santa",
+    "bf_alice", "bf_emma", "bf_isabella", "bf_lily",
+    "bm_daniel", "bm_fable", "bm_george", "bm_lewis",
+    "ef_dora", "em_alex", "em_santa",
+    "ff_siwis",
+    "hf_alpha", "hf_beta", "hm_omega", "hm_psi",
+    "if_sara", "im_nicola",
+    "jf_alpha", "jf_gongitsune", "jf_nezumi", "jf_tebukuro", "jm_kumo",
+    "pf_dora", "pm_alex", "pm_santa",
+    "zf_xiaobei", "zf_xiaoni", "zf_xiaoxiao", "zf_xiaoyi", "zm_yunjian", "zm_yunxi", "zm_yunxia", "zm_yunyang",
+)
+
+DEFAULT_VOICE = "ff_siwis"
+
+
+def _env_list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.environ.get(name, default).split(",") if item.strip()]
+
+
+# Voix proposées par l'API (par défaut tout le catalogue sauf japonais et chinois,
+# dont le G2P demande misaki[ja] / misaki[zh], absents de requirements.txt)
+TTS_VOICES = _env_list(
+    "TTS_VOICES", ",".join(voice for voice in VOICE_CATALOG if voice[0] not in ("j", "z"))
+)
+# Voix préchargées au démarrage dans chaque worker et jamais évincées
+TTS_HOT_VOICES = _env_list("TTS_HOT_VOICES", DEFAULT_VOICE)
+# Budget mémoire des voix non chaudes par moteur (Mo); un pack de voix fait ~0,5 Mo
+TTS_VOICE_CACHE_MB = float(os.environ.get("TTS_VOICE_CACHE_MB", "16"))
+
+
+def voice_info(voice: str) -> Dict[str, object]:
+    return {
+        "name": voice,
+        "lang": voice[0],
+        "language": LANGUAGES.get(voice[0], voice[0]),
+        "gender": {"f": "female", "m": "male"}.get(voice[1:2], "unknown"),
+        "hot": voice in TTS_HOT_VOICES,
+    }
+
+
+def is_available(voice: str) -> bool:
+    return voice in TTS_VOICES
+
+
+def _pack_bytes(pack: Any) -> int:
+    """Taille en mémoire d'un pack de voix (tenseur torch ou tableau numpy)"""
+    nbytes = getattr(pack, "nbytes", None)
+    if nbytes is None and hasattr(pack, "element_size"):
+        nbytes = pack.element_size() * pack.nelement()
+    return int(nbytes or 0)
+
+
+class VoiceRegistry:
+    """
+    Résidence des packs de voix d'un moteur: voix chaudes épinglées, autres en LRU sous budget
+    """
+
+    def __init__(
+        self,
+        hot: Iterable[str] = TTS_HOT_VOICES,
+        max_bytes: int = int(TTS_VOICE_CACHE_MB * 1024 * 1024),
+    ):
+        self.hot = set(hot)
+        self.max_bytes = max_bytes
+        # voix -> pack (tenseur), de la moins récemment utilisée à la plus récente
+        self._packs: "collections.OrderedDict[str, Any]" = collections.OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+        # Compteurs
+        self.warm_hits = 0
+        self.cold_loads = 0
+        self.evictions = 0
+
+    def _voice_stats(self, voice: str) -> Dict[str, float]:
+        return self._stats.setdefault(voice, {"loads": 0, "load_ms_total": 0.0, "last_load_ms": 0.0, "uses": 0, "evictions": 0})
+
+    def get(self, voice: str, load: Callable[[str], Any]) -> Any:
+        """
+        Pack d'une voix, chargé par `load` s'il n'est pas résident
+        """
+        stats = self._voice_stats(voice)
+        stats["uses"] += 1
+        pack = self._packs.get(voice)
+        if pack is not None:
+            self._packs.move_to_end(voice)
+            self.warm_hits += 1
+            return pack
+
+        start = time.perf_counter()
+        pack = load(voice)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.cold_loads += 1
+        stats["loads"] += 1
+        stats["load_ms_total"] += elapsed_ms
+        stats["last_load_ms"] = elapsed_ms
+        self._packs[voice] = pack
+        self._sizes[voice] = _pack_bytes(pack)
+        if voice not in self.hot:
+            logging.info(f"Voice {voice} loaded on demand in {elapsed_ms:.0f} ms")
+        self._evict()
+        return pack
+
+    def _evict(self) -> None:
+        """Évincer les voix non chaudes les moins récemment utilisées tant que le budget est dépassé"""
+        while self._lru_bytes() > self.max_bytes:
+            victim = next((voice for voice in self._packs if voice not in self.hot), None)
+            if victim is None:
+                return
+            del self._packs[victim]
+            del self._sizes[victim]
+            self.evictions += 1
+            self._voice_stats(victim)["evictions"] += 1
+
+    def _lru_bytes(self) -> int:
+        return sum(size for voice, size in list(self._sizes.items()) if voice not in self.hot)
+
+    def resident(self) -> List[str]:
+        return list(self._packs)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.warm_hits + self.cold_loads
+        return {
+            "resident": self.resident(),
+            "resident_bytes": sum(list(self._sizes.values())),
+            "hot": sorted(self.hot),
+            "lru_bytes": self._lru_bytes(),
+            "max_bytes": self.max_bytes,
+            "warm_hits": self.warm_hits,
+            "cold_loads": self.cold_loads,
+            "evictions": self.evictions,
+            "warm_ratio": round(self.warm_hits / lookups, 4) if lookups else None,
+            "voices": {
+                voice: {
+                    "loads": int(stats["loads"]),
+                    "uses": int(stats["uses"]),
+                    "evictions": int(stats["evictions"]),
+                    "last_load_ms": round(stats["last_load_ms"], 1),
+                    "mean_load_ms": round(stats["load_ms_total"] / stats["loads"], 1) if stats["loads"] else None,
+                }
+                # Copie: en mode thread, les statistiques sont lues pendant une synthèse
+                for voice, stats in list(self._stats.items())
+            },
+        }